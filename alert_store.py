@@ -0,0 +1,258 @@
+import base64
+import json
+import sqlite3
+import threading
+
+# Columns pulled out of the alert JSON so they can be indexed and filtered on
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    track_id INTEGER,
+    timestamp REAL NOT NULL,
+    camera_id TEXT,
+    zone_id INTEGER,
+    zone_name TEXT,
+    suspicion_score REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts (type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_track ON alerts (track_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_zone ON alerts (zone_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_camera ON alerts (camera_id, timestamp);
+"""
+
+INSERT = """
+INSERT OR IGNORE INTO alerts
+    (id, type, track_id, timestamp, camera_id, zone_id, zone_name, suspicion_score, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class AlertStore:
+    """Persistent alert history in SQLite (WAL mode) with indexed lookups.
+
+    Alerts from the processing threads are buffered and written in batches by a
+    background thread; queries flush the buffer first so they always see every
+    alert that was added. Only the requested page is ever loaded into memory.
+    """
+
+    def __init__(self, path="alerts.db", batch_size=100, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # One writer connection guarded by a lock, one reader connection per thread
+        self.write_lock = threading.Lock()
+        self.writer = self._connect()
+        self.writer.executescript(SCHEMA)
+        self.local = threading.local()
+
+        # Alerts waiting to be written
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.wake = threading.Event()
+
+        # Total row count maintained incrementally (COUNT(*) scans the whole table)
+        self.total = self.writer.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+
+        self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(alert):
+        return (
+            alert["id"],
+            alert["type"],
+            alert.get("track_id"),
+            alert["timestamp"],
+            alert.get("camera_id"),
+            alert.get("zone_id"),
+            alert.get("zone_name"),
+            alert.get("suspicion_score"),
+            json.dumps(alert),
+        )
+
+    def add(self, alert):
+        """Queue an alert dict (must have id, type and timestamp) for the next batch write"""
+        with self.pending_lock:
+            self.pending.append(alert)
+            if len(self.pending) >= self.batch_size:
+                self.wake.set()
+
+    def flush(self):
+        """Write all buffered alerts in one transaction"""
+        # The write lock is taken before the swap, so a flush that finds the buffer empty has waited for
+        # any batch another thread took out of it to be committed (queries then see that batch too)
+        with self.write_lock:
+            with self.pending_lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+
+            with self.writer:
+                inserted = self.writer.executemany(INSERT, [self._row(alert) for alert in batch]).rowcount
+            self.total += inserted
+        return inserted
+
+    def _flush_loop(self):
+        while self.running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing alerts: {e}")
+
+    def close(self):
+        """Write what is buffered and stop the background writer"""
+        self.running = False
+        self.wake.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        self.flush()
+        with self.write_lock:
+            self.writer.close()
+
+    def get(self, alert_id):
+        """Look up one alert by ID"""
+        self.flush()
+        row = self._reader().execute("SELECT data FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, alert_id):
+        """Delete one alert by ID; returns False if it does not exist"""
+        self.flush()
+        with self.write_lock:
+            with self.writer:
+                deleted = self.writer.execute("DELETE FROM alerts WHERE id = ?", (alert_id,)).rowcount
+            self.total -= deleted
+        return deleted > 0
+
+    def clear(self, camera_id=None):
+        """Delete all alerts (or all alerts of one camera)"""
+        self.flush()
+        with self.write_lock:
+            with self.writer:
+                if camera_id is None:
+                    self.writer.execute("DELETE FROM alerts")
+                else:
+                    self.writer.execute("DELETE FROM alerts WHERE camera_id = ?", (camera_id,))
+            self.total = self.writer.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+
+    @staticmethod
+    def encode_cursor(timestamp, seq):
+        """Opaque keyset cursor pointing just past (timestamp, seq)"""
+        return base64.urlsafe_b64encode(f"{timestamp!r}:{seq}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+        try:
+            timestamp, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+            return float(timestamp), int(seq)
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+    @staticmethod
+    def _where(type=None, track_id=None, zone_name=None, camera_id=None,
+               start_time=None, end_time=None, min_score=None):
+        # Every equality filter has a (column, timestamp) index, so the time range stays indexed too
+        clauses, params = [], []
+        for column, value in (("type", type), ("track_id", track_id),
+                              ("zone_name", zone_name), ("camera_id", camera_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start_time is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("timestamp < ?")
+            params.append(end_time)
+        if min_score is not None:
+            clauses.append("suspicion_score >= ?")
+            params.append(min_score)
+        return clauses, params
+
+    def count(self, **filters):
+        """Number of stored alerts matching the filters"""
+        self.flush()
+        clauses, params = self._where(**filters)
+        if not clauses:
+            return self.total
+        return self._reader().execute(
+            f"SELECT COUNT(*) FROM alerts WHERE {' AND '.join(clauses)}", params
+        ).fetchone()[0]
+
+    def query(self, limit=20, offset=0, cursor=None, order="asc", **filters):
+        """A page of alerts ordered by (timestamp, seq), plus the cursor for the next page.
+
+        With a cursor the page starts right after the previous one (keyset
+        pagination, so deep pages cost the same as the first); offset is kept
+        for the old limit/offset API.
+        """
+        self.flush()
+        clauses, params = self._where(**filters)
+        descending = order == "desc"
+
+        if cursor is not None:
+            timestamp, seq = self.decode_cursor(cursor)
+            op = "<" if descending else ">"
+            clauses.append(f"timestamp {op}= ? AND (timestamp {op} ? OR seq {op} ?)")
+            params.extend([timestamp, timestamp, seq])
+            offset = 0
+
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT seq, timestamp, data FROM alerts"
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += f" ORDER BY timestamp {direction}, seq {direction} LIMIT ? OFFSET ?"
+
+        rows = self._reader().execute(sql, params + [limit, offset]).fetchall()
+        next_cursor = self.encode_cursor(rows[-1][1], rows[-1][0]) if rows and len(rows) == limit else None
+        return [json.loads(row[2]) for row in rows], next_cursor
+
+    def list(self, limit=20, offset=0, camera_id=None):
+        """A page of alerts in time order"""
+        alerts, _ = self.query(limit=limit, offset=offset, camera_id=camera_id)
+        return alerts
+
+    def aggregate(self, group_by, **filters):
+        """Alert counts grouped by "type", "zone", "camera", "track" or "hour" (epoch seconds of the hour)"""
+        columns = {
+            "type": "type",
+            "zone": "zone_name",
+            "camera": "camera_id",
+            "track": "track_id",
+            "hour": "CAST(timestamp / 3600 AS INTEGER) * 3600",
+        }
+        if group_by not in columns:
+            raise ValueError(f"Cannot group alerts by {group_by}")
+
+        self.flush()
+        clauses, params = self._where(**filters)
+        sql = f"SELECT {columns[group_by]} AS bucket, COUNT(*), MAX(suspicion_score) FROM alerts"
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += " GROUP BY bucket ORDER BY bucket"
+
+        rows = self._reader().execute(sql, params).fetchall()
+        return [{"key": bucket, "count": count, "max_suspicion_score": max_score}
+                for bucket, count, max_score in rows]
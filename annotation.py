@@ -0,0 +1,106 @@
+import heapq
+from operator import itemgetter
+
+import cv2
+import numpy as np
+
+# Box colors cycled by track ID (BGR)
+PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (211, 188, 0), (209, 99, 0),
+    (203, 56, 255), (255, 149, 200), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+]
+
+
+def score_color(score):
+    """Red for high suspicion, orange for medium, yellow for low"""
+    if score >= 5.0:
+        return (0, 0, 255)
+    if score >= 3.0:
+        return (0, 165, 255)
+    return (0, 255, 255)
+
+
+def draw_boxes(annotated, result):
+    """Draw tracked boxes with "id:N class conf" labels, in place"""
+    boxes = getattr(result, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return
+    boxes = boxes.cpu().numpy()
+    ids = boxes.id.astype(int).tolist() if boxes.id is not None else [None] * len(boxes)
+    names = getattr(result, "names", {}) or {}
+
+    for (x1, y1, x2, y2), track_id, conf, cls in zip(
+        boxes.xyxy.astype(int).tolist(), ids, boxes.conf.tolist(), boxes.cls.astype(int).tolist()
+    ):
+        color = PALETTE[(track_id if track_id is not None else cls) % len(PALETTE)]
+        label = f"{'' if track_id is None else f'id:{track_id} '}{names.get(cls, cls)} {conf:.2f}"
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+        (width, height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        top = max(y1 - height - 4, 0)
+        cv2.rectangle(annotated, (x1, top), (x1 + width + 2, top + height + 4), color, -1)
+        cv2.putText(annotated, label, (x1 + 1, top + height + 1), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+
+def top_scores(scores, k=5):
+    """The k highest (track_id, score) pairs"""
+    return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+
+class AnnotationRenderer:
+    """Draw tracking info, alerts, zones and suspicion scores onto frames.
+
+    Boxes are drawn straight from the tracked detections instead of through
+    `result.plot()`, which copies and redraws the whole frame with its own
+    annotator.
+    """
+
+    def __init__(self, top_k=5):
+        self.top_k = top_k
+
+    def render(self, frame, result, alerts, scores, zones, zones_enabled, quiet):
+        """Annotated copy of the frame; `frame` itself is left untouched"""
+        annotated = frame.copy()
+        draw_boxes(annotated, result)
+        self._draw_alerts(annotated, alerts)
+        if zones_enabled:
+            self._draw_zones(annotated, zones)
+        if quiet:
+            cv2.putText(annotated, "QUIET PERIOD ACTIVE - ALERTS SUPPRESSED", (10, annotated.shape[0] - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        self._draw_scores(annotated, scores)
+        return annotated
+
+    def _draw_zones(self, annotated, zones):
+        # Active intrusion zones with their names
+        for i, zone in enumerate(zones):
+            if isinstance(zone, dict) and not zone.get('active', True):
+                continue
+            zone_points = zone['points'] if isinstance(zone, dict) else zone
+            if len(zone_points) <= 2:  # Need at least 3 points to form a polygon
+                continue
+            points = np.array(zone_points, dtype=np.int32)
+            zone_name = zone.get('name', f"Zone {i+1}") if isinstance(zone, dict) else f"Zone {i+1}"
+            cv2.polylines(annotated, [points], True, (0, 255, 0), 2)
+            cv2.putText(annotated, zone_name, (points[0][0], points[0][1] - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+    def _draw_alerts(self, annotated, alerts):
+        for alert in alerts:
+            x, y = int(alert["location"][0]), int(alert["location"][1])
+            suspicion_score = alert.get("suspicion_score", 0)
+            cv2.circle(annotated, (x, y), 20, score_color(suspicion_score), -1)
+            cv2.putText(
+                annotated,
+                f"{alert['type'].upper()}: ID {alert['track_id']} ({suspicion_score:.1f})",
+                (x - 10, y - 25),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2
+            )
+
+    def _draw_scores(self, annotated, scores):
+        cv2.putText(annotated, "Suspicion Scores:", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        y_offset = 30
+        for track_id, score in top_scores(scores, self.top_k):
+            y_offset += 25
+            cv2.putText(annotated, f"ID {track_id}: {score:.1f}", (10, y_offset),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, score_color(score), 2)
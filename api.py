@@ -1,6 +1,6 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks, HTTPException, Response, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks, HTTPException, Query, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import cv2
@@ -12,21 +12,35 @@ import threading
 import numpy as np
 from typing import List, Dict, Optional, Any
 import base64
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 import uuid
 
+from alert_store import AlertStore
+from behavior_rules import RuleEngine
+from clip_recorder import ClipRecorder
+from frame_cache import FrameCache
+from inference_backend import loaded_models
+from metrics import profiler, registry
+from pipeline import FramePipeline
+from recording import SegmentRecorder
+from scheduler import InferenceScheduler
+from telemetry import TrackTelemetry
+from ws_hub import BroadcastHub
+
 # Import SecurityAnalyzer with proper error handling
 try:
     from detect_and_track import SecurityAnalyzer
+    from camera_engine import MultiCameraEngine
     USE_REAL_ANALYZER = True
     print("Successfully imported SecurityAnalyzer")
 except Exception as e:
     print(f"Error importing SecurityAnalyzer: {e}")
     USE_REAL_ANALYZER = False
+    MultiCameraEngine = None
 
     # Creating a dummy SecurityAnalyzer for testing
     class SecurityAnalyzer:
-        def __init__(self, config):
+        def __init__(self, config, camera_id=None):
             self.config = config
             print("Dummy SecurityAnalyzer initialized")
 
@@ -38,6 +52,13 @@ except Exception as e:
             # Just return the original frame and no alerts
             return frame, []
 
+        def analyze_frame(self, frame):
+            # No detections and no alerts
+            return None, []
+
+        def render_frame(self, frame, results, alerts, scores=None):
+            return frame
+
 # Define data models
 class Alert(BaseModel):
     id: str
@@ -50,6 +71,8 @@ class Alert(BaseModel):
     direction_changes: Optional[int] = None
     zone_id: Optional[int] = None
     zone_name: Optional[str] = None
+    camera_id: Optional[str] = None
+    clip_url: Optional[str] = None
 
 class Zone(BaseModel):
     points: List[List[float]]
@@ -67,6 +90,61 @@ class Config(BaseModel):
     quiet_period_start: str = "22:00"  # Start quiet period (24-hour format)
     quiet_period_end: str = "06:00"    # End quiet period (24-hour format)
     quiet_period_enabled: bool = False  # Enable/disable quiet period
+    jpeg_quality: int = 95  # JPEG quality used for streamed frames (1-100)
+    track_ttl: float = 30.0  # Forget tracks not seen for this many seconds (0 = never)
+    behavior_rules: Dict[str, Dict[str, Any]] = {}  # Per-rule overrides (enabled, weight, thresholds)
+    alert_cooldown: float = 10.0  # Seconds before the same track can alert again
+    direction_hysteresis: float = 5.0  # Pixels of horizontal movement that count as a direction for pacing
+    inference_scheduler: bool = True  # Skip detection on frames without motion while nobody is present
+    motion_threshold: float = 0.002  # Fraction of changed pixels that counts as motion
+    idle_inference_interval: float = 1.0  # Seconds between detections on a static, empty scene
+    active_frame_stride: int = 1  # Detect on every Nth frame while people are present
+    active_hold: float = 2.0  # Seconds to stay at the active rate after the last detection
+    max_extrapolation: float = 0.5  # Seconds skipped frames may move boxes along track velocity
+    inference_imgsz: int = 640  # Model input size (frames/crops are letterboxed to it)
+    tracker: str = "botsort.yaml"  # Single-camera tracker config: "botsort.yaml" (BoT-SORT) or "bytetrack.yaml"
+    roi_mode: str = "full"  # Region sent to the model: "full", "zones" (active zones + margin) or "manual"
+    roi: Optional[List[int]] = None  # [x1, y1, x2, y2] for roi_mode "manual"
+    roi_margin: int = 64  # Pixels added around the zones for roi_mode "zones"
+    roi_tile_size: int = 0  # Split larger ROIs into overlapping tiles of this size (0 = no tiling)
+    roi_tile_overlap: float = 0.2  # Overlap between tiles (fraction of the tile size)
+    clip_recording: bool = True  # Save a video clip around every alert to alert_clips
+    clip_pre_roll: float = 5.0  # Seconds of video kept before the alert
+    clip_post_roll: float = 5.0  # Seconds recorded after the (last overlapping) alert
+    clip_max_length: float = 60.0  # Longest clip overlapping alerts can extend to
+    clip_buffer_mb: float = 64.0  # Memory cap of each camera's pre-roll buffer
+    clip_quality: int = 80  # JPEG quality of frames the recorder has to encode itself
+    recording_enabled: bool = False  # Continuously record processed frames in segments
+    recording_segment_seconds: float = 60.0  # Length of each segment file
+    recording_retention_days: float = 30.0  # Delete segments older than this
+    recording_max_gb: float = 20.0  # Delete the oldest segments beyond this total size (0 = no size limit); overrides retention when too small
+    recording_quality: int = 80  # JPEG quality of recorded frames
+    footage_max_seconds: float = 300.0  # Longest before/after window the footage endpoints serve (each)
+    ws_queue_size: int = 100  # Messages queued per WebSocket client before the slow-client policy applies
+    ws_slow_client_policy: str = "drop_oldest"  # "drop_oldest", "drop_newest" or "disconnect"
+    ws_alert_batch_interval: float = 0.0  # Send alerts in one "new_alerts" message per this many seconds (0 = one by one)
+    ws_send_timeout: float = 5.0  # Disconnect a client whose send blocks longer than this
+    telemetry_rate: float = 10.0  # Track telemetry messages per second and camera (0 = every frame)
+    telemetry_keyframe_interval: float = 5.0  # Seconds between full snapshots of all tracks
+    telemetry_min_delta: float = 2.0  # Pixels a box must move before the track is sent again
+    telemetry_behavior_hold: float = 10.0  # Seconds a behavior stays active after its alert
+    record_overlays: bool = False  # Record annotated frames, drawing them even while nobody watches (False: always raw)
+
+    @field_validator("roi")
+    @classmethod
+    def check_roi(cls, roi):
+        if roi is None:
+            return roi
+        if len(roi) != 4 or min(roi) < 0:
+            raise ValueError("roi must be [x1, y1, x2, y2] with 4 non-negative integers")
+        if roi[2] <= roi[0] or roi[3] <= roi[1]:
+            raise ValueError("roi must have x2 > x1 and y2 > y1")
+        return roi
+
+class CameraSource(BaseModel):
+    id: str
+    source: str  # Can be a number (webcam), path to video file or stream URL
+    config: Optional[Dict[str, Any]] = None  # Per-camera overrides (e.g. zones)
 
 # Create FastAPI app
 app = FastAPI(title="AI Security Guard API")
@@ -87,13 +165,35 @@ os.makedirs("alert_clips", exist_ok=True)
 class AppState:
     def __init__(self):
         self.analyzer = None
-        self.camera = None
-        self.active_connections: List[WebSocket] = []
-        self.alerts: List[Alert] = []
+        self.alerts = AlertStore(os.environ.get("ALERT_DB_PATH", "alerts.db"))  # Persistent, indexed alert history
         self.current_frame = None
         self.processing_active = False
         self.config = Config().dict()
-        self.video_thread = None
+        self.hub = BroadcastHub.from_config(self.config)  # WebSocket fan-out with per-client send queues
+        self.frame_cache = FrameCache(quality=self.config["jpeg_quality"])  # Encode-once JPEG of current_frame
+        self.raw_frame_cache = FrameCache(quality=self.config["jpeg_quality"])  # Same frames without overlays
+        self.telemetry = TrackTelemetry.from_config(  # Binary track deltas for "telemetry" subscribers
+            self.config,
+            # Behavior names that get a bit after clients subscribed go to every telemetry subscriber
+            on_behaviors=lambda behaviors: self.hub.publish({"telemetry_behaviors": behaviors},
+                                                            key="telemetry_behaviors", topic="telemetry")
+        )
+        self.clip_recorder = ClipRecorder.from_config(self.config, directory="alert_clips")  # Pre-roll buffer and alert clips
+        # Continuous segmented recording; its encoded frames feed the clip recorder as well
+        self.recorder = SegmentRecorder.from_config(
+            self.config,
+            directory=os.environ.get("RECORDINGS_DIR", "recordings"),
+            on_frame=lambda camera_id, frame, timestamp, jpeg: self.clip_recorder.add_frame(camera_id, frame, timestamp, jpeg)
+        )
+        self.pipeline = None  # Single-camera capture/inference/annotate pipeline
+        self.engine = None  # Multi-camera engine, created on first /cameras registration
+        self.started_at = time.time()
+        self.model_status = "loading"  # "loading", "ready" or "failed" - reported by /ready
+        self.model_error = None
+        self.ready_at = None
+        self.analyzer_lock = asyncio.Lock()  # One analyzer (and model load) at a time
+        self.warm_start_task = None
+        self.frame_requests = {}  # camera_id -> time of the last /frame poll, which counts as a viewer
 
 app_state = AppState()
 
@@ -101,22 +201,56 @@ app_state = AppState()
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    app_state.active_connections.append(websocket)
+    client = await app_state.hub.connect(websocket)
     try:
         while True:
             # Receive messages from client
             data = await websocket.receive_text()
             try:
                 message = json.loads(data)
+                if not isinstance(message, dict):
+                    app_state.hub.send(client, {"error": "Messages must be JSON objects"})
+                    continue
 
                 # Handle config updates
                 if "config" in message:
+                    if not isinstance(message["config"], dict):
+                        app_state.hub.send(client, {"error": "config must be a JSON object"})
+                        continue
+                    try:
+                        RuleEngine(message["config"].get("behavior_rules"))
+                    except ValueError as e:
+                        app_state.hub.send(client, {"error": f"Invalid behavior_rules: {e}"})
+                        continue
+
                     app_state.config.update(message["config"])
                     if app_state.analyzer:
                         app_state.analyzer.update_config(app_state.config)
+                    apply_config()
 
                     # Broadcast config update to all clients
-                    await broadcast_message({"config_updated": app_state.config})
+                    await broadcast_message({"config_updated": app_state.config}, key="config_updated")
+
+                # Subscribe to binary track telemetry: "telemetry" (all cameras) or "telemetry:<camera_id>"
+                if "subscribe" in message:
+                    topics = ws_topics(message["subscribe"])
+                    if topics is None:
+                        app_state.hub.send(client, {"error": "subscribe takes a topic or a list of topics"})
+                        continue
+                    topics = [topic for topic in topics if topic.split(":", 1)[0] == "telemetry"]
+                    app_state.hub.subscribe(client, topics)
+                    # New subscribers start from a full snapshot
+                    app_state.telemetry.request_keyframe()
+                    app_state.hub.send(client, {"subscribed": sorted(client.subscriptions),
+                                                "telemetry_behaviors": app_state.telemetry.behaviors})
+
+                if "unsubscribe" in message:
+                    topics = ws_topics(message["unsubscribe"])
+                    if topics is None:
+                        app_state.hub.send(client, {"error": "unsubscribe takes a topic or a list of topics"})
+                        continue
+                    app_state.hub.unsubscribe(client, topics)
+                    app_state.hub.send(client, {"subscribed": sorted(client.subscriptions)})
 
                 # Handle camera source change
                 if "camera_source" in message:
@@ -126,24 +260,51 @@ async def websocket_endpoint(websocket: WebSocket):
                 pass
 
     except WebSocketDisconnect:
-        app_state.active_connections.remove(websocket)
+        pass
+    finally:
+        await app_state.hub.disconnect(client)
 
-# Broadcast message to all connected clients
-async def broadcast_message(message):
-    for connection in app_state.active_connections:
-        try:
-            await connection.send_json(message)
-        except:
-            # Remove disconnected clients
-            try:
-                app_state.active_connections.remove(connection)
-            except:
-                pass
+# Topic list of a WebSocket subscribe/unsubscribe message (a string or a list of strings), None if malformed
+def ws_topics(topics):
+    topics = [topics] if isinstance(topics, str) else topics
+    if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+        return None
+    return topics
+
+# Broadcast message to all connected clients (queued per client; slow clients don't hold up the rest)
+async def broadcast_message(message, key=None):
+    app_state.hub.broadcast(message, key)
 
 # Broadcast new alert to all connected clients
 async def broadcast_alert(alert: Alert):
     await broadcast_message({"new_alert": alert.dict()})
 
+# Create the analyzer (loading the shared model) off the event loop so requests are still served
+async def ensure_analyzer():
+    async with app_state.analyzer_lock:
+        if app_state.analyzer is not None:
+            return True
+
+        app_state.model_status = "loading"
+        try:
+            app_state.analyzer = await asyncio.to_thread(SecurityAnalyzer, app_state.config, camera_id="main")
+        except Exception as e:
+            app_state.model_status = "failed"
+            app_state.model_error = str(e)
+            await broadcast_message({"error": f"Failed to initialize SecurityAnalyzer: {e}"})
+            return False
+
+        app_state.model_status = "ready"
+        app_state.model_error = None
+        app_state.ready_at = time.time()
+        print(f"Model ready {app_state.ready_at - app_state.started_at:.1f}s after startup")
+        return True
+
+# Load the model and start the default camera in the background after startup
+async def warm_start():
+    if await ensure_analyzer() and not app_state.processing_active:
+        await restart_camera(app_state.config["camera_source"])
+
 # Initialize or restart the camera
 async def restart_camera(source):
     source_val = source
@@ -155,106 +316,259 @@ async def restart_camera(source):
         pass
 
     # Stop existing processing
-    if app_state.processing_active:
-        app_state.processing_active = False
-        if app_state.camera:
-            app_state.camera.release()
-        if app_state.video_thread and app_state.video_thread.is_alive():
-            app_state.video_thread.join(timeout=1.0)
+    stop_pipeline()
 
     # Update config
     app_state.config["camera_source"] = source
 
-    # Start new camera
-    app_state.camera = cv2.VideoCapture(source_val)
-    if not app_state.camera.isOpened():
-        await broadcast_message({"error": f"Failed to open camera source: {source}"})
+    # Create or update analyzer
+    if app_state.analyzer:
+        app_state.analyzer.update_config(app_state.config)
+    elif not await ensure_analyzer():
         return False
 
-    # Create or update analyzer
-    try:
-        if not app_state.analyzer:
-            app_state.analyzer = SecurityAnalyzer(app_state.config)
-        else:
-            app_state.analyzer.update_config(app_state.config)
-    except Exception as e:
-        await broadcast_message({"error": f"Failed to initialize SecurityAnalyzer: {e}"})
-        app_state.analyzer = SecurityAnalyzer(app_state.config) if not USE_REAL_ANALYZER else None
+    # Start the capture -> inference -> annotate pipeline
+    app_state.pipeline = FramePipeline(
+        source_val,
+        app_state.analyzer,
+        on_frame=set_current_frame,
+        on_alerts=handle_new_alerts,
+        scheduler=InferenceScheduler.from_config(app_state.config),
+        on_analyzed=lambda frame, results, alerts, scores: publish_analysis("main", frame, results, alerts, scores),
+        should_annotate=needs_annotation
+    )
+    if not app_state.pipeline.start():
+        app_state.pipeline = None
+        await broadcast_message({"error": f"Failed to open camera source: {source}"})
         return False
 
-    # Start processing thread
     app_state.processing_active = True
-    app_state.video_thread = threading.Thread(
-        target=process_video_frames,
-        daemon=True
-    )
-    app_state.video_thread.start()
 
     await broadcast_message({"camera_changed": source})
     return True
 
-# Function to process video frames (runs in a separate thread)
-def process_video_frames():
-    while app_state.processing_active:
-        if app_state.camera is None:
-            time.sleep(0.1)
-            continue
-
-        success, frame = app_state.camera.read()
-        if not success:
-            # Try to restart camera after a brief pause
-            time.sleep(1.0)
-            app_state.camera = cv2.VideoCapture(app_state.config["camera_source"])
-            continue
-
-        # Process frame with analyzer
-        try:
-            if app_state.analyzer:
-                processed_frame, new_alerts = app_state.analyzer.process_frame(frame)
-
-                # Update current frame for streaming
-                app_state.current_frame = processed_frame
-
-                # Handle new alerts
-                if new_alerts:
-                    for alert_data in new_alerts:
-                        # Generate unique ID
-                        alert_id = str(uuid.uuid4())
-
-                        # Add ID to alert data
-                        alert_data["id"] = alert_id
-
-                        # Create Alert object
-                        alert = Alert(**alert_data)
-
-                        # Add to alert list
-                        app_state.alerts.append(alert)
-
-                        # Broadcast alert to all clients
-                        asyncio.run(broadcast_alert(alert))
-            else:
-                app_state.current_frame = frame
-        except Exception as e:
-            print(f"Error processing frame: {e}")
-            app_state.current_frame = frame
-
-        # Brief sleep to prevent CPU overload
-        time.sleep(0.01)
-
-# Generate frames for video streaming
-def generate_frames():
-    while app_state.processing_active:
-        if app_state.current_frame is not None:
-            # Convert frame to JPEG
-            ret, buffer = cv2.imencode('.jpg', app_state.current_frame)
-            frame = buffer.tobytes()
-
-            # Yield the frame in the format expected by a multipart response
-            yield (b'--frame\r\n'
-                  b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-        # Brief sleep to control frame rate
-        time.sleep(0.033)  # ~30 FPS
+# Stop the single-camera pipeline if it is running
+def stop_pipeline():
+    app_state.processing_active = False
+    if app_state.pipeline:
+        app_state.pipeline.stop()
+        app_state.pipeline = None
+
+# Publish the latest processed frame for streaming (called by the pipeline's annotate stage)
+def set_current_frame(frame):
+    app_state.current_frame = frame
+    seq = app_state.frame_cache.publish(frame)
+    # Hand the JPEG to the recorders too if viewers already made the encoder produce it
+    if app_state.config["record_overlays"]:
+        record_camera_frame("main", frame, app_state.frame_cache.encoded(seq))
+
+# Record an engine camera's published frame when recordings keep the overlays
+def record_annotated_frame(camera_id, frame, jpeg):
+    if app_state.config["record_overlays"]:
+        record_camera_frame(camera_id, frame, jpeg)
+
+# Whether a recorder takes a camera's annotated frames, so they must be drawn whether or not anyone watches
+def recording_overlays():
+    if not app_state.config["record_overlays"]:
+        return False
+    return app_state.recorder.enabled or app_state.clip_recorder.enabled
+
+# Whether a camera's annotated frames are wanted: recorded with overlays, streamed, or polled in the last seconds.
+# Without record_overlays recorders take the raw frame, so what they keep never depends on who is watching.
+def needs_annotation(camera_id="main"):
+    if recording_overlays():
+        return True
+    if time.time() - app_state.frame_requests.get(camera_id, 0.0) < 2.0:
+        return True
+    if camera_id == "main":
+        return app_state.frame_cache.subscribers > 0
+    stream = app_state.engine.get_camera(camera_id) if app_state.engine else None
+    return stream is not None and stream.frame_cache.subscribers > 0
+
+# Publish a camera's raw frame (main camera only - engine cameras have their own cache), record it
+# unless recordings keep the overlays, and publish track telemetry
+def publish_analysis(camera_id, frame, results, alerts, scores):
+    record_raw = not app_state.config["record_overlays"]
+    if camera_id == "main":
+        seq = app_state.raw_frame_cache.publish(frame)
+        if record_raw:
+            record_camera_frame(camera_id, frame, app_state.raw_frame_cache.encoded(seq))
+    elif record_raw:
+        record_camera_frame(camera_id, frame, None)
+
+    topic = f"telemetry:{camera_id}"
+    if not app_state.hub.has_subscribers(topic):
+        return
+    with profiler.stage("telemetry"):
+        payload = app_state.telemetry.update(camera_id, results, alerts, scores, frame.shape)
+    if payload is not None:
+        app_state.hub.publish(payload, topic=topic)
+
+# Feed a processed frame to the segment recorder (which passes it on to the clip recorder) or the clip recorder alone
+def record_camera_frame(camera_id, frame, jpeg):
+    if app_state.recorder.enabled:
+        app_state.recorder.add_frame(camera_id, frame, jpeg=jpeg)
+    else:
+        app_state.clip_recorder.add_frame(camera_id, frame, jpeg=jpeg)
+
+# Apply settings that live outside the analyzer after a config change
+def apply_config():
+    quality = app_state.config.get("jpeg_quality", 95)
+    app_state.frame_cache.set_quality(quality)
+    app_state.raw_frame_cache.set_quality(quality)
+    app_state.telemetry.update_config(app_state.config)
+    app_state.hub.update_config(app_state.config)
+    app_state.clip_recorder.update_config(app_state.config)
+    app_state.recorder.update_config(app_state.config)
+    if app_state.pipeline and app_state.pipeline.scheduler:
+        app_state.pipeline.scheduler.update_config(app_state.config)
+    if app_state.engine:
+        app_state.engine.update_config(app_state.config)
+
+# Store and broadcast alerts coming from a processing thread
+def handle_new_alerts(new_alerts, camera_id=None):
+    for alert_data in new_alerts:
+        # Generate unique ID
+        alert_id = str(uuid.uuid4())
+
+        # Add ID (and source camera) to alert data
+        alert_data["id"] = alert_id
+        alert_data["camera_id"] = camera_id
+
+        # Clip around the alert (overlapping alerts of a camera share one clip)
+        alert_data["clip_url"] = app_state.clip_recorder.trigger(camera_id or "main", alert_data.get("timestamp"))
+
+        # Create Alert object
+        alert = Alert(**alert_data)
+
+        # Add to the alert store (written to disk in batches)
+        app_state.alerts.add(alert.dict())
+        profiler.count_alerts([alert_data])
+
+        # Hand the alert to the server loop for broadcasting
+        app_state.hub.publish_alert(alert.dict())
+
+# Get the multi-camera engine, creating it on first use
+def get_engine():
+    if app_state.engine is None:
+        if MultiCameraEngine is None:
+            raise HTTPException(status_code=503, detail="Multi-camera engine is not available")
+
+        # Share the already-loaded model with the single-camera analyzer if there is one
+        model = getattr(app_state.analyzer, "model", None)
+        dispatcher = getattr(app_state.analyzer, "dispatcher", None)
+        app_state.engine = MultiCameraEngine(
+            app_state.config,
+            model=model,
+            on_alerts=handle_new_alerts,
+            dispatcher=dispatcher,
+            on_frame=record_annotated_frame,
+            on_analyzed=publish_analysis,
+            should_annotate=needs_annotation
+        )
+    return app_state.engine
+
+# Samples read from the pipeline, engine and connections when /metrics is scraped
+def collect_metrics():
+    yield "model_ready", "gauge", "1 once the model is loaded", (), int(app_state.model_status == "ready")
+    yield "processing_active", "gauge", "1 while the single-camera pipeline runs", (), int(app_state.processing_active)
+    hub = app_state.hub.stats()
+    yield "websocket_clients", "gauge", "Connected WebSocket clients", (), hub["clients"]
+    yield "websocket_queued_messages", "gauge", "Messages waiting in WebSocket client queues", (), hub["queued"]
+    yield "websocket_dropped_messages_total", "counter", "Messages dropped for slow WebSocket clients", (), hub["dropped"]
+    yield "websocket_slow_disconnects_total", "counter", "WebSocket clients disconnected for falling behind", \
+        (), hub["disconnected_slow"]
+    yield "stream_viewers", "gauge", "MJPEG viewers of the main stream", (), app_state.frame_cache.subscribers
+    yield "raw_stream_viewers", "gauge", "MJPEG viewers of the main stream without overlays", (), \
+        app_state.raw_frame_cache.subscribers
+    telemetry = app_state.telemetry.stats()
+    yield "telemetry_messages_total", "counter", "Track telemetry messages encoded", (), telemetry["frames"]
+    yield "telemetry_bytes_total", "counter", "Bytes of track telemetry encoded", (), telemetry["bytes"]
+    yield "frame_encodes_total", "counter", "JPEG encodes of the main stream", (), app_state.frame_cache.encode_count
+    yield "alerts_per_second", "gauge", "Alert rate over the last minute", (), profiler.alerts_per_second()
+
+    clips = app_state.clip_recorder.stats()
+    yield "clip_buffer_bytes", "gauge", "Encoded frames held for alert clip pre-roll", (), clips["buffered_bytes"]
+    yield "alert_clips_total", "counter", "Alert clips written", (), clips["clips"]
+    yield "clip_frames_dropped_total", "counter", "Frames the clip recorder could not keep up with", (), clips["dropped"]
+
+    analyzer = app_state.analyzer
+    if hasattr(analyzer, "tracks"):
+        yield "active_tracks", "gauge", "Tracks currently followed", (("camera", "main"),), len(analyzer.tracks)
+    if hasattr(analyzer, "dispatcher"):
+        stats = analyzer.dispatcher.stats()
+        yield "notification_queue_depth", "gauge", "Alerts waiting for delivery", (), stats["queue_depth"]
+        for key in ("sent", "failed", "dropped"):
+            yield "notifications_total", "counter", "Alert notifications by outcome", (("outcome", key),), stats[key]
+
+    pipeline = app_state.pipeline
+    if pipeline:
+        stats = pipeline.stats()
+        for stage, stage_stats in stats["stages"].items():
+            yield "pipeline_frames_total", "counter", "Frames that completed a pipeline stage", \
+                (("stage", stage),), stage_stats["frames"]
+        for name, queue_stats in stats["queues"].items():
+            yield "pipeline_queue_depth", "gauge", "Frames waiting between pipeline stages", \
+                (("queue", name),), queue_stats["depth"]
+            yield "pipeline_dropped_frames_total", "counter", "Frames dropped by a full stage queue", \
+                (("queue", name),), queue_stats["dropped"]
+        if "scheduler" in stats:
+            yield "inference_skip_fraction", "gauge", "Fraction of frames not sent to the model", \
+                (("camera", "main"),), stats["scheduler"]["skip_fraction"]
+            yield "inference_fps", "gauge", "Frames sent to the model per second", \
+                (("camera", "main"),), stats["scheduler"]["inference_fps"]
+
+    if app_state.engine:
+        for camera in app_state.engine.list_cameras():
+            labels = (("camera", camera["id"]),)
+            yield "active_tracks", "gauge", "Tracks currently followed", labels, camera["active_tracks"]
+            yield "camera_frames_total", "counter", "Frames processed per camera", labels, camera["frames_processed"]
+            yield "camera_dropped_frames_total", "counter", "Frames overwritten before inference", \
+                labels, camera["frames_dropped"]
+            yield "inference_skip_fraction", "gauge", "Fraction of frames not sent to the model", \
+                labels, camera["scheduler"]["skip_fraction"]
+            yield "inference_fps", "gauge", "Frames sent to the model per second", \
+                labels, camera["scheduler"]["inference_fps"]
+
+registry.add_collector(collect_metrics)
+
+# Wrap an encoded JPEG as one part of a multipart MJPEG response
+def multipart_frame(jpeg):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+# Generate frames for video streaming (without overlays for clients drawing them from telemetry)
+async def generate_frames(overlay=True):
+    frame_cache = app_state.frame_cache if overlay else app_state.raw_frame_cache
+    # Each new frame is sent once, as soon as the processing thread publishes it
+    async for frame in frame_cache.subscribe(is_active=lambda: app_state.processing_active):
+        # Yield the frame in the format expected by a multipart response; timed until the client takes it
+        started = time.perf_counter()
+        yield multipart_frame(frame)
+        profiler.record("stream", started)
+
+# Generate frames for one camera of the multi-camera engine
+async def generate_camera_frames(camera_id, overlay=True):
+    stream = app_state.engine.get_camera(camera_id)
+    is_active = lambda: app_state.engine is not None and app_state.engine.get_camera(camera_id) is stream
+    frame_cache = stream.frame_cache if overlay else stream.raw_frame_cache
+    async for frame in frame_cache.subscribe(is_active=is_active):
+        yield multipart_frame(frame)
+
+# Stream a camera's recorded footage around a timestamp as an MJPEG AVI (before/after clamped to footage_max_seconds)
+async def footage_response(camera_id, timestamp, before, after):
+    max_seconds = app_state.config["footage_max_seconds"]
+    start = timestamp - min(max(before, 0.0), max_seconds)
+    end = timestamp + min(max(after, 0.0), max_seconds)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="before + after must be positive")
+    # The index lookup runs off the event loop; StreamingResponse reads the frames in its threadpool
+    chunks = await asyncio.to_thread(app_state.recorder.footage_stream, camera_id, start, end)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="No footage recorded for that time")
+    filename = f"{camera_id}_{int(start)}_{int(end)}.avi"
+    return StreamingResponse(chunks, media_type="video/x-msvideo",
+                             headers={"Content-Disposition": f'inline; filename="{filename}"'})
 
 # API routes
 
@@ -262,43 +576,109 @@ def generate_frames():
 async def root():
     return {"message": "AI Security Guard API is running"}
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded, 503 while it is loading or if it failed"""
+    ready = app_state.model_status == "ready"
+    body = {
+        "ready": ready,
+        "status": app_state.model_status,
+        "error": app_state.model_error,
+        "uptime": time.time() - app_state.started_at,
+        "load_seconds": app_state.ready_at - app_state.started_at if app_state.ready_at else None,
+        "models": loaded_models(),
+        "processing_active": app_state.processing_active,
+    }
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
 @app.get("/stream")
-async def video_feed():
-    """Stream video feed from the camera"""
+async def video_feed(overlay: bool = True):
+    """Stream video feed from the camera (overlay=false: raw frames, to draw overlays from track telemetry)"""
     if not app_state.processing_active:
         await restart_camera(app_state.config["camera_source"])
 
     return StreamingResponse(
-        generate_frames(),
+        generate_frames(overlay),
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
 @app.get("/frame")
 async def get_current_frame():
     """Get the current frame as a JPEG image"""
-    if app_state.current_frame is None:
+    app_state.frame_requests["main"] = time.time()
+    seq, frame_bytes = app_state.frame_cache.get_jpeg()
+    if frame_bytes is None:
         raise HTTPException(status_code=404, detail="No frame available")
 
-    # Convert frame to JPEG
-    ret, buffer = cv2.imencode('.jpg', app_state.current_frame)
-    frame_bytes = buffer.tobytes()
-
-    return Response(content=frame_bytes, media_type="image/jpeg")
+    return Response(content=frame_bytes, media_type="image/jpeg", headers={"X-Frame-Seq": str(seq)})
 
 @app.get("/frame_base64")
 async def get_frame_base64():
     """Get the current frame as a base64 encoded JPEG"""
-    if app_state.current_frame is None:
+    app_state.frame_requests["main"] = time.time()
+    # Base64 form is memoized per frame by the cache
+    seq, data_url = app_state.frame_cache.get_base64()
+    if data_url is None:
         raise HTTPException(status_code=404, detail="No frame available")
 
-    # Convert frame to JPEG
-    ret, buffer = cv2.imencode('.jpg', app_state.current_frame)
-    frame_bytes = buffer.tobytes()
+    return {"frame": data_url, "seq": seq}
 
-    # Convert to base64
-    base64_frame = base64.b64encode(frame_bytes).decode('utf-8')
+@app.get("/pipeline/stats")
+async def get_pipeline_stats():
+    """Per-stage queue depth, drop counts and throughput of the processing pipelines"""
+    return {
+        "pipeline": app_state.pipeline.stats() if app_state.pipeline else None,
+        "frame_cache": app_state.frame_cache.stats(),
+        "raw_frame_cache": app_state.raw_frame_cache.stats(),
+        "telemetry": app_state.telemetry.stats(),
+        "websocket": app_state.hub.stats(),
+        "clip_recorder": app_state.clip_recorder.stats(),
+        "recorder": app_state.recorder.stats(),
+        "notifications": app_state.analyzer.dispatcher.stats() if hasattr(app_state.analyzer, "dispatcher") else None,
+        "cameras": app_state.engine.list_cameras() if app_state.engine else [],
+    }
 
-    return {"frame": f"data:image/jpeg;base64,{base64_frame}"}
+@app.get("/metrics")
+async def get_metrics():
+    """Stage latency histograms, queue depths, drops, tracks, alerts and clients in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/stages")
+async def get_stage_latency():
+    """Per-stage latency summary (seconds) as JSON"""
+    return profiler.summary()
+
+@app.post("/metrics/trace")
+async def start_trace(duration: float = 10.0, max_events: int = 0):
+    """Dump per-stage timings to a Chrome trace file for `duration` seconds"""
+    os.makedirs("traces", exist_ok=True)
+    path = os.path.join("traces", f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    profiler.start_trace(path, max_events)
+
+    # Stop this trace after `duration` unless another one replaced it
+    trace = profiler.trace
+    asyncio.get_running_loop().call_later(duration, profiler.stop_trace, trace)
+    return {"trace_file": path, "duration": duration}
+
+@app.delete("/metrics/trace")
+async def stop_trace():
+    """Stop a running trace dump"""
+    path = profiler.stop_trace()
+    if path is None:
+        raise HTTPException(status_code=404, detail="No trace is running")
+    return {"trace_file": path}
+
+@app.get("/recordings")
+async def list_recordings(camera_id: Optional[str] = None, start: Optional[float] = None,
+                          end: Optional[float] = None, limit: int = Query(1000, ge=1, le=10000)):
+    """Recorded segments overlapping [start, end]"""
+    segments = await asyncio.to_thread(app_state.recorder.list_segments, camera_id, start, end, limit)
+    return {"segments": segments, "stats": app_state.recorder.stats()}
+
+@app.get("/recordings/footage")
+async def get_footage(timestamp: float, before: float = 10.0, after: float = 10.0, camera_id: str = "main"):
+    """Recorded footage of a camera around a timestamp, located through the segment index"""
+    return await footage_response(camera_id, timestamp, before, after)
 
 @app.get("/config")
 async def get_config():
@@ -308,12 +688,24 @@ async def get_config():
 @app.post("/config")
 async def update_config(config: Config):
     """Update the configuration"""
+    # Reject unknown behavior rules and bad rule parameters before anything is applied
+    try:
+        RuleEngine(config.behavior_rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     app_state.config = config.dict()
     if app_state.analyzer:
         app_state.analyzer.update_config(app_state.config)
+    apply_config()
 
     return app_state.config
 
+@app.get("/behavior_rules")
+async def get_behavior_rules():
+    """Registered behavior rules with the parameters currently in effect"""
+    return RuleEngine(app_state.config.get("behavior_rules")).describe()
+
 @app.post("/camera/{source}")
 async def change_camera(source: str):
     """Change the camera source"""
@@ -323,42 +715,165 @@ async def change_camera(source: str):
     else:
         raise HTTPException(status_code=400, detail=f"Failed to change camera to {source}")
 
-@app.get("/alerts")
-async def get_alerts(limit: int = 20, offset: int = 0):
-    """Get alerts with pagination"""
-    total = len(app_state.alerts)
-    alerts = app_state.alerts[offset:offset+limit]
+@app.get("/cameras")
+async def list_cameras():
+    """List cameras served by the multi-camera engine"""
+    if not app_state.engine:
+        return {"cameras": []}
+    return {"cameras": app_state.engine.list_cameras()}
+
+@app.post("/cameras")
+async def add_camera(camera: CameraSource):
+    """Register a camera with the multi-camera engine"""
+    # The first registration may have to load the model
+    engine = await asyncio.to_thread(get_engine)
+    if engine.get_camera(camera.id):
+        raise HTTPException(status_code=409, detail=f"Camera {camera.id} already exists")
+
+    success = await asyncio.to_thread(engine.add_camera, camera.id, camera.source, camera.config)
+    if not success:
+        raise HTTPException(status_code=400, detail=f"Failed to open camera source: {camera.source}")
+
+    await broadcast_message({"camera_added": camera.id})
+    return {"message": f"Camera {camera.id} added", "id": camera.id}
+
+@app.delete("/cameras/{camera_id}")
+async def remove_camera(camera_id: str):
+    """Stop and remove a camera from the multi-camera engine"""
+    if not app_state.engine or not app_state.engine.remove_camera(camera_id):
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+    app_state.telemetry.forget(camera_id)
+
+    await broadcast_message({"camera_removed": camera_id})
+    return {"message": f"Camera {camera_id} removed"}
+
+@app.get("/cameras/{camera_id}/stream")
+async def camera_feed(camera_id: str, overlay: bool = True):
+    """Stream the processed video feed of one camera (overlay=false: raw frames)"""
+    if not app_state.engine or not app_state.engine.get_camera(camera_id):
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+
+    return StreamingResponse(
+        generate_camera_frames(camera_id, overlay),
+        media_type="multipart/x-mixed-replace; boundary=frame"
+    )
+
+@app.get("/cameras/{camera_id}/frame")
+async def get_camera_frame(camera_id: str):
+    """Get the current frame of one camera as a JPEG image"""
+    stream = app_state.engine.get_camera(camera_id) if app_state.engine else None
+    if stream is None:
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+    app_state.frame_requests[camera_id] = time.time()
+    seq, frame_bytes = stream.frame_cache.get_jpeg()
+    if frame_bytes is None:
+        raise HTTPException(status_code=404, detail="No frame available")
+
+    return Response(content=frame_bytes, media_type="image/jpeg", headers={"X-Frame-Seq": str(seq)})
+
+# Query the alert store and shape the paginated response
+def query_alerts(limit, offset, cursor, order, include_total, filters):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+
+    try:
+        alerts, next_cursor = app_state.alerts.query(
+            limit=limit, offset=offset, cursor=cursor, order=order, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return {
-        "total": total,
+        "total": app_state.alerts.count(**filters) if include_total else None,
         "limit": limit,
         "offset": offset,
-        "alerts": [alert.dict() for alert in alerts]
+        "next_cursor": next_cursor,
+        "alerts": alerts
+    }
+
+@app.get("/cameras/{camera_id}/alerts")
+async def get_camera_alerts(camera_id: str, limit: int = Query(20, ge=1, le=1000), offset: int = Query(0, ge=0),
+                            cursor: Optional[str] = None, order: str = "asc", type: Optional[str] = None,
+                            track_id: Optional[int] = None,
+                            zone_name: Optional[str] = None, start_time: Optional[float] = None,
+                            end_time: Optional[float] = None, min_score: Optional[float] = None,
+                            include_total: bool = True):
+    """Get alerts raised by one camera with filters and pagination"""
+    if not app_state.engine or not app_state.engine.get_camera(camera_id):
+        raise HTTPException(status_code=404, detail=f"Camera {camera_id} not found")
+
+    filters = {
+        "camera_id": camera_id, "type": type, "track_id": track_id, "zone_name": zone_name,
+        "start_time": start_time, "end_time": end_time, "min_score": min_score,
+    }
+    response = await asyncio.to_thread(query_alerts, limit, offset, cursor, order, include_total, filters)
+    response["camera_id"] = camera_id
+    return response
+
+@app.get("/alerts")
+async def get_alerts(limit: int = Query(20, ge=1, le=1000), offset: int = Query(0, ge=0),
+                     cursor: Optional[str] = None, order: str = "asc",
+                     type: Optional[str] = None, track_id: Optional[int] = None,
+                     zone_name: Optional[str] = None, camera_id: Optional[str] = None,
+                     start_time: Optional[float] = None, end_time: Optional[float] = None,
+                     min_score: Optional[float] = None, include_total: bool = True):
+    """Get alerts with server-side filters and offset or cursor pagination
+
+    Pass the returned next_cursor back as `cursor` to get the following page;
+    time range is [start_time, end_time) in epoch seconds.
+    """
+    filters = {
+        "type": type, "track_id": track_id, "zone_name": zone_name, "camera_id": camera_id,
+        "start_time": start_time, "end_time": end_time, "min_score": min_score,
+    }
+    return await asyncio.to_thread(query_alerts, limit, offset, cursor, order, include_total, filters)
+
+@app.get("/alerts/aggregate")
+async def aggregate_alerts(group_by: str = "type", type: Optional[str] = None,
+                           track_id: Optional[int] = None, zone_name: Optional[str] = None,
+                           camera_id: Optional[str] = None, start_time: Optional[float] = None,
+                           end_time: Optional[float] = None, min_score: Optional[float] = None):
+    """Count alerts per type, zone, camera, track or hour, with the same filters as /alerts"""
+    filters = {
+        "type": type, "track_id": track_id, "zone_name": zone_name, "camera_id": camera_id,
+        "start_time": start_time, "end_time": end_time, "min_score": min_score,
     }
+    try:
+        buckets = await asyncio.to_thread(app_state.alerts.aggregate, group_by, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"group_by": group_by, "buckets": buckets}
 
 @app.get("/alerts/{alert_id}")
 async def get_alert(alert_id: str):
     """Get a specific alert by ID"""
-    for alert in app_state.alerts:
-        if alert.id == alert_id:
-            return alert
+    alert = await asyncio.to_thread(app_state.alerts.get, alert_id)
+    if alert is not None:
+        return alert
 
     raise HTTPException(status_code=404, detail=f"Alert with ID {alert_id} not found")
 
+@app.get("/alerts/{alert_id}/footage")
+async def get_alert_footage(alert_id: str, before: float = 10.0, after: float = 10.0):
+    """Recorded footage from `before` seconds before an alert until `after` seconds after it"""
+    alert = await asyncio.to_thread(app_state.alerts.get, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail=f"Alert with ID {alert_id} not found")
+    return await footage_response(alert.get("camera_id") or "main", alert["timestamp"], before, after)
+
 @app.delete("/alerts/{alert_id}")
 async def delete_alert(alert_id: str):
     """Delete a specific alert"""
-    for i, alert in enumerate(app_state.alerts):
-        if alert.id == alert_id:
-            del app_state.alerts[i]
-            return {"message": f"Alert {alert_id} deleted"}
+    if await asyncio.to_thread(app_state.alerts.delete, alert_id):
+        return {"message": f"Alert {alert_id} deleted"}
 
     raise HTTPException(status_code=404, detail=f"Alert with ID {alert_id} not found")
 
 @app.delete("/alerts")
 async def clear_alerts():
     """Clear all alerts"""
-    app_state.alerts = []
+    await asyncio.to_thread(app_state.alerts.clear)
     return {"message": "All alerts cleared"}
 
 @app.post("/start")
@@ -379,34 +894,50 @@ async def stop_processing():
     if not app_state.processing_active:
         return {"message": "Processing already stopped"}
 
-    app_state.processing_active = False
-    if app_state.camera:
-        app_state.camera.release()
-        app_state.camera = None
-
-    if app_state.video_thread and app_state.video_thread.is_alive():
-        app_state.video_thread.join(timeout=1.0)
+    stop_pipeline()
 
     return {"message": "Processing stopped"}
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application on startup"""
-    # Start with default camera
-    await restart_camera(app_state.config["camera_source"])
+    # Alerts from processing threads are handed to this loop for broadcasting
+    app_state.hub.attach(asyncio.get_running_loop())
+
+    # Load the model and start the default camera in the background; / and /config answer meanwhile
+    app_state.warm_start_task = asyncio.create_task(warm_start())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
-    app_state.processing_active = False
-    if app_state.camera:
-        app_state.camera.release()
+    stop_pipeline()
+
+    if app_state.engine:
+        app_state.engine.stop()
+
+    # Close the open recording segments, then write clips that are still collecting post-roll
+    app_state.recorder.stop()
+    app_state.clip_recorder.stop()
+
+    # Write buffered alerts to disk
+    await asyncio.to_thread(app_state.alerts.close)
+
+    # Finish a running trace dump so the file is complete
+    profiler.stop_trace()
+
+    # Flush pending alert notifications
+    if hasattr(app_state.analyzer, "dispatcher"):
+        app_state.analyzer.dispatcher.stop()
 
-    if app_state.video_thread and app_state.video_thread.is_alive():
-        app_state.video_thread.join(timeout=1.0)
+# Saved alert clips, without the .part files of clips that are still being written
+class ClipFiles(StaticFiles):
+    async def get_response(self, path, scope):
+        if path.endswith(".part"):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return await super().get_response(path, scope)
 
 # Serve static files (e.g., saved clips)
-app.mount("/clips", StaticFiles(directory="alert_clips"), name="clips")
+app.mount("/clips", ClipFiles(directory="alert_clips"), name="clips")
 
 # Run the API server
 if __name__ == "__main__":
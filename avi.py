@@ -0,0 +1,136 @@
+import struct
+
+# Size of the RIFF/hdrl/movi headers written before the first frame
+HEADER_SIZE = 224
+
+
+def _headers(width, height, fps, n_frames, max_size, movi_size, index_size):
+    fps = max(1, int(round(fps)))
+    avih = struct.pack(
+        "<10I16x",
+        1000000 // fps,            # microseconds per frame
+        max_size * fps,            # max bytes per second
+        0,                         # padding granularity
+        0x10,                      # AVIF_HASINDEX
+        n_frames,                  # total frames
+        0,                         # initial frames
+        1,                         # streams
+        max_size,                  # suggested buffer size
+        width,
+        height,
+    )
+    strh = struct.pack(
+        "<4s4sI2H8I4h",
+        b"vids", b"MJPG",
+        0, 0, 0,                   # flags, priority, language
+        0,                         # initial frames
+        1, fps,                    # scale, rate (frames per second = rate / scale)
+        0, n_frames,               # start, length
+        max_size,
+        0xFFFFFFFF,                # default quality
+        0,                         # sample size
+        0, 0, width, height,       # frame rectangle
+    )
+    strf = struct.pack("<I2i2H4s5I", 40, width, height, 1, 24, b"MJPG", width * height * 3, 0, 0, 0, 0)
+
+    def chunk(fourcc, data):
+        return fourcc + struct.pack("<I", len(data)) + data
+
+    def riff_list(fourcc, data):
+        return b"LIST" + struct.pack("<I", len(data) + 4) + fourcc + data
+
+    strl = riff_list(b"strl", chunk(b"strh", strh) + chunk(b"strf", strf))
+    hdrl = riff_list(b"hdrl", chunk(b"avih", avih) + strl)
+    riff_size = 4 + len(hdrl) + 8 + movi_size + (8 + index_size if index_size else 0)
+    return (b"RIFF" + struct.pack("<I", riff_size) + b"AVI " + hdrl +
+            b"LIST" + struct.pack("<I", movi_size) + b"movi")
+
+
+class MjpegAviWriter:
+    """Append already-encoded JPEG frames to an MJPEG AVI file without decoding them.
+
+    Frames are written as they come; the headers are rewritten with the final
+    frame count, rate and sizes (and the index appended) on close. `write`
+    returns the byte offset of the frame's chunk, so readers can seek straight
+    to it with `scan_frames`.
+    """
+
+    def __init__(self, file, width, height):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.index = []
+        self.max_size = 0
+        self.offset = HEADER_SIZE  # where the next chunk goes
+
+        # Placeholder headers, rewritten on close
+        self.file.write(_headers(width, height, 1, 0, 0, 4, 0))
+
+    def write(self, jpeg):
+        offset = self.offset
+        padded = jpeg + (b"\0" if len(jpeg) % 2 else b"")
+        self.file.write(b"00dc" + struct.pack("<I", len(jpeg)) + padded)
+        # Index offsets are relative to the "movi" fourcc
+        self.index.append((offset - (HEADER_SIZE - 4), len(jpeg)))
+        self.max_size = max(self.max_size, len(jpeg))
+        self.offset += 8 + len(padded)
+        return offset
+
+    @property
+    def frames(self):
+        return len(self.index)
+
+    def close(self, fps):
+        """Write the index and final headers; the file object is left open"""
+        movi_size = self.offset - (HEADER_SIZE - 4)
+        index = b"".join(struct.pack("<4s3I", b"00dc", 0x10, offset, size) for offset, size in self.index)
+        self.file.write(b"idx1" + struct.pack("<I", len(index)) + index)
+        self.file.seek(0)
+        self.file.write(_headers(self.width, self.height, fps, len(self.index), self.max_size,
+                                 movi_size, len(index)))
+        self.file.seek(0, 2)
+
+
+def write_mjpeg_avi(path, frames, fps, width, height):
+    """Mux already-encoded JPEG frames into an MJPEG AVI file"""
+    with open(path, "wb") as f:
+        writer = MjpegAviWriter(f, width, height)
+        for jpeg in frames:
+            writer.write(jpeg)
+        writer.close(fps)
+
+
+def stream_mjpeg_avi(sizes, frames, fps, width, height):
+    """Yield an MJPEG AVI chunk by chunk; `sizes` (the byte size of every frame) must be known up front
+    so the headers can go first, `frames` is read lazily"""
+    index = []
+    offset = 4  # Index offsets are relative to the "movi" fourcc
+    for size in sizes:
+        index.append(struct.pack("<4s3I", b"00dc", 0x10, offset, size))
+        offset += 8 + size + (size % 2)
+    index = b"".join(index)
+
+    yield _headers(width, height, fps, len(sizes), max(sizes, default=0), offset, len(index))
+    for jpeg in frames:
+        yield b"00dc" + struct.pack("<I", len(jpeg)) + jpeg + (b"\0" if len(jpeg) % 2 else b"")
+    yield b"idx1" + struct.pack("<I", len(index)) + index
+
+
+def scan_frames(file, start, end=None):
+    """(offset, size) of the JPEG frame chunks stored from byte offset `start` up to `end`
+    (or the last complete chunk); only the chunk headers are read"""
+    file.seek(0, 2)
+    limit = file.tell() if end is None else min(end, file.tell())
+    chunks = []
+    position = start
+    while position + 8 <= limit:
+        file.seek(position)
+        header = file.read(8)
+        if len(header) < 8 or header[:4] != b"00dc":
+            break  # index or a chunk still being written
+        size = struct.unpack("<I", header[4:])[0]
+        if position + 8 + size > limit:
+            break
+        chunks.append((position + 8, size))
+        position += 8 + size + (size % 2)
+    return chunks
@@ -0,0 +1,407 @@
+"""Headless batch analysis of recorded footage.
+
+Long videos are split into time segments that are analyzed in parallel by a
+process pool (one YOLO model per worker process). Every segment starts a
+little early (the overlap) so tracks and loitering timers are warmed up by the
+time its own part begins; alerts from the overlap are left to the previous
+segment. Track IDs are stitched across segment boundaries by matching the
+boxes both segments saw in the overlap, and alerts are written as JSONL or
+Parquet.
+
+    python batch_analyze.py footage/*.mp4 -o alerts.jsonl --workers 8
+    python batch_analyze.py footage/ -o alerts.parquet --segment 300 --overlap 20 --config zones.json
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg", ".ts", ".webm")
+
+# Per-process state of pool workers (the model is loaded once per worker)
+_worker_model = None
+
+
+def find_videos(paths):
+    """Expand files, directories and glob patterns into a sorted list of video files"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in files
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.exists(path):
+            videos.append(path)
+        else:
+            videos.extend(glob.glob(path))
+    return sorted(set(videos))
+
+
+def probe_video(path):
+    """Return (frame_count, fps) of a video file"""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return 0, 0.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        return frame_count, fps
+    finally:
+        capture.release()
+
+
+def plan_segments(frame_count, fps, segment_seconds, overlap_seconds):
+    """Split a video into segments of frames: (start, core_start, core_end, tail_start).
+
+    A segment reads frames [start, core_end). Alerts are kept for [core_start,
+    core_end) only; [start, core_start) is warm-up shared with the previous
+    segment and [tail_start, core_end) is the part shared with the next one.
+    """
+    segment_frames = max(1, int(round(segment_seconds * fps)))
+    overlap_frames = max(0, int(round(overlap_seconds * fps)))
+
+    segments = []
+    for core_start in range(0, frame_count, segment_frames):
+        core_end = min(core_start + segment_frames, frame_count)
+        start = max(0, core_start - overlap_frames)
+        tail_start = max(core_start, core_end - overlap_frames) if core_end < frame_count else core_end
+        segments.append((start, core_start, core_end, tail_start))
+    return segments
+
+
+def _init_worker(model_path, backend, imgsz, threads):
+    # Runs once in every pool process: split the cores between workers and load the model
+    global _worker_model
+    from inference_backend import load_model
+
+    cv2.setNumThreads(1)
+    _worker_model = load_model(model_path, backend=backend, imgsz=imgsz, threads=threads)
+
+
+def analyze_segment(task):
+    """Analyze one segment of a video in a pool worker; returns its alerts and overlap boxes"""
+    from camera_engine import create_tracker, track_detections
+    from detect_and_track import SecurityAnalyzer
+    from notifiers import NotificationDispatcher
+    from roi import RegionPlanner, predict_regions
+
+    video, index, (start, core_start, core_end, tail_start), fps = task["video"], task["index"], task["segment"], task["fps"]
+    started = time.time()
+
+    # Fresh analyzer and tracker per segment; no audio, quiet period or notifications for offline runs
+    config = dict(task["config"])
+    config.update({"audio_alerts": False, "quiet_period_enabled": False})
+    analyzer = SecurityAnalyzer(config, model=_worker_model, dispatcher=NotificationDispatcher())
+    tracker = create_tracker(task["tracker_config"], frame_rate=max(1, int(round(fps))))
+    planner = RegionPlanner(analyzer.config)
+
+    alerts = []
+    head, tail = {}, {}  # frame -> (track_ids, xyxy) inside the overlaps
+    frames_read = 0
+
+    capture = cv2.VideoCapture(video)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    frame_idx = start
+    try:
+        while frame_idx < core_end:
+            # Read a batch of frames and detect people in all of them with one predict call
+            frames = []
+            while frame_idx + len(frames) < core_end and len(frames) < task["batch_size"]:
+                success, frame = capture.read()
+                if not success:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+
+            # Only each frame's ROI crops (or the full frame) go to the model
+            results = predict_regions(
+                _worker_model,
+                [(frame, planner.regions(frame.shape)) for frame in frames],
+                conf=analyzer.config["confidence_threshold"],
+                imgsz=analyzer.config["inference_imgsz"]
+            )
+
+            for result in results:
+                result = track_detections(tracker, result)
+                if analyzer.has_tracked_boxes([result]):
+                    boxes = result.boxes.cpu().numpy()
+                    track_ids = boxes.id.astype(int)
+                    video_time = frame_idx / fps
+
+                    frame_alerts = analyzer.analyze_detections(
+                        track_ids, boxes.xyxy, boxes.conf, task["start_time"] + video_time
+                    )
+                    if frame_idx >= core_start:
+                        for alert in frame_alerts:
+                            alert.update({"video": video, "frame": frame_idx, "video_time": video_time})
+                        alerts.extend(frame_alerts)
+
+                    # Boxes seen in the overlaps are what segments are stitched on
+                    if frame_idx < core_start:
+                        head[frame_idx] = (track_ids.tolist(), boxes.xyxy.tolist())
+                    if frame_idx >= tail_start:
+                        tail[frame_idx] = (track_ids.tolist(), boxes.xyxy.tolist())
+                frame_idx += 1
+            frames_read += len(frames)
+    finally:
+        capture.release()
+
+    return {
+        "video": video,
+        "index": index,
+        "alerts": alerts,
+        "head": head,
+        "tail": tail,
+        "frames": frames_read,
+        "elapsed": time.time() - started,
+    }
+
+
+def box_iou(a, b):
+    """(len(a), len(b)) IoU matrix of two sets of [x1,y1,x2,y2] boxes"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.where(union > 0, union, 1), 0.0)
+
+
+def match_tracks(tail, head, iou_threshold=0.5, min_frames=3):
+    """Map track IDs of a segment's head to the previous segment's tail IDs they overlap with.
+
+    Tracks are compared on the frames both segments saw; pairs are matched
+    greedily by mean IoU over the frames they share.
+    """
+    iou_sums, shared = {}, {}
+    for frame_idx in sorted(set(tail) & set(head)):
+        tail_ids, tail_boxes = tail[frame_idx]
+        head_ids, head_boxes = head[frame_idx]
+        iou = box_iou(tail_boxes, head_boxes)
+        for i, j in zip(*np.nonzero(iou > 0)):
+            key = (tail_ids[i], head_ids[j])
+            iou_sums[key] = iou_sums.get(key, 0.0) + iou[i, j]
+            shared[key] = shared.get(key, 0) + 1
+
+    n_frames = len(set(tail) & set(head))
+    candidates = sorted(
+        ((iou_sums[key] / shared[key], key) for key in iou_sums
+         if shared[key] >= min(min_frames, n_frames)),
+        reverse=True
+    )
+
+    matches, used_tail = {}, set()
+    for mean_iou, (tail_id, head_id) in candidates:
+        if mean_iou < iou_threshold:
+            break
+        if tail_id in used_tail or head_id in matches:
+            continue
+        matches[head_id] = tail_id
+        used_tail.add(tail_id)
+    return matches
+
+
+def stitch_segments(results, iou_threshold=0.5):
+    """Rewrite per-segment track IDs of one video's alerts to video-wide IDs; returns the alerts"""
+    alerts = []
+    next_id = 1
+    previous = None
+    previous_ids = {}
+
+    for result in sorted(results, key=lambda r: r["index"]):
+        global_ids = {}
+        if previous is not None:
+            for head_id, tail_id in match_tracks(previous["tail"], result["head"], iou_threshold).items():
+                if tail_id in previous_ids:
+                    global_ids[head_id] = previous_ids[tail_id]
+
+        # New IDs for tracks that did not continue from the previous segment
+        local_ids = [alert["track_id"] for alert in result["alerts"]]
+        local_ids += sorted({track_id for track_ids, _ in result["tail"].values() for track_id in track_ids})
+        for local_id in local_ids:
+            if local_id not in global_ids:
+                global_ids[local_id] = next_id
+                next_id += 1
+
+        for alert in result["alerts"]:
+            alert["segment"] = result["index"]
+            alert["segment_track_id"] = alert["track_id"]
+            alert["track_id"] = global_ids[alert["track_id"]]
+            alerts.append(alert)
+
+        previous, previous_ids = result, global_ids
+    return alerts
+
+
+def write_alerts(alerts, output, output_format=None):
+    """Write alerts to a .jsonl or .parquet file (format taken from the extension unless given)"""
+    if output_format is None:
+        output_format = "parquet" if output.lower().endswith(".parquet") else "jsonl"
+
+    if output_format == "parquet":
+        try:
+            import pandas as pd
+            pd.DataFrame(alerts).to_parquet(output, index=False)
+        except ImportError as e:
+            raise SystemExit(f"Parquet output needs pandas and pyarrow: {e}")
+    else:
+        with open(output, "w") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + "\n")
+
+
+def run_batch(videos, output, config=None, workers=None, segment_seconds=300.0, overlap_seconds=20.0,
+              batch_size=8, model_path="yolov8n.pt", tracker_config="bytetrack.yaml",
+              output_format=None, iou_threshold=0.5, start_times=None, backend="auto"):
+    """Analyze videos across a process pool and write their stitched alerts; returns a summary"""
+    from inference_backend import export_model, resolve_backend
+
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    imgsz = (config or {}).get("inference_imgsz", 640)
+
+    # Export once up front so the workers only load the cached artifact
+    backend = resolve_backend(backend)
+    if backend != "torch":
+        try:
+            export_model(model_path, backend, imgsz)
+        except Exception as e:
+            print(f"Could not export to {backend} ({e}), using PyTorch")
+            backend = "torch"
+    started = time.time()
+
+    tasks = []
+    total_frames = 0
+    for video in videos:
+        frame_count, fps = probe_video(video)
+        if frame_count <= 0:
+            print(f"Skipping {video}: cannot read video")
+            continue
+        total_frames += frame_count
+
+        start_time = (start_times or {}).get(video, 0.0)
+        for index, segment in enumerate(plan_segments(frame_count, fps, segment_seconds, overlap_seconds)):
+            tasks.append({
+                "video": video,
+                "index": index,
+                "segment": segment,
+                "fps": fps,
+                "config": config or {},
+                "tracker_config": tracker_config,
+                "batch_size": batch_size,
+                "start_time": start_time,
+            })
+
+    print(f"{len(videos)} videos, {total_frames} frames, {len(tasks)} segments on {workers} workers")
+
+    results = {}
+    frames_done = 0
+    # Spawned (not forked) workers so every process gets a clean torch runtime
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(model_path, backend, imgsz, threads)) as pool:
+        futures = [pool.submit(analyze_segment, task) for task in tasks]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Segment failed: {e}")
+                continue
+
+            results.setdefault(result["video"], []).append(result)
+            frames_done += result["frames"]
+            elapsed = time.time() - started
+            print(f"{os.path.basename(result['video'])} segment {result['index']}: "
+                  f"{len(result['alerts'])} alerts, {result['frames'] / max(result['elapsed'], 1e-6):.1f} fps "
+                  f"({frames_done}/{total_frames} frames, {frames_done / max(elapsed, 1e-6):.1f} fps overall)")
+
+    alerts = []
+    for video in videos:
+        if video in results:
+            alerts.extend(stitch_segments(results[video], iou_threshold))
+    alerts.sort(key=lambda alert: (alert["video"], alert["frame"]))
+
+    write_alerts(alerts, output, output_format)
+
+    elapsed = time.time() - started
+    summary = {
+        "videos": len(videos),
+        "segments": len(tasks),
+        "frames": frames_done,
+        "alerts": len(alerts),
+        "elapsed": elapsed,
+        "fps": frames_done / elapsed if elapsed > 0 else 0.0,
+    }
+    print(f"Wrote {len(alerts)} alerts to {output} in {elapsed:.1f}s ({summary['fps']:.1f} fps)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded footage offline across a process pool")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="alerts.jsonl", help="Output file (.jsonl or .parquet)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="Output format (default: from extension)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--segment", type=float, default=300.0, help="Segment length in seconds")
+    parser.add_argument("--overlap", type=float, default=20.0,
+                        help="Seconds each segment starts early to warm up tracks (keep above loitering_threshold)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per model.predict call")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO weights")
+    parser.add_argument("--backend", default="auto", choices=["auto", "torch", "onnx", "openvino"],
+                        help="Inference backend (exported models are cached in models/)")
+    parser.add_argument("--tracker", default="bytetrack.yaml", help="Ultralytics tracker config")
+    parser.add_argument("--config", help="JSON file with analyzer config (zones, thresholds, behavior rules)")
+    parser.add_argument("--iou", type=float, default=0.5, help="Mean IoU needed to stitch tracks across segments")
+    parser.add_argument("--start-time", type=float, default=None,
+                        help="Epoch time of the first frame (default: file modification time minus duration)")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        raise SystemExit("No videos found")
+
+    config = None
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+
+    # Alert timestamps are wall-clock times of the recording
+    start_times = {}
+    for video in videos:
+        if args.start_time is not None:
+            start_times[video] = args.start_time
+        else:
+            frame_count, fps = probe_video(video)
+            start_times[video] = os.path.getmtime(video) - (frame_count / fps if fps else 0.0)
+
+    run_batch(
+        videos,
+        args.output,
+        config=config,
+        workers=args.workers,
+        segment_seconds=args.segment,
+        overlap_seconds=args.overlap,
+        batch_size=args.batch_size,
+        model_path=args.model,
+        tracker_config=args.tracker,
+        output_format=args.format,
+        iou_threshold=args.iou,
+        start_times=start_times,
+        backend=args.backend,
+    )
+
+
+if __name__ == "__main__":
+    main()
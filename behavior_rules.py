@@ -0,0 +1,395 @@
+import abc
+import math
+
+import numpy as np
+
+# Registered behavior rules (name -> rule class), evaluated in registration order
+RULES = {}
+
+# Escalation to a high_risk alert when a track shows several behaviors at once or its score gets high
+HIGH_RISK_DEFAULTS = {
+    "enabled": True,
+    "min_behaviors": 2,      # Behaviors in one evaluation that make a track high risk
+    "score_threshold": 5.0,  # Suspicion score that makes a track high risk
+}
+HIGH_RISK_MINIMUMS = {"min_behaviors": 1, "score_threshold": 0.0}
+
+# Strings accepted for boolean parameters (JSON clients and query strings send "false")
+BOOL_STRINGS = {"true": True, "1": True, "yes": True, "on": True,
+                "false": False, "0": False, "no": False, "off": False}
+
+
+def coerce_param(owner, key, value, default, minimum=None):
+    """Convert a parameter override to the type of its default and check its lower bound.
+
+    Raises ValueError naming owner.key when the value can't be converted or is
+    out of range, so a bad config is rejected before it reaches the pipeline.
+    """
+    label = f"{owner}.{key}"
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str) and value.strip().lower() in BOOL_STRINGS:
+            return BOOL_STRINGS[value.strip().lower()]
+        raise ValueError(f"{label} must be a boolean, got {value!r}")
+
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{label} must be a number, got {value!r}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{label} must be a number, got {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{label} must be finite, got {value!r}")
+    if isinstance(default, int):
+        if not number.is_integer():
+            raise ValueError(f"{label} must be an integer, got {value!r}")
+        number = int(number)
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{label} must be at least {minimum}, got {value!r}")
+    return number
+
+
+def coerce_params(owner, defaults, overrides, minimums):
+    """defaults updated with the validated overrides; unknown keys raise ValueError"""
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{owner} parameters must be an object, got {overrides!r}")
+    unknown = set(overrides) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown {owner} parameters: {', '.join(sorted(map(str, unknown)))}")
+
+    params = dict(defaults)
+    for key, value in overrides.items():
+        params[key] = coerce_param(owner, key, value, defaults[key], minimums.get(key))
+    return params
+
+
+def register_rule(rule_class):
+    """Class decorator adding a BehaviorRule subclass to the registry under its name"""
+    RULES[rule_class.name] = rule_class
+    return rule_class
+
+
+class TrackFeatures:
+    """Per-frame features of the tracks being analyzed, computed on first use.
+
+    Rules declare which of FEATURES they read; the engine only ever asks for
+    those, so features no enabled rule needs are never computed.
+    """
+
+    FEATURES = ("history", "duration", "position_variance", "speed", "direction_changes", "zone_hits")
+
+    def __init__(self, tracks, track_ids, current_time, zone_index, zone_hits=None):
+        self.tracks = tracks
+        self.track_ids = track_ids
+        self.current_time = current_time
+        self.zone_index = zone_index
+        self._zone_hits = None if zone_hits is None else np.asarray(zone_hits)
+        self._counts = None
+        self._durations = None
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def counts(self):
+        """Number of stored positions per track"""
+        if self._counts is None:
+            self._counts = np.fromiter(map(len, self.tracks), dtype=np.int64, count=len(self.tracks))
+        return self._counts
+
+    @property
+    def durations(self):
+        """Seconds between the first and last stored position of each track"""
+        if self._durations is None:
+            self._durations = np.fromiter(
+                (track.last_timestamp - track.first_timestamp for track in self.tracks),
+                dtype=np.float64, count=len(self.tracks)
+            )
+        return self._durations
+
+    def position_variance(self, indices, window):
+        """(len(indices), 2) x/y variance of the last `window` positions of the given tracks"""
+        variances = np.zeros((len(indices), 2))
+        if len(indices) == 0:
+            return variances
+
+        # Stack equal-length windows so variance is one row-wise reduction per window length
+        lengths = np.minimum(self.counts[indices], window)
+        for length in set(lengths.tolist()):
+            rows = np.flatnonzero(lengths == length)
+            group = indices[rows].tolist()
+            xs = np.array([self.tracks[i].recent_positions(length)[:, 0] for i in group])
+            ys = np.array([self.tracks[i].recent_positions(length)[:, 1] for i in group])
+            variances[rows, 0] = np.var(xs, axis=1)
+            variances[rows, 1] = np.var(ys, axis=1)
+        return variances
+
+    def speed(self, indices, window):
+        """Average speed (pixels per second) over the last `window` positions of the given tracks"""
+        speeds = np.zeros(len(indices))
+        for row, i in enumerate(indices.tolist()):
+            track = self.tracks[i]
+            positions = track.recent_positions(window)
+            timestamps = track.recent_timestamps(window)
+            elapsed = timestamps[-1] - timestamps[0]
+            if len(positions) >= 2 and elapsed > 0:
+                speeds[row] = np.hypot(*(positions[-1] - positions[0])) / elapsed
+        return speeds
+
+    @property
+    def direction_changes(self):
+        """Direction changes counted since each track's last pacing alert"""
+        return np.fromiter((track.direction_changes for track in self.tracks),
+                           dtype=np.int64, count=len(self.tracks))
+
+    @property
+    def zone_hits(self):
+        """Config index of the first active zone containing each track (-1 for none)"""
+        if self._zone_hits is None:
+            self._zone_hits = self.zone_index.first_zone([track.last_position for track in self.tracks])
+        return self._zone_hits
+
+
+class BehaviorRule(abc.ABC):
+    """Base class for behavior rules.
+
+    A rule flags tracks with `evaluate` (one boolean per track), raises the
+    track's suspicion score by its weight and emits an alert of type `name`.
+    `inputs` lists the TrackFeatures the rule reads; `defaults` are its
+    parameters, overridable per rule through config["behavior_rules"].
+    `check` is the same test written for a single track without
+    TrackFeatures; it backs the default per-track path that the batched
+    path (batched_analysis=True) is replayed against.
+
+    Overrides are converted to the type of their default and checked against
+    `minimums`; unknown keys and bad values raise ValueError.
+    """
+
+    name = "rule"
+    inputs = ()
+    defaults = {}
+    minimums = {}
+
+    def __init__(self, params=None):
+        defaults = {"enabled": True, "weight": 1.0, "notify": False}
+        defaults.update(self.defaults)
+        minimums = {"weight": 0.0}
+        minimums.update(self.minimums)
+        self.params = coerce_params(self.name, defaults, params, minimums)
+
+    @property
+    def enabled(self):
+        return self.params["enabled"]
+
+    @property
+    def weight(self):
+        return self.params["weight"]
+
+    @property
+    def notify(self):
+        return self.params["notify"]
+
+    @abc.abstractmethod
+    def evaluate(self, features, active, config):
+        """Boolean mask of the tracks that show this behavior (only `active` tracks need to be tested)"""
+
+    @abc.abstractmethod
+    def check(self, track, current_time, zone_id, zone_index, config):
+        """Per-track reference of evaluate: the alert's extra fields if the track shows the behavior, else None"""
+
+    def details(self, features, i):
+        """Extra alert fields for track i"""
+        return {}
+
+    def on_alert(self, track):
+        """Update track state after an alert was raised for it"""
+
+
+@register_rule
+class LoiteringRule(BehaviorRule):
+    """Track has been around longer than loitering_threshold and barely moves"""
+
+    name = "loitering"
+    inputs = ("history", "duration", "position_variance")
+    defaults = {
+        "weight": 2.0,
+        "notify": True,
+        "min_samples": 5,       # Track needs more positions than this
+        "window": 10,           # Recent positions the movement variance is measured over
+        "max_variance": 500.0,  # Pixel^2 variance in x and y below which a person is stationary
+    }
+    minimums = {"min_samples": 0, "window": 2, "max_variance": 0.0}
+
+    def evaluate(self, features, active, config):
+        loitering = np.zeros(len(features), dtype=bool)
+        candidates = np.flatnonzero(active & (features.counts > self.params["min_samples"]))
+        if len(candidates) == 0:
+            return loitering
+
+        candidates = candidates[features.durations[candidates] > config["loitering_threshold"]]
+        variances = features.position_variance(candidates, self.params["window"])
+        max_variance = self.params["max_variance"]
+        loitering[candidates] = (variances[:, 0] < max_variance) & (variances[:, 1] < max_variance)
+        return loitering
+
+    def check(self, track, current_time, zone_id, zone_index, config):
+        if len(track) <= self.params["min_samples"]:
+            return None
+        duration = track.last_timestamp - track.first_timestamp
+        if duration <= config["loitering_threshold"]:
+            return None
+        positions = track.recent_positions(self.params["window"])
+        max_variance = self.params["max_variance"]
+        if np.var(positions[:, 0]) < max_variance and np.var(positions[:, 1]) < max_variance:
+            return {"duration": float(duration)}
+        return None
+
+    def details(self, features, i):
+        return {"duration": float(features.durations[i])}
+
+
+@register_rule
+class PacingRule(BehaviorRule):
+    """Track changed horizontal direction at least pacing_threshold times"""
+
+    name = "pacing"
+    inputs = ("direction_changes",)
+    defaults = {"weight": 1.5}
+
+    def evaluate(self, features, active, config):
+        return active & (features.direction_changes >= config["pacing_threshold"])
+
+    def check(self, track, current_time, zone_id, zone_index, config):
+        if track.direction_changes >= config["pacing_threshold"]:
+            return {"direction_changes": track.direction_changes}
+        return None
+
+    def details(self, features, i):
+        return {"direction_changes": features.tracks[i].direction_changes}
+
+    def on_alert(self, track):
+        track.direction_changes = 0  # Reset counter
+
+
+@register_rule
+class ZoneIntrusionRule(BehaviorRule):
+    """Track center is inside an active intrusion zone"""
+
+    name = "zone_intrusion"
+    inputs = ("zone_hits",)
+    defaults = {"weight": 3.0}
+
+    def evaluate(self, features, active, config):
+        if not config["zones_enabled"] or len(features.zone_index) == 0:
+            return np.zeros(len(features), dtype=bool)
+        return active & (features.zone_hits >= 0)
+
+    def check(self, track, current_time, zone_id, zone_index, config):
+        if not config["zones_enabled"] or len(zone_index) == 0:
+            return None
+        if zone_id is None:
+            zone_id = int(zone_index.first_zone([track.last_position])[0])
+        if zone_id < 0:
+            return None
+        return {"zone_id": zone_id, "zone_name": zone_index.zone_name(zone_id)}
+
+    def details(self, features, i):
+        zone_id = int(features.zone_hits[i])
+        return {"zone_id": zone_id, "zone_name": features.zone_index.zone_name(zone_id)}
+
+
+@register_rule
+class RunningRule(BehaviorRule):
+    """Track moves faster than min_speed (off by default; tune min_speed to the camera)"""
+
+    name = "running"
+    inputs = ("history", "speed")
+    defaults = {
+        "enabled": False,
+        "weight": 1.0,
+        "window": 5,          # Recent positions the speed is measured over
+        "min_speed": 300.0,   # Pixels per second
+    }
+    minimums = {"window": 2, "min_speed": 0.0}
+
+    def evaluate(self, features, active, config):
+        running = np.zeros(len(features), dtype=bool)
+        window = self.params["window"]
+        candidates = np.flatnonzero(active & (features.counts >= window))
+        running[candidates] = features.speed(candidates, window) > self.params["min_speed"]
+        return running
+
+    def check(self, track, current_time, zone_id, zone_index, config):
+        window = self.params["window"]
+        if len(track) < window:
+            return None
+        positions = track.recent_positions(window)
+        timestamps = track.recent_timestamps(window)
+        elapsed = timestamps[-1] - timestamps[0]
+        if len(positions) < 2 or elapsed <= 0:
+            return None
+        speed = float(np.hypot(*(positions[-1] - positions[0])) / elapsed)
+        return {"speed": speed} if speed > self.params["min_speed"] else None
+
+    def details(self, features, i):
+        return {"speed": float(features.speed(np.array([i]), self.params["window"])[0])}
+
+
+class RuleEngine:
+    """The enabled behavior rules compiled from config["behavior_rules"].
+
+    rule_config maps rule names to parameter overrides, e.g.
+    {"loitering": {"weight": 1.0, "max_variance": 300}, "running": {"enabled": True}}.
+    """
+
+    def __init__(self, rule_config=None):
+        self.compile(rule_config)
+
+    def compile(self, rule_config=None):
+        """(Re)build the enabled rule set from rule overrides"""
+        if rule_config is not None and not isinstance(rule_config, dict):
+            raise ValueError(f"behavior_rules must be an object, got {rule_config!r}")
+        rule_config = dict(rule_config or {})
+        unknown = set(rule_config) - set(RULES) - {"high_risk"}
+        if unknown:
+            raise ValueError(f"Unknown behavior rules: {', '.join(sorted(map(str, unknown)))}")
+
+        registered = []
+        for name, rule_class in RULES.items():
+            rule = rule_class(rule_config.get(name))
+            missing = set(rule.inputs) - set(TrackFeatures.FEATURES)
+            if missing:
+                raise ValueError(f"Rule {name} needs unknown features: {', '.join(sorted(missing))}")
+            registered.append(rule)
+
+        self.registered = registered
+        self.rules = [rule for rule in registered if rule.enabled]
+        self.high_risk = coerce_params("high_risk", HIGH_RISK_DEFAULTS, rule_config.get("high_risk"), HIGH_RISK_MINIMUMS)
+
+        # Features at least one enabled rule reads
+        self.inputs = {feature for rule in self.rules for feature in rule.inputs}
+
+    def needs(self, feature):
+        """Whether any enabled rule reads this feature"""
+        return feature in self.inputs
+
+    def evaluate(self, features, active, config):
+        """(rule, mask) for every enabled rule, in evaluation order"""
+        return [(rule, rule.evaluate(features, active, config)) for rule in self.rules]
+
+    def is_high_risk(self, behaviors, score):
+        """Whether a track with these behaviors and score escalates to high risk"""
+        if not self.high_risk["enabled"]:
+            return False
+        return len(behaviors) >= self.high_risk["min_behaviors"] or score >= self.high_risk["score_threshold"]
+
+    def describe(self):
+        """Parameters in effect for every registered rule and for high-risk escalation"""
+        described = {rule.name: dict(rule.params) for rule in self.registered}
+        described["high_risk"] = dict(self.high_risk)
+        return described
@@ -0,0 +1,110 @@
+"""Benchmark person-detection latency per inference backend on CPU.
+
+Every backend is loaded through inference_backend.load_model (exported and
+cached on first use, then warmed up) and timed on the same frames. Backends
+whose packages are not installed are reported as unavailable. Run from the
+repository root:
+
+    python benchmarks/bench_backends.py --backends torch onnx openvino openvino-int8 --runs 100
+    python benchmarks/bench_backends.py --video sample.mp4 --threads 4 --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backend import backend_available, default_threads, load_model
+
+
+def load_frames(video, count, size):
+    """Frames from a video, or random noise frames of the given size"""
+    if video:
+        frames = []
+        capture = cv2.VideoCapture(video)
+        while len(frames) < count:
+            success, frame = capture.read()
+            if not success:
+                break
+            frames.append(frame)
+        capture.release()
+        if frames:
+            return frames
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+def bench(model, frames, imgsz, runs):
+    """Per-frame latency in milliseconds over `runs` predictions"""
+    latencies = []
+    for i in range(runs):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        model.predict(source=frame, imgsz=imgsz, classes=[0], verbose=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino", "openvino-int8"])
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (0 = physical cores)")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--video", help="Time on frames of this video instead of noise")
+    parser.add_argument("--frame-size", type=int, nargs=2, default=[1280, 720], metavar=("W", "H"))
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Keep the benchmark on the CPU even where a GPU is present
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+    threads = args.threads or default_threads()
+    frames = load_frames(args.video, min(args.runs, 50), args.frame_size)
+
+    results = []
+    print(f"{'backend':<15} {'load s':>8} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'fps':>7}")
+    for name in args.backends:
+        backend, _, variant = name.partition("-")
+        if not backend_available(backend):
+            print(f"{name:<15} unavailable")
+            results.append({"backend": name, "available": False})
+            continue
+
+        start = time.perf_counter()
+        model = load_model(args.weights, backend=backend, imgsz=args.imgsz, int8=variant == "int8",
+                           threads=threads)
+        load_time = time.perf_counter() - start
+        if model.backend != backend:
+            print(f"{name:<15} failed to load")
+            results.append({"backend": name, "available": False})
+            continue
+
+        latencies = bench(model, frames, args.imgsz, args.runs)
+        result = {
+            "backend": name,
+            "available": True,
+            "threads": threads,
+            "imgsz": args.imgsz,
+            "load_seconds": load_time,
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "fps": float(1000 / latencies.mean()),
+        }
+        results.append(result)
+        print(f"{name:<15} {load_time:>8.2f} {result['mean_ms']:>9.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['fps']:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
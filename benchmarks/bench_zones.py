@@ -0,0 +1,83 @@
+"""Benchmark zone membership: per-point point_in_polygon loop vs. the compiled ZoneIndex.
+
+Run from the repository root:
+
+    python benchmarks/bench_zones.py --zones 5 20 50 --points 10 50 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zones import ZoneIndex, point_in_polygon
+
+
+def random_zones(n_zones, rng, width=1920, height=1080):
+    """Random star-shaped polygons (4-12 vertices) spread over the frame"""
+    zones = []
+    for i in range(n_zones):
+        n_vertices = rng.integers(4, 13)
+        cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n_vertices))
+        radii = rng.uniform(40, 250, n_vertices)
+        points = [(float(cx + r * np.cos(a)), float(cy + r * np.sin(a))) for a, r in zip(angles, radii)]
+        zones.append({"points": points, "name": f"Zone {i+1}", "active": bool(rng.random() > 0.1)})
+    return zones
+
+
+def first_zone_loop(points, zones):
+    """The per-track loop analyze_behaviors used to run"""
+    hits = []
+    for point in points:
+        hit = -1
+        for zone_idx, zone in enumerate(zones):
+            if not zone.get('active', True):
+                continue
+            if point_in_polygon(point, zone['points']):
+                hit = zone_idx
+                break
+        hits.append(hit)
+    return hits
+
+
+def time_call(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zones", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'zones':>6} {'points':>7} {'loop ms':>10} {'index ms':>10} {'speedup':>8}")
+
+    for n_zones in args.zones:
+        zones = random_zones(n_zones, rng)
+        index = ZoneIndex(zones)
+        for n_points in args.points:
+            points = rng.uniform(0, [1920, 1080], (n_points, 2))
+            point_list = [tuple(p) for p in points.tolist()]
+
+            loop_time, loop_hits = time_call(lambda: first_zone_loop(point_list, zones), args.repeats)
+            index_time, index_hits = time_call(lambda: index.first_zone(points), args.repeats)
+
+            # Both paths must agree exactly
+            assert loop_hits == index_hits.tolist(), "ZoneIndex disagrees with point_in_polygon"
+
+            print(f"{n_zones:>6} {n_points:>7} {loop_time * 1000:>10.3f} {index_time * 1000:>10.3f} "
+                  f"{loop_time / index_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Replay recorded track data through the per-track and batched behavior analysis and require identical alerts.
+
+Recordings are JSON lines, one frame per line:
+
+    {"timestamp": 1700000000.0, "detections": [[track_id, x1, y1, x2, y2, conf], ...]}
+
+Without --input a synthetic recording (walkers, pacers and loiterers) is generated.
+Run from the repository root:
+
+    python benchmarks/replay_parity.py [--input tracks.jsonl] [--frames 1000 --people 30]
+
+Exits with status 1 on the first frame where the two paths disagree.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detect_and_track import SecurityAnalyzer
+from notifiers import NotificationDispatcher
+
+
+def load_recording(path):
+    """Read (timestamp, detections) frames from a JSONL recording"""
+    frames = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frame = json.loads(line)
+                frames.append((frame["timestamp"], frame["detections"]))
+    return frames
+
+
+def synthetic_recording(n_frames, n_people, fps=10.0, seed=0):
+    """People who walk through, pace left and right, or stand still, dropping out now and then"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 640, (n_people, 2))
+    velocities = rng.normal(0, 4, (n_people, 2))
+    kinds = rng.integers(0, 3, n_people)  # 0 = walker, 1 = pacer, 2 = loiterer
+
+    frames = []
+    start = 1_700_000_000.0
+    for f in range(n_frames):
+        detections = []
+        for i in range(n_people):
+            if kinds[i] == 1:
+                positions[i, 0] += 12 * np.sign(np.sin(f / 8 + i))
+            elif kinds[i] == 2:
+                positions[i] += rng.normal(0, 1, 2)
+            else:
+                positions[i] += velocities[i]
+
+            # Occasionally missed by the detector
+            if (f // 50 + i) % 7 == 0:
+                continue
+            x, y = positions[i].tolist()
+            detections.append([i + 1, x - 20, y - 40, x + 20, y + 40, 0.9])
+        frames.append((start + f / fps, detections))
+    return frames
+
+
+def make_analyzer(batched, config=None):
+    """Analyzer without a model, audio or notifiers"""
+    analyzer_config = {"audio_alerts": False, "batched_analysis": batched}
+    analyzer_config.update(config or {})
+    return SecurityAnalyzer(analyzer_config, model=object(), dispatcher=NotificationDispatcher())
+
+
+def replay(analyzer, frames):
+    """Feed every frame to the analyzer; returns (alerts per frame, seconds spent analyzing)"""
+    frame_alerts = []
+    elapsed = 0.0
+    for timestamp, detections in frames:
+        rows = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        start = time.perf_counter()
+        alerts = analyzer.analyze_detections(rows[:, 0].astype(int), rows[:, 1:5], rows[:, 5], timestamp)
+        elapsed += time.perf_counter() - start
+        frame_alerts.append(alerts)
+    return frame_alerts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="JSONL track recording (default: synthetic)")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--people", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", help="JSON analyzer config overrides, e.g. '{\"loitering_threshold\": 5}'")
+    args = parser.parse_args()
+
+    frames = load_recording(args.input) if args.input else synthetic_recording(args.frames, args.people, seed=args.seed)
+    config = json.loads(args.config) if args.config else None
+
+    reference, reference_time = replay(make_analyzer(False, config), frames)
+    batched, batched_time = replay(make_analyzer(True, config), frames)
+
+    for index, (expected, actual) in enumerate(zip(reference, batched)):
+        if expected != actual:
+            print(f"Mismatch at frame {index}:")
+            print(f"  per-track: {expected}")
+            print(f"  batched:   {actual}")
+            sys.exit(1)
+
+    n_alerts = sum(len(alerts) for alerts in reference)
+    print(f"{len(frames)} frames, {n_alerts} alerts identical")
+    print(f"per-track {reference_time * 1000:.1f} ms, batched {batched_time * 1000:.1f} ms "
+          f"({reference_time / batched_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
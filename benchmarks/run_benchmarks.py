@@ -0,0 +1,343 @@
+"""Headless CPU benchmark suite for the analysis, zone and streaming paths.
+
+Detections come from a synthetic scene (or a JSONL recording, see
+synthetic.py), so no YOLO model is needed. Scenarios:
+
+    analyzer   SecurityAnalyzer.analyze_detections on recorded timestamps, replayed
+               --loops times to expose memory growth
+    zones      ZoneIndex lookups for every track center
+    pipeline   replayed detections -> analyze -> annotate -> JPEG encode on rendered
+               frames (needs ultralytics and torch for Results/plot)
+    streaming  FrameCache publishing to --viewers concurrent MJPEG subscribers
+
+Results (FPS, latency percentiles in ms, memory) are printed and written as
+JSON. With --baseline, FPS drops or p95 latency increases beyond --tolerance
+are reported and the script exits with status 1. Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --scenarios analyzer zones --baseline bench.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detect_and_track import SecurityAnalyzer
+from frame_cache import FrameCache
+from notifiers import NotificationDispatcher
+from synthetic import SyntheticScene, load_recording
+from zones import ZoneIndex
+
+SCENARIOS = ("analyzer", "zones", "pipeline", "streaming")
+
+
+def rss_mb():
+    """Resident memory of this process in MB"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def summarize(latencies):
+    """Mean and percentiles (ms) of per-frame latencies in seconds"""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    if len(values) == 0:
+        return {}
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def make_analyzer(config=None):
+    """Analyzer without a model, audio or notifiers"""
+    analyzer_config = {"audio_alerts": False}
+    analyzer_config.update(config or {})
+    return SecurityAnalyzer(analyzer_config, model=object(), dispatcher=NotificationDispatcher())
+
+
+def as_arrays(detections):
+    rows = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+    return rows[:, 0].astype(int), rows[:, 1:5], rows[:, 5]
+
+
+def bench_analyzer(frames, config, loops=3):
+    """Behavior analysis throughput and memory over repeated replays of the recording"""
+    analyzer = make_analyzer(config)
+    span = frames[-1][0] - frames[0][0] + 1.0
+    prepared = [(timestamp, as_arrays(detections)) for timestamp, detections in frames]
+
+    latencies = []
+    n_alerts = 0
+    memory = []
+    gc.collect()
+    started = time.perf_counter()
+    for loop in range(loops):
+        # Later loops continue in time, so tracks keep ageing (and get evicted) as in a long run
+        offset = loop * span
+        for timestamp, (track_ids, xyxy, conf) in prepared:
+            start = time.perf_counter()
+            n_alerts += len(analyzer.analyze_detections(track_ids, xyxy, conf, timestamp + offset))
+            latencies.append(time.perf_counter() - start)
+        memory.append(rss_mb())
+    elapsed = time.perf_counter() - started
+
+    return {
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed,
+        "latency_ms": summarize(latencies),
+        "alerts": n_alerts,
+        "active_tracks": len(analyzer.tracks),
+        "memory_mb": memory[-1],
+        # Growth after the first replay, when steady-state allocations are done
+        "memory_growth_mb": memory[-1] - memory[0],
+    }
+
+
+def bench_zones(frames, config, repeats=3):
+    """ZoneIndex lookups for the track centers of every frame"""
+    index = ZoneIndex(make_analyzer(config).config["intrusion_zones"])
+    centers = []
+    for _, detections in frames:
+        _, xyxy, _ = as_arrays(detections)
+        centers.append((xyxy[:, :2] + xyxy[:, 2:]) / 2)
+
+    latencies = []
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for points in centers:
+            start = time.perf_counter()
+            zone_ids = index.first_zone(points)
+            latencies.append(time.perf_counter() - start)
+            hits += int(np.count_nonzero(zone_ids >= 0))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed,
+        "latency_ms": summarize(latencies),
+        "zones": len(index),
+        "zone_hits": hits,
+    }
+
+
+def bench_pipeline(scene, frames, config, quality=95):
+    """Per-stage cost of the analysis/annotation/encoding path on rendered frames"""
+    try:
+        import torch
+        from ultralytics.engine.results import Results
+    except ImportError as e:
+        return {"skipped": f"needs ultralytics and torch ({e})"}
+
+    analyzer = make_analyzer(config)
+    cache = FrameCache(quality=quality)
+    background = scene.background()
+    names = {0: "person"}
+
+    stages = {"render": [], "detect": [], "analyze": [], "annotate": [], "encode": []}
+    total = []
+    memory_start = rss_mb()
+    for timestamp, detections in frames:
+        start = time.perf_counter()
+        frame = scene.render(detections, background)
+        stages["render"].append(time.perf_counter() - start)
+
+        # Replayed detections in the model's output format: x1, y1, x2, y2, track_id, conf, cls
+        frame_start = time.perf_counter()
+        rows = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        data = np.concatenate([rows[:, 1:5], rows[:, :1], rows[:, 5:6], np.zeros((len(rows), 1), np.float32)], axis=1)
+        result = Results(orig_img=frame, path="", names=names, boxes=torch.as_tensor(data))
+        stages["detect"].append(time.perf_counter() - frame_start)
+
+        start = time.perf_counter()
+        boxes = result.boxes.cpu().numpy()
+        alerts = analyzer.analyze_detections(boxes.id.astype(int), boxes.xyxy, boxes.conf, timestamp)
+        stages["analyze"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        annotated = analyzer.render_frame(frame, [result], alerts)
+        stages["annotate"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cache.publish(annotated)
+        cache.get_jpeg()
+        stages["encode"].append(time.perf_counter() - start)
+        total.append(time.perf_counter() - frame_start)
+
+    return {
+        "frames": len(total),
+        "fps": len(total) / sum(total),
+        "latency_ms": summarize(total),
+        "stages_ms": {stage: summarize(values) for stage, values in stages.items()},
+        "frame_size": [scene.width, scene.height],
+        "memory_mb": rss_mb(),
+        "memory_growth_mb": rss_mb() - memory_start,
+    }
+
+
+def bench_streaming(scene, frames, viewers=4, quality=95):
+    """Publish rendered frames as fast as possible to concurrent MJPEG subscribers"""
+    cache = FrameCache(quality=quality)
+    background = scene.background()
+    images = [scene.render(detections, background) for _, detections in frames[:min(len(frames), 60)]]
+    n_frames = len(frames)
+
+    publish_latencies = []
+    received = [0] * viewers
+    done = threading.Event()
+
+    def publisher():
+        for i in range(n_frames):
+            start = time.perf_counter()
+            cache.publish(images[i % len(images)])
+            publish_latencies.append(time.perf_counter() - start)
+            # Give the event loop a chance to deliver, like a camera at a high frame rate
+            time.sleep(0.001)
+        done.set()
+
+    async def viewer(index):
+        async for _ in cache.subscribe(is_active=lambda: not done.is_set(), timeout=0.1):
+            received[index] += 1
+
+    async def run():
+        tasks = [asyncio.create_task(viewer(i)) for i in range(viewers)]
+        # Wait until every viewer is subscribed before publishing
+        while cache.subscribers < viewers:
+            await asyncio.sleep(0.001)
+        started = time.perf_counter()
+        thread = threading.Thread(target=publisher, daemon=True)
+        thread.start()
+        await asyncio.gather(*tasks)
+        thread.join()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+
+    base64_latencies = []
+    for _ in range(50):
+        start = time.perf_counter()
+        cache.get_base64()
+        base64_latencies.append(time.perf_counter() - start)
+
+    return {
+        "frames": n_frames,
+        "viewers": viewers,
+        "fps": n_frames / elapsed,
+        "publish_latency_ms": summarize(publish_latencies),
+        "delivered_per_viewer": float(np.mean(received)),
+        "encodes": cache.encode_count,
+        "encodes_per_frame": cache.encode_count / n_frames,
+        "base64_latency_ms": summarize(base64_latencies),
+        "frame_size": [scene.width, scene.height],
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline result file: FPS drops and p95 latency increases beyond tolerance"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        if current["fps"] < previous["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: fps {previous['fps']:.1f} -> {current['fps']:.1f}")
+        for key in ("latency_ms", "publish_latency_ms"):
+            if key in current and key in previous:
+                before, after = previous[key]["p95"], current[key]["p95"]
+                if after > before * (1 + tolerance):
+                    regressions.append(f"{name}: {key} p95 {before:.3f} -> {after:.3f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--recording", help="JSONL detection recording to replay (default: synthetic scene)")
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--walkers", type=int, default=20)
+    parser.add_argument("--pacers", type=int, default=4)
+    parser.add_argument("--loiterers", type=int, default=4)
+    parser.add_argument("--crossers", type=int, default=4)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720], metavar=("W", "H"))
+    parser.add_argument("--loops", type=int, default=3, help="Replays of the recording for the analyzer scenario")
+    parser.add_argument("--viewers", type=int, default=4)
+    parser.add_argument("--config", help="JSON analyzer config overrides")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    config = json.loads(args.config) if args.config else {}
+    scene = SyntheticScene(args.walkers, args.pacers, args.loiterers, args.crossers,
+                           width=args.size[0], height=args.size[1], seed=args.seed)
+    frames = load_recording(args.recording) if args.recording else scene.recording(args.frames)
+
+    results = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "frames": len(frames),
+        "people": len(scene) if not args.recording else None,
+        "scenarios": {},
+    }
+    for name in args.scenarios:
+        if name == "analyzer":
+            result = bench_analyzer(frames, config, args.loops)
+        elif name == "zones":
+            result = bench_zones(frames, config)
+        elif name == "pipeline":
+            result = bench_pipeline(scene, frames, config)
+        else:
+            result = bench_streaming(scene, frames, args.viewers)
+        results["scenarios"][name] = result
+
+        if "skipped" in result:
+            print(f"{name:<10} skipped: {result['skipped']}")
+            continue
+        latency = result.get("latency_ms") or result.get("publish_latency_ms")
+        line = (f"{name:<10} {result['fps']:>9.1f} fps  p50 {latency['p50']:.3f} ms  "
+                f"p95 {latency['p95']:.3f} ms  p99 {latency['p99']:.3f} ms")
+        if "memory_growth_mb" in result:
+            line += f"  mem {result['memory_mb']:.0f} MB ({result['memory_growth_mb']:+.1f})"
+        print(line)
+        for stage, stats in result.get("stages_ms", {}).items():
+            print(f"  {stage:<9} p50 {stats['p50']:.3f} ms  p95 {stats['p95']:.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
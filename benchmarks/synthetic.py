@@ -0,0 +1,167 @@
+"""Generate synthetic surveillance footage with known people for benchmarks.
+
+Walkers cross the frame, pacers walk back and forth, loiterers stand around
+and zone crossers walk through the intrusion zone. The ground-truth tracked
+detections are written next to the video as a JSONL recording, one frame per line:
+
+    {"timestamp": 1700000000.0, "detections": [[track_id, x1, y1, x2, y2, conf], ...]}
+
+Run from the repository root:
+
+    python benchmarks/synthetic.py --out bench.mp4 --frames 900 --walkers 6 --pacers 2 --loiterers 2 --crossers 2
+"""
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Same zone as the analyzer's default config, so zone crossers trigger intrusions
+DEFAULT_ZONE = [(100, 100), (400, 100), (400, 400), (100, 400)]
+START_TIME = 1_700_000_000.0
+
+
+class SyntheticScene:
+    """Deterministic scene of moving people, stepped one frame at a time"""
+
+    def __init__(self, walkers=6, pacers=2, loiterers=2, crossers=2, width=1280, height=720,
+                 fps=15.0, zone=None, miss_rate=0.02, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.zone = zone or DEFAULT_ZONE
+        self.miss_rate = miss_rate
+        self.rng = np.random.default_rng(seed)
+        self.frame_index = 0
+
+        kinds = ["walker"] * walkers + ["pacer"] * pacers + ["loiterer"] * loiterers + ["crosser"] * crossers
+        self.kinds = np.array(kinds)
+        n = len(kinds)
+        self.positions = self.rng.uniform([60, 100], [width - 60, height - 100], (n, 2))
+        self.velocities = self.rng.normal(0, 1, (n, 2))
+        self.velocities *= (self.rng.uniform(40, 120, n) / np.maximum(np.linalg.norm(self.velocities, axis=1), 1e-6))[:, None]
+        self.sizes = self.rng.uniform(0.8, 1.2, n)
+        self.colors = self.rng.integers(40, 255, (n, 3))
+
+        # Zone crossers start on the left of the zone and walk through it
+        zone = np.asarray(self.zone, dtype=np.float64)
+        (zx1, zy1), (zx2, zy2) = zone.min(axis=0), zone.max(axis=0)
+        for i in np.flatnonzero(self.kinds == "crosser"):
+            self.positions[i] = (zx1 - 80 - 40 * i, self.rng.uniform(zy1 + 20, zy2 - 20))
+            self.velocities[i] = (80.0, 0.0)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def step(self):
+        """Advance one frame; returns (timestamp, detections)"""
+        dt = 1.0 / self.fps
+        f = self.frame_index
+        for i, kind in enumerate(self.kinds):
+            if kind == "pacer":
+                # Turn around every 1.5 seconds
+                direction = 1.0 if (f // int(self.fps * 1.5) + i) % 2 == 0 else -1.0
+                self.positions[i, 0] += direction * 90 * dt
+            elif kind == "loiterer":
+                self.positions[i] += self.rng.normal(0, 1.5, 2)
+            else:
+                self.positions[i] += self.velocities[i] * dt
+
+            # Walk back in from the other side once off screen
+            self.positions[i, 0] %= self.width
+            self.positions[i, 1] = np.clip(self.positions[i, 1], 60, self.height - 60)
+
+        detections = []
+        for i, (x, y) in enumerate(self.positions.tolist()):
+            if self.rng.random() < self.miss_rate:
+                continue
+            half_w, half_h = 22 * self.sizes[i], 55 * self.sizes[i]
+            detections.append([i + 1, x - half_w, y - half_h, x + half_w, y + half_h,
+                               float(np.round(self.rng.uniform(0.6, 0.95), 3))])
+
+        self.frame_index += 1
+        return START_TIME + f * dt, detections
+
+    def recording(self, n_frames):
+        """The next n_frames as (timestamp, detections) pairs"""
+        return [self.step() for _ in range(n_frames)]
+
+    def background(self):
+        """Static textured background with the zone outline"""
+        rng = np.random.default_rng(1)
+        noise = rng.integers(0, 40, (self.height // 8, self.width // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(noise, (self.width, self.height), interpolation=cv2.INTER_LINEAR) + 60
+        cv2.polylines(frame, [np.asarray(self.zone, dtype=np.int32)], True, (90, 90, 90), 2)
+        return frame
+
+    def render(self, detections, background=None):
+        """Draw each detection as a person-shaped blob on the background"""
+        frame = (background if background is not None else self.background()).copy()
+        for track_id, x1, y1, x2, y2, _ in detections:
+            color = tuple(int(c) for c in self.colors[int(track_id) - 1])
+            cx, w = int((x1 + x2) / 2), int(x2 - x1)
+            head = max(4, w // 3)
+            cv2.circle(frame, (cx, int(y1) + head), head, color, -1)
+            cv2.rectangle(frame, (int(x1), int(y1) + 2 * head), (int(x2), int(y2)), color, -1)
+        return frame
+
+
+def load_recording(path):
+    """Read (timestamp, detections) frames from a JSONL recording"""
+    frames = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frame = json.loads(line)
+                frames.append((frame["timestamp"], frame["detections"]))
+    return frames
+
+
+def write_recording(path, frames):
+    with open(path, "w") as f:
+        for timestamp, detections in frames:
+            f.write(json.dumps({"timestamp": timestamp, "detections": detections}) + "\n")
+
+
+def write_video(path, scene, n_frames):
+    """Render n_frames of the scene to a video file and its JSONL recording; returns the recording path"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), scene.fps, (scene.width, scene.height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    background = scene.background()
+    frames = []
+    for _ in range(n_frames):
+        timestamp, detections = scene.step()
+        writer.write(scene.render(detections, background))
+        frames.append((timestamp, detections))
+    writer.release()
+
+    recording_path = os.path.splitext(path)[0] + ".jsonl"
+    write_recording(recording_path, frames)
+    return recording_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="synthetic.mp4")
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720], metavar=("W", "H"))
+    parser.add_argument("--walkers", type=int, default=6)
+    parser.add_argument("--pacers", type=int, default=2)
+    parser.add_argument("--loiterers", type=int, default=2)
+    parser.add_argument("--crossers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scene = SyntheticScene(args.walkers, args.pacers, args.loiterers, args.crossers,
+                           width=args.size[0], height=args.size[1], fps=args.fps, seed=args.seed)
+    recording = write_video(args.out, scene, args.frames)
+    print(f"Wrote {args.frames} frames with {len(scene)} people to {args.out} (detections: {recording})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import threading
+import time
+
+import cv2
+
+from detect_and_track import SecurityAnalyzer
+from frame_cache import FrameCache
+from inference_backend import get_model, model_options
+from metrics import profiler
+from roi import predict_regions
+from scheduler import InferenceScheduler
+
+
+def parse_source(source):
+    """Convert a camera source string into the value expected by cv2.VideoCapture"""
+    # If source is a string but represents a number, treat it as a webcam index
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+def create_tracker(tracker_config="bytetrack.yaml", frame_rate=30):
+    """Create an independent ultralytics tracker (ByteTrack/BoT-SORT) from its YAML config"""
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_config)))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+
+
+def track_detections(tracker, result):
+    """Run a tracker on one frame of detections (mirrors model.track); returns the tracked result"""
+    det = result.boxes.cpu().numpy()
+    if len(det) == 0:
+        return result
+
+    tracks = tracker.update(det, result.orig_img)
+    if len(tracks) == 0:
+        return result
+
+    import torch
+
+    idx = tracks[:, -1].astype(int)
+    result = result[idx]
+    result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+    return result
+
+
+class CameraWorker:
+    """Capture thread for one camera that only ever keeps the newest frame"""
+
+    def __init__(self, camera_id, source, frame_event=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.frame_event = frame_event
+
+        self.capture = None
+        self.thread = None
+        self.running = False
+
+        # Latest frame and its sequence number, guarded by a lock
+        self.lock = threading.Lock()
+        self.frame = None
+        self.seq = 0
+        self.fps = 30.0  # Frame rate reported by the source once it is opened
+
+    def start(self):
+        """Open the source and start the capture thread"""
+        self.capture = cv2.VideoCapture(parse_source(self.source))
+        if not self.capture.isOpened():
+            return False
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Stop capturing and release the source"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+    def latest(self, since=0):
+        """Return (frame, seq) if a frame newer than `since` is available, else (None, since)"""
+        with self.lock:
+            if self.frame is None or self.seq <= since:
+                return None, since
+            return self.frame, self.seq
+
+    def _capture_loop(self):
+        while self.running:
+            success, frame = self.capture.read()
+            if not success:
+                # Try to reopen the source after a brief pause
+                time.sleep(1.0)
+                if not self.running:
+                    break
+                self.capture.release()
+                self.capture = cv2.VideoCapture(parse_source(self.source))
+                continue
+
+            # Overwrite the previous frame - the inference stage only wants the newest one
+            with self.lock:
+                self.frame = frame
+                self.seq += 1
+
+            # Wake up the shared inference stage
+            if self.frame_event is not None:
+                self.frame_event.set()
+
+
+class CameraStream:
+    """Per-camera state owned by the engine: capture worker, tracker and analyzer"""
+
+    def __init__(self, camera_id, source, analyzer, tracker, worker, config_overrides=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.analyzer = analyzer
+        self.tracker = tracker
+        self.worker = worker
+        self.config_overrides = config_overrides or {}
+
+        # Sequence number of the last frame that went through inference
+        self.last_seq = 0
+        self.current_frame = None
+        self.frame_cache = FrameCache(quality=analyzer.config.get("jpeg_quality", 95))
+        self.raw_frame_cache = FrameCache(quality=analyzer.config.get("jpeg_quality", 95))  # Frames without overlays
+        self.frames_processed = 0
+        # Frames overwritten by the capture worker before inference got to them
+        self.frames_dropped = 0
+        # Frames published without overlays because nobody was watching
+        self.annotations_skipped = 0
+
+        # Motion-gated frame skipping; skipped frames reuse the last detections
+        self.scheduler = InferenceScheduler.from_config(analyzer.config)
+        self.last_results = None
+
+
+class MultiCameraEngine:
+    """Serve many camera sources from one process with a single batched YOLO model.
+
+    Each camera has its own capture thread, tracker and SecurityAnalyzer (so track
+    IDs, suspicion scores and alert cooldowns never leak between cameras), while a
+    single inference thread stacks the newest frame of every camera into one
+    batched `model.predict` call.
+    """
+
+    def __init__(self, config=None, model=None, on_alerts=None, dispatcher=None,
+                 max_batch_size=16, tracker_config="bytetrack.yaml", on_frame=None, on_analyzed=None,
+                 should_annotate=None):
+        self.config = dict(config or {})
+        self.model = model if model is not None else get_model(**model_options(self.config))
+        # Notification dispatcher shared by all cameras (taken from the first analyzer if not given)
+        self.dispatcher = dispatcher
+        # Called with (alerts, camera_id), the signature of api.handle_new_alerts
+        self.on_alerts = on_alerts
+        # Called with (camera_id, processed_frame, jpeg or None) for every published frame
+        self.on_frame = on_frame
+        # Called with (camera_id, raw_frame, results, alerts, scores) before a frame is annotated
+        self.on_analyzed = on_analyzed
+        # Called with camera_id; frames are published without overlays when it returns False
+        self.should_annotate = should_annotate
+        self.max_batch_size = max_batch_size
+        self.tracker_config = tracker_config
+
+        self.cameras = {}
+        self.lock = threading.Lock()
+        self.frame_event = threading.Event()
+
+        self.running = False
+        self.inference_thread = None
+
+    def _create_tracker(self, fps=30.0):
+        """Create an independent tracker instance for one camera running at `fps`"""
+        return create_tracker(self.tracker_config, frame_rate=max(1, int(round(fps))))
+
+    def add_camera(self, camera_id, source, config_overrides=None):
+        """Register a camera and start capturing from it"""
+        with self.lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Camera {camera_id} already exists")
+
+        camera_config = dict(self.config)
+        camera_config.update(config_overrides or {})
+
+        worker = CameraWorker(camera_id, source, frame_event=self.frame_event)
+        if not worker.start():
+            return False
+
+        analyzer = SecurityAnalyzer(camera_config, model=self.model, dispatcher=self.dispatcher, camera_id=camera_id)
+        if self.dispatcher is None:
+            self.dispatcher = analyzer.dispatcher
+
+        stream = CameraStream(
+            camera_id,
+            source,
+            analyzer=analyzer,
+            tracker=self._create_tracker(worker.fps),
+            worker=worker,
+            config_overrides=config_overrides
+        )
+
+        with self.lock:
+            self.cameras[camera_id] = stream
+
+        if not self.running:
+            self.start()
+        return True
+
+    def remove_camera(self, camera_id):
+        """Stop a camera and drop its state"""
+        with self.lock:
+            stream = self.cameras.pop(camera_id, None)
+        if stream is None:
+            return False
+
+        stream.worker.stop()
+        return True
+
+    def get_camera(self, camera_id):
+        """Get the stream state for a camera (or None)"""
+        with self.lock:
+            return self.cameras.get(camera_id)
+
+    def list_cameras(self):
+        """Describe all registered cameras"""
+        with self.lock:
+            streams = list(self.cameras.values())
+
+        return [
+            {
+                "id": stream.camera_id,
+                "source": stream.source,
+                "frames_processed": stream.frames_processed,
+                "frames_dropped": stream.frames_dropped,
+                "annotations_skipped": stream.annotations_skipped,
+                "active_tracks": len(stream.analyzer.tracks),
+                "scheduler": stream.scheduler.stats(),
+            }
+            for stream in streams
+        ]
+
+    def update_config(self, new_config):
+        """Apply a config update to every camera, keeping per-camera overrides"""
+        self.config.update(new_config)
+        with self.lock:
+            streams = list(self.cameras.values())
+
+        for stream in streams:
+            camera_config = dict(self.config)
+            camera_config.update(stream.config_overrides)
+            stream.analyzer.update_config(camera_config)
+            stream.frame_cache.set_quality(camera_config.get("jpeg_quality", 95))
+            stream.raw_frame_cache.set_quality(camera_config.get("jpeg_quality", 95))
+            stream.scheduler.update_config(camera_config)
+        return self.config
+
+    def start(self):
+        """Start the shared inference thread"""
+        if self.running:
+            return
+        self.running = True
+        self.inference_thread = threading.Thread(target=self._inference_loop, daemon=True)
+        self.inference_thread.start()
+
+    def stop(self):
+        """Stop inference and all capture workers"""
+        self.running = False
+        self.frame_event.set()
+        if self.inference_thread and self.inference_thread.is_alive():
+            self.inference_thread.join(timeout=1.0)
+
+        with self.lock:
+            streams = list(self.cameras.values())
+            self.cameras = {}
+        for stream in streams:
+            stream.worker.stop()
+
+    def _collect_batch(self):
+        """Take the newest unprocessed frame from every camera that the scheduler wants inferred"""
+        with self.lock:
+            streams = list(self.cameras.values())
+
+        batch = []
+        for stream in streams:
+            frame, seq = stream.worker.latest(since=stream.last_seq)
+            if frame is None:
+                continue
+            if stream.scheduler.should_infer(frame):
+                batch.append((stream, frame, seq))
+            else:
+                self._carry_forward(stream, frame, seq)
+        return batch
+
+    def _carry_forward(self, stream, frame, seq):
+        """Publish a skipped frame annotated with the camera's last detections"""
+        stream.frames_dropped += seq - stream.last_seq - 1
+        stream.last_seq = seq
+
+        stream.raw_frame_cache.publish(frame)
+        try:
+            results = stream.scheduler.carry_forward(stream.last_results, stream.analyzer.tracks)
+            self._analyzed(stream, frame, results, [])
+            processed_frame = self._render(stream, frame, results, [])
+        except Exception as e:
+            print(f"Error annotating skipped frame: {e}")
+            processed_frame = frame
+
+        self._publish(stream, processed_frame)
+
+    def _publish(self, stream, processed_frame):
+        """Make a processed frame the camera's current one and hand it to on_frame (recordings, clips)"""
+        stream.current_frame = processed_frame
+        seq = stream.frame_cache.publish(processed_frame)
+        if self.on_frame:
+            self.on_frame(stream.camera_id, processed_frame, stream.frame_cache.encoded(seq))
+
+    def _analyzed(self, stream, frame, results, alerts):
+        if self.on_analyzed:
+            try:
+                self.on_analyzed(stream.camera_id, frame, results, alerts, stream.analyzer.suspicion_scores)
+            except Exception as e:
+                print(f"Error publishing analysis for camera {stream.camera_id}: {e}")
+
+    def _render(self, stream, frame, results, alerts):
+        """Annotate a frame unless nobody is watching this camera's annotated frames"""
+        if self.should_annotate is not None and not self.should_annotate(stream.camera_id):
+            stream.annotations_skipped += 1
+            return frame
+        return stream.analyzer.render_frame(frame, results, alerts)
+
+    def _track(self, stream, result):
+        """Run a camera's own tracker on batched detections"""
+        return track_detections(stream.tracker, result)
+
+    def _inference_loop(self):
+        while self.running:
+            # Wait for any capture worker to publish a new frame
+            self.frame_event.wait(timeout=0.1)
+            self.frame_event.clear()
+
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # Run cameras through the model in chunks of at most max_batch_size
+            for start in range(0, len(batch), self.max_batch_size):
+                chunk = batch[start:start + self.max_batch_size]
+                try:
+                    self._process_batch(chunk)
+                except Exception as e:
+                    print(f"Error processing camera batch: {e}")
+
+    def _process_batch(self, chunk):
+        # Use the lowest per-camera threshold for the shared call, filter per camera after
+        min_conf = min(stream.analyzer.config["confidence_threshold"] for stream, _, _ in chunk)
+
+        # One batched call per inference size; each camera contributes its ROI crops (or its full frame)
+        by_imgsz = {}
+        for item in chunk:
+            by_imgsz.setdefault(item[0].analyzer.config.get("inference_imgsz", 640), []).append(item)
+
+        for imgsz, items in by_imgsz.items():
+            with profiler.stage("detect"):
+                results = predict_regions(
+                    self.model,
+                    [(frame, stream.analyzer.region_planner.regions(frame.shape)) for stream, frame, _ in items],
+                    conf=min_conf,
+                    imgsz=imgsz
+                )
+            self._handle_results(items, results, min_conf)
+
+    def _handle_results(self, items, results, min_conf):
+        for (stream, frame, seq), result in zip(items, results):
+            stream.frames_dropped += seq - stream.last_seq - 1
+            stream.last_seq = seq
+
+            conf = stream.analyzer.config["confidence_threshold"]
+            if conf > min_conf and len(result.boxes):
+                result = result[result.boxes.conf >= conf]
+
+            with profiler.stage("track"):
+                result = self._track(stream, result)
+            stream.scheduler.observe(len(result.boxes))
+            stream.last_results = [result]
+            with profiler.stage("analyze"):
+                alerts = stream.analyzer.analyze_results([result])
+            stream.raw_frame_cache.publish(frame)
+            self._analyzed(stream, frame, [result], alerts)
+            processed_frame = self._render(stream, frame, [result], alerts)
+
+            self._publish(stream, processed_frame)
+            stream.frames_processed += 1
+
+            if alerts and self.on_alerts:
+                self.on_alerts(alerts, stream.camera_id)
@@ -0,0 +1,228 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from avi import write_mjpeg_avi
+
+
+class Clip:
+    """A clip being collected: frames from `start` until `end`, then written to `path`"""
+
+    def __init__(self, camera_id, start, end, path, url):
+        self.camera_id = camera_id
+        self.start = start
+        self.end = end
+        self.path = path
+        self.url = url
+        self.frames = []  # (timestamp, jpeg, width, height)
+        self.alerts = 1
+
+
+class ClipRecorder:
+    """Write a video clip around every alert, with pre-roll from a per-camera ring buffer.
+
+    `add_frame` only puts the frame on a queue capped at max_queue_bytes (just
+    the JPEG and frame size when the caller passes a JPEG the stream encoder
+    already made); a background thread JPEG-encodes raw frames and keeps the
+    last pre_roll seconds per camera, capped at max_buffer_bytes. `trigger` opens a clip from pre_roll seconds before the
+    alert until post_roll seconds after it, or extends the camera's open clip
+    if the alert falls inside it, so overlapping alerts share one file. Clips
+    are muxed from the stored JPEGs into MJPEG AVI files without re-encoding.
+    """
+
+    def __init__(self, directory="alert_clips", url_prefix="/clips", pre_roll=5.0, post_roll=5.0,
+                 max_length=60.0, max_buffer_bytes=64 * 1024 * 1024, quality=80,
+                 max_queue_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.max_length = max_length
+        self.max_buffer_bytes = max_buffer_bytes
+        self.quality = quality
+        self.enabled = True
+
+        self.lock = threading.Lock()
+        self.buffers = {}       # camera_id -> deque of (timestamp, jpeg, width, height)
+        self.buffer_bytes = {}  # camera_id -> bytes held by its ring buffer
+        self.open_clips = {}    # camera_id -> clips still collecting frames, oldest first
+
+        self.queue = queue.Queue()
+        self.queue_lock = threading.Lock()
+        self.max_queue_bytes = max_queue_bytes
+        self.queued_bytes = 0
+        self.thread = None
+        self.running = False
+
+        self.counters = {"frames": 0, "dropped": 0, "encoded": 0, "reused": 0,
+                         "clips": 0, "merged": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        recorder = cls(**kwargs)
+        recorder.update_config(config)
+        return recorder
+
+    def update_config(self, config):
+        """Apply clip_* settings from a config dict"""
+        self.enabled = config.get("clip_recording", self.enabled)
+        self.pre_roll = config.get("clip_pre_roll", self.pre_roll)
+        self.post_roll = config.get("clip_post_roll", self.post_roll)
+        self.max_length = config.get("clip_max_length", self.max_length)
+        self.quality = config.get("clip_quality", self.quality)
+        if "clip_buffer_mb" in config:
+            self.max_buffer_bytes = int(config["clip_buffer_mb"] * 1024 * 1024)
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker and write every clip that is still open"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        self.thread = None
+
+        with self.lock:
+            clips = [clip for clips in self.open_clips.values() for clip in clips]
+            self.open_clips = {}
+        for clip in clips:
+            self._write(clip)
+
+    def add_frame(self, camera_id, frame, timestamp=None, jpeg=None):
+        """Queue a processed frame (and its JPEG, if already encoded) without blocking"""
+        if not self.enabled:
+            return False
+        if not self.running:
+            self.start()
+        shape = frame.shape[:2]
+        if jpeg is not None:
+            frame = None  # Nothing left to encode, so the raw frame is not kept alive in the queue
+        size = len(jpeg) if jpeg is not None else frame.nbytes
+        with self.queue_lock:
+            if self.queued_bytes + size > self.max_queue_bytes:
+                self.counters["dropped"] += 1
+                return False
+            self.queued_bytes += size
+        self.queue.put((camera_id or "main", timestamp or time.time(), frame, jpeg, shape, size))
+        return True
+
+    def trigger(self, camera_id, timestamp=None):
+        """Record a clip around an alert; returns the clip URL (shared by overlapping alerts)"""
+        if not self.enabled:
+            return None
+        if not self.running:
+            self.start()
+        if timestamp is None:
+            timestamp = time.time()
+        camera_id = camera_id or "main"
+
+        with self.lock:
+            clips = self.open_clips.setdefault(camera_id, [])
+            if clips and timestamp <= clips[-1].end:
+                # Inside the open clip: extend its post-roll instead of starting another file
+                clip = clips[-1]
+                clip.end = min(max(clip.end, timestamp + self.post_roll), clip.start + self.max_length)
+                clip.alerts += 1
+                self.counters["merged"] += 1
+                return clip.url
+
+            start = timestamp - self.pre_roll
+            name = f"{camera_id}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))}_{int(timestamp * 1000) % 1000:03d}.avi"
+            clip = Clip(camera_id, start, timestamp + self.post_roll,
+                        os.path.join(self.directory, name), f"{self.url_prefix}/{name}")
+            clip.frames = [item for item in self.buffers.get(camera_id, ()) if item[0] >= start]
+            clips.append(clip)
+            return clip.url
+
+    def stats(self):
+        stats = dict(self.counters)
+        with self.lock:
+            stats["buffered_frames"] = sum(len(buffer) for buffer in self.buffers.values())
+            stats["buffered_bytes"] = sum(self.buffer_bytes.values())
+            stats["open_clips"] = sum(len(clips) for clips in self.open_clips.values())
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queued_bytes"] = self.queued_bytes
+        return stats
+
+    def _encode(self, frame, jpeg):
+        if jpeg is not None:
+            self.counters["reused"] += 1
+            return jpeg
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ret:
+            return None
+        self.counters["encoded"] += 1
+        return buffer.tobytes()
+
+    def _worker_loop(self):
+        while self.running or not self.queue.empty():
+            try:
+                camera_id, timestamp, frame, jpeg, (height, width), size = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                self._finish_clips(time.time())
+                continue
+
+            jpeg = self._encode(frame, jpeg)
+            with self.queue_lock:
+                self.queued_bytes -= size
+            if jpeg is None:
+                continue
+            item = (timestamp, jpeg, width, height)
+            self.counters["frames"] += 1
+
+            with self.lock:
+                buffer = self.buffers.setdefault(camera_id, deque())
+                buffer.append(item)
+                size = self.buffer_bytes.get(camera_id, 0) + len(jpeg)
+                # Keep pre_roll seconds, within the memory budget
+                while buffer and (buffer[0][0] < timestamp - self.pre_roll or size > self.max_buffer_bytes):
+                    size -= len(buffer.popleft()[1])
+                self.buffer_bytes[camera_id] = size
+
+                for clip in self.open_clips.get(camera_id, ()):
+                    if clip.start <= timestamp <= clip.end:
+                        clip.frames.append(item)
+
+            self._finish_clips(timestamp)
+
+    def _finish_clips(self, now):
+        # Write clips whose post-roll has passed
+        finished = []
+        with self.lock:
+            for camera_id, clips in self.open_clips.items():
+                while clips and clips[0].end < now:
+                    finished.append(clips.pop(0))
+        for clip in finished:
+            self._write(clip)
+
+    def _write(self, clip):
+        if not clip.frames:
+            self.counters["failed"] += 1
+            return False
+
+        timestamps = [item[0] for item in clip.frames]
+        duration = timestamps[-1] - timestamps[0]
+        fps = (len(timestamps) - 1) / duration if duration > 0 else 15.0
+        _, _, width, height = clip.frames[0]
+        try:
+            # Write under a temporary name so /clips never serves a partial file
+            partial = clip.path + ".part"
+            write_mjpeg_avi(partial, [item[1] for item in clip.frames], fps, width, height)
+            os.replace(partial, clip.path)
+        except OSError as e:
+            print(f"Failed to write alert clip {clip.path}: {e}")
+            self.counters["failed"] += 1
+            return False
+
+        self.counters["clips"] += 1
+        return True
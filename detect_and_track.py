@@ -1,28 +1,33 @@
-# Install with pip (no C++ compilation needed)
-# pip install supervision
+# Heavy dependencies (ultralytics, torch, gtts, playsound, requests) are imported
+# where they are first used, so importing this module stays fast
 
-from ultralytics import YOLO
-import supervision as sv
 import cv2
 import numpy as np
 import time
-from deep_sort_realtime.deepsort_tracker import DeepSort
 import json
-from collections import defaultdict
-from playsound import playsound
+from collections import defaultdict, deque
+from itertools import repeat
 import threading
 import os
-from gtts import gTTS
-import requests
+from datetime import datetime, time as dt_time
+
+from annotation import AnnotationRenderer
+from behavior_rules import RuleEngine, TrackFeatures
+from inference_backend import get_model, model_options
+from metrics import profiler
+from notifiers import NotificationDispatcher, build_notifiers
+from roi import RegionPlanner, predict_regions
+from track_store import TrackHistory
+from zones import ZoneIndex, point_in_polygon
+
+# Config keys that change which notifiers are active
+NOTIFIER_CONFIG_KEYS = ("telegram_bot_token", "telegram_chat_id", "telegram_api_url", "webhook_url")
 
 # Alert log
 alert_log = []
 
-# Create a tracker that doesn't require C++ compilation
-tracker = sv.ByteTrack()  # or sv.NorfairTracker()
-
 class SecurityAnalyzer:
-    def __init__(self, config=None):
+    def __init__(self, config=None, model=None, on_track_evicted=None, dispatcher=None, camera_id=None):
         # Default configuration
         self.config = {
             "loitering_threshold": 10,  # seconds
@@ -37,175 +42,300 @@ class SecurityAnalyzer:
             ],
             "zones_enabled": True,      # Toggle to enable/disable all zone detection
             "confidence_threshold": 0.5, # Detection confidence threshold
+            "inference_imgsz": 640,     # Model input size (frames/crops are letterboxed to it)
+            "model_weights": "yolov8n.pt",
+            "tracker": "botsort.yaml",  # Tracker config: "botsort.yaml" (BoT-SORT) or "bytetrack.yaml"
+            "inference_backend": os.environ.get("INFERENCE_BACKEND", "auto"),  # "torch", "onnx", "openvino" or "auto"
+            "inference_threads": int(os.environ.get("INFERENCE_THREADS", 0)),  # Intra-op CPU threads (0 = physical cores)
+            "model_int8": False,        # INT8-quantized export (openvino backend)
+            "model_cache_dir": "models",  # Where exported models are cached
+            "model_warmup": True,       # Run warm-up predictions when the model is loaded
+            "roi_mode": "full",         # Region sent to the model: "full" frame, active "zones" + margin, or "manual"
+            "roi": None,                # [x1, y1, x2, y2] for roi_mode "manual"
+            "roi_margin": 64,           # Pixels added around the zones for roi_mode "zones"
+            "roi_tile_size": 0,         # Split larger ROIs into overlapping tiles of this size (0 = no tiling)
+            "roi_tile_overlap": 0.2,    # Overlap between tiles (fraction of the tile size)
             "audio_alerts": True,       # Enable audio alerts
             "quiet_period_start": "22:00",  # Start quiet period (24-hour format)
             "quiet_period_end": "06:00",    # End quiet period (24-hour format)
             "quiet_period_enabled": False,  # Enable/disable quiet period
+            "behavior_rules": {},        # Per-rule overrides, e.g. {"loitering": {"weight": 1.0}, "running": {"enabled": True}}
+            "alert_cooldown": 10.0,      # Seconds before the same track can alert again
+            "direction_hysteresis": 5.0,  # Pixels of horizontal movement that count as a direction for pacing
+            "batched_analysis": False,  # Evaluate behaviors for all tracks of a frame at once; only faster from ~150 tracks per frame
+            "track_history_size": 100,  # Positions kept per track (bounds memory per track)
+            "track_ttl": 30.0,          # Forget tracks not seen for this many seconds (0 = never)
+            "track_eviction_interval": 1.0,  # Seconds between eviction passes
+            "alert_history_size": 1000,  # Recent alerts kept in memory (full history belongs in an AlertStore)
+            "telegram_bot_token": os.environ.get("TELEGRAM_BOT_TOKEN"),  # Telegram alerts are off without both
+            "telegram_chat_id": os.environ.get("TELEGRAM_CHAT_ID"),
+            "telegram_api_url": os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org"),
+            "webhook_url": os.environ.get("ALERT_WEBHOOK_URL"),  # Optional JSON webhook for alerts
         }
 
         # Update with provided config
         if config:
             self.config.update(config)
 
-        # Load YOLOv8 model once
-        self.model = YOLO('yolov8n.pt')
+        # YOLOv8 model on the configured backend, shared process-wide (or passed in by a multi-camera engine)
+        self.model = model if model is not None else get_model(**model_options(self.config))
 
-        # Track data
+        # Track data (track_id -> TrackHistory)
         self.tracks = {}
-        self.alerts = []
+        self.alerts = deque(maxlen=self.config["alert_history_size"])
         self.last_alert_time = {}  # Prevent alert spam
         self.suspicion_scores = defaultdict(float)  # Track suspicion by ID
 
+        # Intrusion zones compiled for batched point-in-polygon tests (rebuilt when zones change)
+        self.zone_index = ZoneIndex(self.config["intrusion_zones"])
+
+        # Behavior rules compiled from config (rebuilt when they change)
+        self.rule_engine = RuleEngine(self.config["behavior_rules"])
+
+        # Quiet period window parsed once from its "HH:MM" strings (re-parsed on config change)
+        self.quiet_window = None
+        self._compile_quiet_period()
+
+        # Parts of the frame that go to the model
+        self.region_planner = RegionPlanner(self.config)
+
+        # Draws boxes, alerts, zones and scores onto published frames
+        self.renderer = AnnotationRenderer()
+        # The model may be shared, so tracking state lives here rather than in model.track
+        self.tracker = None
+        # Frame rate of the video source; sizes the tracker's lost-track buffer (30 if unknown)
+        self.source_fps = None
+
+        # Camera this analyzer watches; notifications carry it, since track IDs repeat across cameras
+        self.camera_id = camera_id
+        # Alert notifications are delivered on background workers (may be shared between analyzers)
+        self.dispatcher = dispatcher if dispatcher is not None else NotificationDispatcher(build_notifiers(self.config))
+
+        # Stale track eviction - callback gets (track_id, track, suspicion_score) for archiving
+        self.on_track_evicted = on_track_evicted
+        self.last_eviction_time = 0.0
+        self.evicted_count = 0
+
     def process_frame(self, frame):
         """Process a single frame for detection, tracking and analysis"""
-        # Run YOLOv8 with tracking
-        results = self.model.track(
-            source=frame,
-            persist=True,  # Remember tracks between frames
-            classes=[0],   # Only track people (class 0)
-            conf=self.config["confidence_threshold"]
-        )
+        results, frame_alerts = self.analyze_frame(frame)
+        return self.render_frame(frame, results, frame_alerts), frame_alerts
+
+    def detect(self, frame):
+        """Run YOLOv8 detection and tracking on a frame (or only on its region of interest)"""
+        from camera_engine import create_tracker, track_detections
+        if self.tracker is None:
+            frame_rate = max(1, int(round(self.source_fps or 30)))
+            self.tracker = create_tracker(self.config["tracker"], frame_rate=frame_rate)
+
+        # Only the regions go to the model; boxes come back in frame coordinates and are tracked here
+        with profiler.stage("detect"):
+            result = predict_regions(
+                self.model,
+                [(frame, self.region_planner.regions(frame.shape))],
+                conf=self.config["confidence_threshold"],
+                imgsz=self.config["inference_imgsz"]
+            )[0]
+        with profiler.stage("track"):
+            return [track_detections(self.tracker, result)]
+
+    def analyze_frame(self, frame):
+        """Detect, track and analyze a frame without annotating it"""
+        results = self.detect(frame)
+        with profiler.stage("analyze"):
+            return results, self.analyze_results(results)
+
+    def process_results(self, frame, results):
+        """Analyze tracked detections produced for a frame and annotate it"""
+        with profiler.stage("analyze"):
+            frame_alerts = self.analyze_results(results)
+        return self.render_frame(frame, results, frame_alerts), frame_alerts
+
+    def has_tracked_boxes(self, results):
+        """Check whether detection results carry tracking IDs"""
+        if not results or len(results) == 0:
+            return False
+        boxes = results[0].boxes
+        return hasattr(boxes, 'id') and boxes.id is not None
 
+    def analyze_results(self, results):
+        """Update tracks from tracked detections and return alerts for this frame"""
         # Store alerts generated in this frame
         frame_alerts = []
 
-        if results and len(results) > 0:
-            # Get tracked detections
-            boxes = results[0].boxes
-
-            # If we have valid tracking IDs
-            if hasattr(boxes, 'id') and boxes.id is not None:
-                current_time = time.time()
-
-                # Process each tracked detection
-                for i, box in enumerate(boxes):
-                    if box.id is None:
-                        continue
-
-                    # Get track ID and position
-                    track_id = int(box.id.item())
-                    xyxy = box.xyxy[0].tolist()  # Get box in [x1,y1,x2,y2] format
-
-                    # Calculate center point
-                    x_center = (xyxy[0] + xyxy[2]) / 2
-                    y_center = (xyxy[1] + xyxy[3]) / 2
-
-                    # Initialize or update track
-                    if track_id not in self.tracks:
-                        self.tracks[track_id] = {
-                            'positions': [(x_center, y_center)],
-                            'timestamps': [current_time],
-                            'last_direction': None,
-                            'direction_changes': 0
-                        }
-                        self.suspicion_scores[track_id] = 0.0
-                    else:
-                        track = self.tracks[track_id]
-
-                        # Update position and time
-                        track['positions'].append((x_center, y_center))
-                        track['timestamps'].append(current_time)
-
-                        # Limit history for memory efficiency
-                        if len(track['positions']) > 100:
-                            track['positions'] = track['positions'][-100:]
-                            track['timestamps'] = track['timestamps'][-100:]
-
-                        # Calculate direction for pacing detection
-                        if len(track['positions']) >= 2:
-                            prev_x = track['positions'][-2][0]
-                            curr_direction = "right" if x_center > prev_x + 5 else "left" if x_center < prev_x - 5 else track['last_direction']
-
-                            if track['last_direction'] is not None and curr_direction != track['last_direction']:
-                                track['direction_changes'] += 1
-
-                            track['last_direction'] = curr_direction
-
-                    # Run behavior analysis - get any alerts
-                    alerts = self.analyze_behaviors(track_id, current_time)
-                    frame_alerts.extend(alerts)
-
-                # Decay suspicion scores slightly over time
-                for track_id in list(self.suspicion_scores.keys()):
-                    self.suspicion_scores[track_id] *= 0.99
-
-                # Annotate frame with tracking info and alerts
-                annotated_frame = self.annotate_frame(frame, results[0], frame_alerts)
-                return annotated_frame, frame_alerts
-
-        return frame, frame_alerts
-
-    def send_telegram_alert(self, alert_data):
-        try:
-            bot_token = '7652787142:AAG8S_ayLwYCAUNCxwwrePJ9m5x2rbHqQBE'
-            chat_id = '938547627'
-
-        # System/Camera name
-            system_name = "🛡️ Hackathon Security Bot"
-
-            alert_type = alert_data.get("type", "unknown").upper()
-            track_id = alert_data.get("track_id", "N/A")
-            suspicion_score = alert_data.get("suspicion_score", 0.0)
-            location = alert_data.get("location", (0, 0))
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert_data.get("timestamp", time.time())))
-            zone_id = alert_data.get("zone_id", None)
-            behaviors = alert_data.get("behaviors", [])
-
-        # Compose message
-            message = f"{system_name}\n\n"
-            message += f"🚨 *{alert_type} Detected!*\n"
-            message += f"🆔 Track ID: `{track_id}`\n"
-            message += f"📍 Location: `{location}`\n"
-            if zone_id is not None:
-                message += f"🗺️ Zone ID: `{zone_id}`\n"
-            if behaviors:
-                message += f"🧠 Behaviors: {', '.join(behaviors)}\n"
-            message += f"📈 Suspicion Score: `{suspicion_score:.1f}`\n"
-            message += f"🕒 Time: {timestamp}"
-
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": "Markdown"
-            }
+        # Only tracked detections (with IDs) can be analyzed
+        if not self.has_tracked_boxes(results):
+            return frame_alerts
 
-            response = requests.post(url, data=payload)
-            if response.status_code != 200:
-                print("Telegram alert failed:", response.text)
+        # Pull all tracked boxes to host memory in one transfer
+        boxes = results[0].boxes.cpu().numpy()
+        return self.analyze_detections(boxes.id.astype(int), boxes.xyxy, boxes.conf)
 
-        except Exception as e:
-            print(f"Telegram alert error: {e}")
+    def analyze_detections(self, track_ids, xyxy, confidences, current_time=None):
+        """Update tracks from one frame of tracked boxes (IDs, [x1,y1,x2,y2], confidences) and return its alerts"""
+        frame_alerts = []
+        if current_time is None:
+            current_time = time.time()
+
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        confidences = np.asarray(confidences)
+
+        # Calculate all center points at once
+        centers = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+
+        # Direction of movement for pacing detection: 1 = right, -1 = left, 0 = keep last direction
+        if self.rule_engine.needs("direction_changes"):
+            # Previous x position of each track (NaN for tracks seen for the first time)
+            prev_x = np.array([
+                self.tracks[track_id].last_position[0] if track_id in self.tracks else np.nan
+                for track_id in track_ids.tolist()
+            ], dtype=np.float64)
+            hysteresis = self.config["direction_hysteresis"]
+            directions = np.where(centers[:, 0] > prev_x + hysteresis, 1,
+                                  np.where(centers[:, 0] < prev_x - hysteresis, -1, 0))
+        else:
+            directions = np.zeros(len(track_ids), dtype=np.int64)
+
+        # Zone membership of all track centers in one batched test
+        if self.rule_engine.needs("zone_hits") and self.config['zones_enabled'] and len(self.zone_index) > 0:
+            zone_hits = self.zone_index.first_zone(centers)
+        else:
+            zone_hits = np.full(len(track_ids), -1)
+
+        # Behavior rules run once per frame over all tracks, after every track is updated
+        batched = self.config["batched_analysis"]
+
+        # Per-track bookkeeping
+        for track_id, (x_center, y_center), direction, confidence, zone_id in zip(
+            track_ids.tolist(), centers.tolist(), directions.tolist(), confidences.tolist(), zone_hits.tolist()
+        ):
+            # Initialize or update track
+            if track_id not in self.tracks:
+                track = TrackHistory(self.config["track_history_size"])
+                track.append(x_center, y_center, current_time)
+                track.confidence = confidence
+                self.tracks[track_id] = track
+                self.suspicion_scores[track_id] = 0.0
+            else:
+                track = self.tracks[track_id]
 
-    def is_quiet_period(self):
-        """Check if current time is in the configured quiet period"""
-        if not self.config.get("quiet_period_enabled", False):
-            return False
+                # Update position, time and detection confidence (ring buffer drops the oldest sample)
+                track.append(x_center, y_center, current_time)
+                track.confidence = confidence
+
+                # Count direction changes for pacing detection
+                curr_direction = "right" if direction == 1 else "left" if direction == -1 else track.last_direction
+
+                if track.last_direction is not None and curr_direction != track.last_direction:
+                    track.direction_changes += 1
+
+                track.last_direction = curr_direction
+
+            # Per-track behavior analysis (reference path)
+            if not batched:
+                frame_alerts.extend(self.analyze_behaviors(track_id, current_time, zone_id))
+
+        if batched:
+            frame_alerts = self.analyze_frame_behaviors(track_ids.tolist(), current_time, zone_hits)
+
+        # Drop tracks that have not been seen for a while
+        if current_time - self.last_eviction_time >= self.config["track_eviction_interval"]:
+            self.evict_stale_tracks(current_time)
 
+        # Decay suspicion scores slightly over time (one array pass over active tracks)
+        if self.suspicion_scores:
+            track_ids = list(self.suspicion_scores.keys())
+            scores = np.fromiter(self.suspicion_scores.values(), dtype=np.float64, count=len(track_ids))
+            self.suspicion_scores.update(zip(track_ids, (scores * 0.99).tolist()))
+
+        return frame_alerts
+
+    def evict_stale_tracks(self, current_time=None):
+        """Forget tracks not seen within track_ttl seconds; returns the evicted track IDs"""
+        if current_time is None:
+            current_time = time.time()
+        self.last_eviction_time = current_time
+
+        ttl = self.config.get("track_ttl", 0)
+        if not ttl or not self.tracks:
+            return []
+
+        # Find stale tracks from their last-seen timestamps in one pass
+        track_ids = list(self.tracks.keys())
+        last_seen = np.fromiter(
+            (track.last_timestamp for track in self.tracks.values()),
+            dtype=np.float64,
+            count=len(track_ids)
+        )
+        stale_ids = [track_ids[i] for i in np.flatnonzero(last_seen < current_time - ttl)]
+
+        for track_id in stale_ids:
+            track = self.tracks.pop(track_id)
+            score = self.suspicion_scores.pop(track_id, 0.0)
+            self.last_alert_time.pop(track_id, None)
+
+            # Hand the track over for archiving before it is gone
+            if self.on_track_evicted:
+                try:
+                    self.on_track_evicted(track_id, track, score)
+                except Exception as e:
+                    print(f"Track archive callback error: {e}")
+
+        self.evicted_count += len(stale_ids)
+        return stale_ids
+
+    def render_frame(self, frame, results, alerts, scores=None):
+        """Annotate a frame if it has tracked detections, otherwise return it unchanged"""
+        if not self.has_tracked_boxes(results):
+            return frame
+
+        # Annotate frame with tracking info and alerts
+        with profiler.stage("annotate"):
+            return self.annotate_frame(frame, results[0], alerts, scores)
+
+    def send_notification(self, alert_data):
+        """Hand an alert to the notification dispatcher (never blocks the video pipeline)"""
+        if self.camera_id is not None and alert_data.get("camera_id") is None:
+            alert_data = dict(alert_data, camera_id=self.camera_id)
+        self.dispatcher.submit(alert_data)
+
+    def _compile_quiet_period(self):
+        # Parse the quiet period strings into (start, end) times; None disables the quiet period
         start_str = self.config.get("quiet_period_start", "22:00")
         end_str = self.config.get("quiet_period_end", "06:00")
 
-        # Parse time strings
         try:
-            from datetime import datetime, time
-            now = datetime.now().time()
             start_hours, start_minutes = map(int, start_str.split(":"))
             end_hours, end_minutes = map(int, end_str.split(":"))
-
-            start_time = time(start_hours, start_minutes)
-            end_time = time(end_hours, end_minutes)
-
-            # Handle overnight periods (e.g., 22:00 to 06:00)
-            if start_time > end_time:
-                return now >= start_time or now <= end_time
-            else:
-                return start_time <= now <= end_time
+            self.quiet_window = (dt_time(start_hours, start_minutes), dt_time(end_hours, end_minutes))
         except Exception as e:
-            print(f"Error checking quiet period: {e}")
+            print(f"Error parsing quiet period: {e}")
+            self.quiet_window = None
+
+    def is_quiet_period(self):
+        """Check if current time is in the configured quiet period"""
+        if not self.config.get("quiet_period_enabled", False) or self.quiet_window is None:
             return False
 
-    def analyze_behaviors(self, track_id, current_time):
-        """Analyze tracked person for suspicious behaviors"""
+        start_time, end_time = self.quiet_window
+        now = datetime.now().time()
+
+        # Handle overnight periods (e.g., 22:00 to 06:00)
+        if start_time > end_time:
+            return now >= start_time or now <= end_time
+        else:
+            return start_time <= now <= end_time
+
+    def analyze_behaviors(self, track_id, current_time, zone_id=None):
+        """Analyze one tracked person for suspicious behaviors (per-track reference path)
+
+        Runs each enabled rule's scalar `check` on this track alone, independently
+        of the batched TrackFeatures path. It is the default; batched_analysis=True
+        switches to analyze_frame_behaviors, which must produce the same alerts. zone_id is the precomputed first zone
+        containing the track (-1 for none); when omitted it is looked up in the
+        zone index.
+        """
         track = self.tracks[track_id]
         alerts = []
         behaviors_detected = []
@@ -214,102 +344,42 @@ class SecurityAnalyzer:
         if self.is_quiet_period():
             return alerts
 
-        # Avoid alert spam - don't alert on same ID within 10 seconds
-        if track_id in self.last_alert_time and current_time - self.last_alert_time[track_id] < 10:
+        # Avoid alert spam - don't alert on the same ID within the cooldown
+        last_alert = self.last_alert_time.get(track_id)
+        if last_alert is not None and current_time - last_alert < self.config["alert_cooldown"]:
             return alerts
 
-        # Check for loitering
-        loitering_detected = False
-        if len(track['timestamps']) > 5:
-            duration = track['timestamps'][-1] - track['timestamps'][0]
-            if duration > self.config['loitering_threshold']:
-                # Check if movement is minimal
-                recent_positions = np.array(track['positions'][-10:])
-                if len(recent_positions) >= 2:
-                    x_var = np.var([p[0] for p in recent_positions])
-                    y_var = np.var([p[1] for p in recent_positions])
-
-                    # If variance is low in both x and y, person is relatively stationary
-                    if x_var < 500 and y_var < 500:  # Adjust thresholds based on your camera
-                        loitering_detected = True
-                        behaviors_detected.append("loitering")
-                        # Increase suspicion score
-                        self.suspicion_scores[track_id] += 2.0
-
-                        alert_data = {
-                            "type": "loitering",
-                            "track_id": track_id,
-                            "timestamp": current_time,
-                            "location": track['positions'][-1],
-                            "duration": duration,
-                            "suspicion_score": self.suspicion_scores[track_id]
-                        }
-                        alerts.append(alert_data)
-                        self.send_telegram_alert(alert_data)
-
-        # Check for pacing
-        pacing_detected = False
-        if track['direction_changes'] >= self.config['pacing_threshold']:
-            pacing_detected = True
-            behaviors_detected.append("pacing")
-            # Increase suspicion score
-            self.suspicion_scores[track_id] += 1.5
+        location = track.last_position
+        for rule in self.rule_engine.rules:
+            details = rule.check(track, current_time, zone_id, self.zone_index, self.config)
+            if details is None:
+                continue
+            behaviors_detected.append(rule.name)
+            self.suspicion_scores[track_id] += rule.weight
 
             alert_data = {
-                "type": "pacing",
+                "type": rule.name,
                 "track_id": track_id,
                 "timestamp": current_time,
-                "location": track['positions'][-1],
-                "direction_changes": track['direction_changes'],
+                "location": location,
+                **details,
                 "suspicion_score": self.suspicion_scores[track_id]
             }
             alerts.append(alert_data)
-            track['direction_changes'] = 0  # Reset counter
-
-        # Check for zone intrusion
-        if self.config['zones_enabled'] and len(self.config['intrusion_zones']) > 0:
-            current_point = track['positions'][-1]
-
-            for zone_idx, zone in enumerate(self.config['intrusion_zones']):
-                # Skip inactive zones
-                if not zone.get('active', True):
-                    continue
-
-                # Convert zone format if necessary (handle both old and new formats)
-                zone_points = zone['points'] if isinstance(zone, dict) else zone
-
-                if self.point_in_polygon(current_point, zone_points):
-                    behaviors_detected.append("zone_intrusion")
-                    # Increase suspicion score
-                    self.suspicion_scores[track_id] += 3.0
-
-                    # Get zone name
-                    zone_name = zone.get('name', f"Zone {zone_idx+1}") if isinstance(zone, dict) else f"Zone {zone_idx+1}"
-
-                    alert_data = {
-                        "type": "zone_intrusion",
-                        "track_id": track_id,
-                        "timestamp": current_time,
-                        "location": current_point,
-                        "suspicion_score": self.suspicion_scores[track_id],
-                        "zone_id": zone_idx,
-                        "zone_name": zone_name
-                    }
-                    alerts.append(alert_data)
-                    break  # Only report the first zone intrusion
+            rule.on_alert(track)
+            if rule.notify:
+                self.send_notification(alert_data)
 
         # Check for high risk combination of behaviors
-        if len(behaviors_detected) > 1 or self.suspicion_scores[track_id] >= 5.0:
-            # Create high risk alert
-            alert_data = {
+        if self.rule_engine.is_high_risk(behaviors_detected, self.suspicion_scores[track_id]):
+            alerts.append({
                 "type": "high_risk",
                 "track_id": track_id,
                 "timestamp": current_time,
-                "location": track['positions'][-1],
+                "location": location,
                 "behaviors": behaviors_detected,
                 "suspicion_score": self.suspicion_scores[track_id]
-            }
-            alerts.append(alert_data)
+            })
 
             # Play high risk sound alert
             if self.config["audio_alerts"]:
@@ -325,6 +395,93 @@ class SecurityAnalyzer:
 
         return alerts
 
+    def analyze_frame_behaviors(self, track_ids, current_time, zone_hits=None):
+        """Analyze all tracks seen in a frame for suspicious behaviors at once
+
+        Every enabled behavior rule is evaluated as array operations over all
+        tracks; only tracks that raise an alert are then visited one by one.
+        """
+        frame_alerts = []
+        n = len(track_ids)
+
+        # Quiet period suppresses all alerts - checked once per frame
+        if n == 0 or self.is_quiet_period():
+            return frame_alerts
+
+        tracks = [self.tracks[track_id] for track_id in track_ids]
+
+        # Avoid alert spam - don't alert on the same ID within the cooldown
+        last_alert = np.fromiter(
+            map(self.last_alert_time.get, track_ids, repeat(-np.inf, n)), dtype=np.float64, count=n
+        )
+        active = ~(current_time - last_alert < self.config["alert_cooldown"])
+        if not active.any():
+            return frame_alerts
+
+        # Features are computed on demand by the enabled rules
+        features = TrackFeatures(tracks, track_ids, current_time, self.zone_index, zone_hits)
+        matches = self.rule_engine.evaluate(features, active, self.config)
+
+        # Tracks already at a high score raise high_risk alerts even without a new behavior
+        alerting = np.zeros(n, dtype=bool)
+        for _, mask in matches:
+            alerting |= mask
+        if self.rule_engine.high_risk["enabled"]:
+            scores = np.fromiter(map(self.suspicion_scores.__getitem__, track_ids), dtype=np.float64, count=n)
+            alerting |= active & (scores >= self.rule_engine.high_risk["score_threshold"])
+
+        for i in np.flatnonzero(alerting).tolist():
+            track_id = track_ids[i]
+            track = tracks[i]
+            location = track.last_position
+            alerts = []
+            behaviors_detected = []
+
+            for rule, mask in matches:
+                if not mask[i]:
+                    continue
+                behaviors_detected.append(rule.name)
+                self.suspicion_scores[track_id] += rule.weight
+
+                alert_data = {
+                    "type": rule.name,
+                    "track_id": track_id,
+                    "timestamp": current_time,
+                    "location": location,
+                    **rule.details(features, i),
+                    "suspicion_score": self.suspicion_scores[track_id]
+                }
+                alerts.append(alert_data)
+                rule.on_alert(track)
+                if rule.notify:
+                    self.send_notification(alert_data)
+
+            # Check for high risk combination of behaviors
+            if self.rule_engine.is_high_risk(behaviors_detected, self.suspicion_scores[track_id]):
+                alerts.append({
+                    "type": "high_risk",
+                    "track_id": track_id,
+                    "timestamp": current_time,
+                    "location": location,
+                    "behaviors": behaviors_detected,
+                    "suspicion_score": self.suspicion_scores[track_id]
+                })
+
+                # Play high risk sound alert
+                if self.config["audio_alerts"]:
+                    self.play_audio_alert("high_risk")
+            elif alerts and self.config["audio_alerts"]:
+                # Play individual behavior alert
+                self.play_audio_alert(alerts[0]["type"])
+
+            # If any alerts were generated, update last alert time
+            if alerts:
+                self.last_alert_time[track_id] = current_time
+                self.alerts.extend(alerts)
+                frame_alerts.extend(alerts)
+
+        return frame_alerts
+
     def play_audio_alert(self, alert_type):
         """Play MP3 audio alert with multiple fallback methods"""
         # Use MP3 files directly
@@ -363,135 +520,55 @@ class SecurityAnalyzer:
 
     def point_in_polygon(self, point, polygon):
         """Check if a point is inside a polygon"""
-        x, y = point
-        n = len(polygon)
-        inside = False
-
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-
-        return inside
-
-    def annotate_frame(self, frame, result, alerts):
-        """Draw tracking info and alerts on frame"""
-        # Draw detection boxes and tracking IDs
-        annotated_frame = result.plot()
-
-        # Draw alert info
-        for alert in alerts:
-            alert_type = alert["type"]
-            location = alert["location"]
-            track_id = alert["track_id"]
-            suspicion_score = alert.get("suspicion_score", 0)
-
-            # Convert to pixel coordinates
-            x, y = int(location[0]), int(location[1])
-
-            # Set color based on suspicion score
-            if suspicion_score >= 5.0:
-                color = (0, 0, 255)  # Red for high suspicion
-            elif suspicion_score >= 3.0:
-                color = (0, 165, 255)  # Orange for medium suspicion
-            else:
-                color = (0, 255, 255)  # Yellow for low suspicion
-
-            # Draw alert indicator
-            cv2.circle(annotated_frame, (x, y), 20, color, -1)
-            cv2.putText(
-                annotated_frame,
-                f"{alert_type.upper()}: ID {track_id} ({suspicion_score:.1f})",
-                (x - 10, y - 25),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2
-            )
-
-        # Draw active intrusion zones
-        if self.config['zones_enabled']:
-            for i, zone in enumerate(self.config['intrusion_zones']):
-                # Skip inactive zones
-                if isinstance(zone, dict) and not zone.get('active', True):
-                    continue
+        return point_in_polygon(point, polygon)
 
-                # Convert zone format if necessary
-                zone_points = zone['points'] if isinstance(zone, dict) else zone
-
-                # Convert to numpy array for drawing
-                if len(zone_points) > 2:  # Need at least 3 points to form a polygon
-                    points = np.array(zone_points, dtype=np.int32)
-
-                    # Get zone name
-                    zone_name = zone.get('name', f"Zone {i+1}") if isinstance(zone, dict) else f"Zone {i+1}"
-
-                    # Draw zone polygon
-                    cv2.polylines(annotated_frame, [points], True, (0, 255, 0), 2)
-                    # Add zone label at the top-left corner of the zone
-                    cv2.putText(
-                        annotated_frame,
-                        zone_name,
-                        (points[0][0], points[0][1] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 255, 0),
-                        1
-                    )
-
-        # Indicate quiet period if active
-        if self.is_quiet_period():
-            cv2.putText(
-                annotated_frame,
-                "QUIET PERIOD ACTIVE - ALERTS SUPPRESSED",
-                (10, frame.shape[0] - 20),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2
-            )
-
-        # Draw suspicion scores for all tracked objects
-        y_offset = 30
-        cv2.putText(
-            annotated_frame,
-            "Suspicion Scores:",
-            (10, y_offset),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2
-        )
+    def annotate_frame(self, frame, result, alerts, scores=None):
+        """Draw tracking info and alerts on a copy of the frame"""
+        # Scores can be a snapshot taken at inference time when annotating on another thread
+        if scores is None:
+            scores = self.suspicion_scores
 
-        for track_id, score in sorted(
-            self.suspicion_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5]:  # Show top 5 scores
-            y_offset += 25
-            cv2.putText(
-                annotated_frame,
-                f"ID {track_id}: {score:.1f}",
-                (10, y_offset),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6,
-                (0, 0, 255) if score >= 5.0 else
-                (0, 165, 255) if score >= 3.0 else
-                (0, 255, 255),
-                2
-            )
-
-        return annotated_frame
+        return self.renderer.render(
+            frame, result, alerts, scores,
+            self.config['intrusion_zones'], self.config['zones_enabled'], self.is_quiet_period()
+        )
 
     def get_recent_alerts(self, limit=10):
         """Get the most recent alerts"""
-        return self.alerts[-limit:]
+        return list(self.alerts)[-limit:]
 
     def update_config(self, new_config):
         """Update the analyzer configuration"""
+        tracker_config = self.config.get("tracker")
         self.config.update(new_config)
+
+        # Start a new tracker when a different one is configured
+        if self.config.get("tracker") != tracker_config:
+            self.tracker = None
+
+        # Recompile zone geometry when zones change
+        if "intrusion_zones" in new_config:
+            self.zone_index.compile(self.config["intrusion_zones"])
+
+        # ROI plans depend on the ROI settings and on the zones
+        self.region_planner.update_config(self.config)
+
+        # Recompile behavior rules when their settings change
+        if "behavior_rules" in new_config:
+            self.rule_engine.compile(self.config["behavior_rules"])
+
+        # Re-parse the quiet period window when its times change
+        if "quiet_period_start" in new_config or "quiet_period_end" in new_config:
+            self._compile_quiet_period()
+
+        # Rebuild notifier backends if their settings changed
+        if any(key in new_config for key in NOTIFIER_CONFIG_KEYS):
+            self.dispatcher.set_notifiers(build_notifiers(self.config))
         return self.config
 
 # Function to run detection on video
-def run_security_analyzer(video_source=0, output_file=None, config=None):
-    """Run the security analyzer on a video source"""
+def run_security_analyzer(video_source=0, output_file=None, config=None, recording_dir=None):
+    """Run the security analyzer on a video source (recording_dir: also record it in indexed segments)"""
     analyzer = SecurityAnalyzer(config)
     cap = cv2.VideoCapture(video_source)
 
@@ -499,6 +576,7 @@ def run_security_analyzer(video_source=0, output_file=None, config=None):
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    analyzer.source_fps = fps
 
     # Setup output writer if needed
     writer = None
@@ -506,6 +584,11 @@ def run_security_analyzer(video_source=0, output_file=None, config=None):
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         writer = cv2.VideoWriter(output_file, fourcc, fps, (width, height))
 
+    recorder = None
+    if recording_dir:
+        from recording import SegmentRecorder
+        recorder = SegmentRecorder(recording_dir)
+
     # Process video frames
     while cap.isOpened():
         success, frame = cap.read()
@@ -523,6 +606,8 @@ def run_security_analyzer(video_source=0, output_file=None, config=None):
         # Write frame to output if needed
         if writer:
             writer.write(processed_frame)
+        if recorder:
+            recorder.add_frame("main", processed_frame)
 
         # Display the frame
         cv2.imshow('Security Monitor', processed_frame)
@@ -535,6 +620,8 @@ def run_security_analyzer(video_source=0, output_file=None, config=None):
     cap.release()
     if writer:
         writer.release()
+    if recorder:
+        recorder.stop()
     cv2.destroyAllWindows()
 
     return analyzer.get_recent_alerts()
@@ -567,6 +654,7 @@ if __name__ == "__main__":
         "high_risk": "High risk behavior detected! Security response required."
     }
 
+    from gtts import gTTS
     for alert_type, text in alerts.items():
         tts = gTTS(text=text, lang='en')
         tts.save(f"sounds/{alert_type}_alert.mp3")
@@ -584,6 +672,7 @@ if __name__ == "__main__":
         print(alert)
 
     # Load YOLOv8 model
+    from ultralytics import YOLO
     model = YOLO("yolov8n.pt")
 
     # Open video stream
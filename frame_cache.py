@@ -0,0 +1,152 @@
+import asyncio
+import base64
+import threading
+
+import cv2
+
+from metrics import profiler
+
+
+class FrameCache:
+    """Latest processed frame with its JPEG encoding computed at most once.
+
+    Every published frame gets a sequence number. The JPEG (and its base64 form)
+    is encoded lazily on first request and then reused by every viewer until the
+    next frame is published, so encode cost follows the frame rate rather than
+    the number of clients.
+
+    Streaming viewers `subscribe()` from the event loop and are woken once per new
+    frame; while anyone is subscribed, the publishing thread encodes the frame
+    itself so the event loop only ever hands out ready bytes.
+    """
+
+    def __init__(self, quality=95):
+        self.quality = quality
+        self.lock = threading.Lock()
+
+        self.frame = None
+        self.seq = 0
+
+        # Encoded forms of the current frame, tagged with the (seq, quality) they belong to
+        self._jpeg = None
+        self._jpeg_key = None
+        self._base64 = None
+        self._base64_source = None
+
+        # Number of actual cv2.imencode calls, for monitoring
+        self.encode_count = 0
+
+        # Event loop of the streaming viewers and the event they are waiting on
+        self.loop = None
+        self._new_frame = None
+        self.subscribers = 0
+
+    def publish(self, frame):
+        """Store a new processed frame and wake up streaming viewers"""
+        with self.lock:
+            self.frame = frame
+            self.seq += 1
+            seq = self.seq
+
+            # Encode here (on the processing thread) when viewers are waiting for it
+            if self.subscribers:
+                self._encode_locked()
+
+        loop = self.loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._notify)
+            except RuntimeError:
+                # Event loop has been closed
+                self.loop = None
+        return seq
+
+    def _notify(self):
+        # Runs on the event loop: release everyone waiting and arm a fresh event
+        event, self._new_frame = self._new_frame, asyncio.Event()
+        if event is not None:
+            event.set()
+
+    def _encode_locked(self):
+        key = (self.seq, self.quality)
+        if self._jpeg_key != key:
+            with profiler.stage("encode"):
+                ret, buffer = cv2.imencode('.jpg', self.frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ret:
+                return None
+            self._jpeg = buffer.tobytes()
+            self._jpeg_key = key
+            self.encode_count += 1
+        return self._jpeg
+
+    def encoded(self, seq):
+        """JPEG of frame `seq` if it has already been encoded, without encoding it"""
+        with self.lock:
+            if self._jpeg_key is not None and self._jpeg_key[0] == seq:
+                return self._jpeg
+            return None
+
+    def set_quality(self, quality):
+        """Change the JPEG quality used for subsequent encodes"""
+        with self.lock:
+            self.quality = int(quality)
+
+    def get_jpeg(self):
+        """Return (seq, jpeg_bytes) for the current frame, or (seq, None) if there is none"""
+        with self.lock:
+            if self.frame is None:
+                return self.seq, None
+            return self.seq, self._encode_locked()
+
+    def get_base64(self):
+        """Return (seq, data_url) for the current frame, or (seq, None) if there is none"""
+        seq, jpeg = self.get_jpeg()
+        if jpeg is None:
+            return seq, None
+
+        with self.lock:
+            # Memoized per encoded JPEG, so it is rebuilt only when the JPEG itself changes
+            if self._base64_source is not jpeg:
+                self._base64 = f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}"
+                self._base64_source = jpeg
+            return seq, self._base64
+
+    async def subscribe(self, is_active=None, timeout=1.0):
+        """Async iterator yielding each new JPEG once; slow consumers skip to the newest frame"""
+        # Attach to the event loop of the first viewer
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self._new_frame = asyncio.Event()
+
+        with self.lock:
+            self.subscribers += 1
+        try:
+            last_seq = 0
+            while is_active is None or is_active():
+                if self.seq <= last_seq:
+                    # Wait for the processing thread to publish; time out to re-check is_active
+                    try:
+                        await asyncio.wait_for(self._new_frame.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                # Always jump to the latest frame, never replay the ones we missed
+                with self.lock:
+                    seq = self.seq
+                    jpeg = self._encode_locked() if self.frame is not None else None
+                last_seq = seq
+                if jpeg is not None:
+                    yield jpeg
+        finally:
+            with self.lock:
+                self.subscribers -= 1
+
+    def stats(self):
+        """Sequence number, encode counter and number of streaming viewers"""
+        return {
+            "seq": self.seq,
+            "encode_count": self.encode_count,
+            "quality": self.quality,
+            "subscribers": self.subscribers,
+        }
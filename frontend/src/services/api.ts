@@ -1,4 +1,4 @@
-import { Alert, Config, ApiResponse } from "../types";
+import { Alert, AlertBucket, AlertFilters, Config, ApiResponse } from "../types";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -43,19 +43,28 @@ export const apiService = {
 
   async getAlerts(
     limit: number = 20,
-    offset: number = 0
+    offset: number = 0,
+    filters: AlertFilters = {}
   ): Promise<
     ApiResponse<{
       alerts: Alert[];
-      total: number;
+      total: number | null;
       limit: number;
       offset: number;
+      next_cursor: string | null;
     }>
   > {
     try {
-      const response = await fetch(
-        `${API_BASE_URL}/alerts?limit=${limit}&offset=${offset}`
-      );
+      const params = new URLSearchParams({
+        limit: String(limit),
+        offset: String(offset),
+      });
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== "") {
+          params.append(key, String(value));
+        }
+      });
+      const response = await fetch(`${API_BASE_URL}/alerts?${params}`);
       if (!response.ok) {
         throw new Error(`HTTP error! Status: ${response.status}`);
       }
@@ -69,6 +78,31 @@ export const apiService = {
     }
   },
 
+  async getAlertStats(
+    groupBy: "type" | "zone" | "camera" | "track" | "hour",
+    filters: AlertFilters = {}
+  ): Promise<ApiResponse<{ group_by: string; buckets: AlertBucket[] }>> {
+    try {
+      const params = new URLSearchParams({ group_by: groupBy });
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== "") {
+          params.append(key, String(value));
+        }
+      });
+      const response = await fetch(`${API_BASE_URL}/alerts/aggregate?${params}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+      }
+      const data = await response.json();
+      return { data };
+    } catch (error) {
+      console.error("Error fetching alert stats:", error);
+      return {
+        error: error instanceof Error ? error.message : "Unknown error",
+      };
+    }
+  },
+
   async deleteAlert(
     alertId: string
   ): Promise<ApiResponse<{ message: string }>> {
@@ -0,0 +1,65 @@
+import { TrackState, TrackTelemetryFrame } from "../types";
+
+// Binary layout written by the API's telemetry.py (little endian)
+const HEADER_SIZE = 25;
+const TRACK_SIZE = 18;
+
+export const decodeTelemetry = (
+  buffer: ArrayBuffer,
+  behaviorNames: string[]
+): TrackTelemetryFrame | null => {
+  const view = new DataView(buffer);
+  if (view.byteLength < HEADER_SIZE || view.getUint8(0) !== 84 || view.getUint8(1) !== 84) {
+    return null; // Not "TT"
+  }
+
+  const flags = view.getUint8(3);
+  const seq = view.getUint32(4, true);
+  const timestamp = view.getFloat64(8, true);
+  const width = view.getUint16(16, true);
+  const height = view.getUint16(18, true);
+  const trackCount = view.getUint16(20, true);
+  const removedCount = view.getUint16(22, true);
+  const nameLength = view.getUint8(24);
+  let offset = HEADER_SIZE;
+  const cameraId = new TextDecoder().decode(new Uint8Array(buffer, offset, nameLength));
+  offset += nameLength;
+
+  const tracks: Record<number, TrackState> = {};
+  for (let i = 0; i < trackCount; i++, offset += TRACK_SIZE) {
+    const bbox = [0, 1, 2, 3].map((k) => view.getInt16(offset + 4 + k * 2, true));
+    const mask = view.getUint32(offset + 14, true);
+    tracks[view.getUint32(offset, true)] = {
+      bbox,
+      center: [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2],
+      suspicion_score: view.getUint16(offset + 12, true) / 100,
+      behaviors: behaviorNames.filter((_, bit) => mask & (1 << bit)),
+    };
+  }
+
+  const removed: number[] = [];
+  for (let i = 0; i < removedCount; i++, offset += 4) {
+    removed.push(view.getUint32(offset, true));
+  }
+
+  return {
+    camera_id: cameraId,
+    seq,
+    timestamp,
+    keyframe: (flags & 1) === 1,
+    width,
+    height,
+    tracks,
+    removed,
+  };
+};
+
+// Apply a telemetry frame to the tracks known for its camera
+export const applyTelemetry = (
+  tracks: Record<number, TrackState>,
+  frame: TrackTelemetryFrame
+): Record<number, TrackState> => {
+  const next = frame.keyframe ? {} : { ...tracks };
+  frame.removed.forEach((id) => delete next[id]);
+  return Object.assign(next, frame.tracks);
+};
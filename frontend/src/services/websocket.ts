@@ -1,4 +1,5 @@
-import { Alert, Config } from "../types";
+import { Alert, Config, TrackTelemetryFrame } from "../types";
+import { decodeTelemetry } from "./telemetry";
 
 type WebSocketCallbacks = {
   onNewAlert?: (alert: Alert) => void;
@@ -7,6 +8,7 @@ type WebSocketCallbacks = {
   onConnect?: () => void;
   onDisconnect?: () => void;
   onError?: (error: string) => void;
+  onTelemetry?: (frame: TrackTelemetryFrame) => void;
 };
 
 export class WebSocketService {
@@ -14,6 +16,8 @@ export class WebSocketService {
   private callbacks: WebSocketCallbacks = {};
   private reconnectTimer: NodeJS.Timeout | null = null;
   private url: string;
+  private behaviorNames: string[] = [];
+  private subscriptions: string[] = [];
 
   constructor(baseUrl: string) {
     this.url = `ws://${baseUrl.replace(/^https?:\/\//, "")}/ws`;
@@ -23,11 +27,15 @@ export class WebSocketService {
     if (this.socket) return;
 
     this.socket = new WebSocket(this.url);
+    this.socket.binaryType = "arraybuffer";
 
     this.socket.onopen = () => {
       console.log("WebSocket connected");
       if (this.callbacks.onConnect) this.callbacks.onConnect();
 
+      // Restore telemetry subscriptions after a reconnect
+      if (this.subscriptions.length) this.sendMessage({ subscribe: this.subscriptions });
+
       // Clear any reconnect timer
       if (this.reconnectTimer) {
         clearTimeout(this.reconnectTimer);
@@ -36,12 +44,23 @@ export class WebSocketService {
     };
 
     this.socket.onmessage = (event) => {
+      // Binary messages are track telemetry
+      if (event.data instanceof ArrayBuffer) {
+        const frame = decodeTelemetry(event.data, this.behaviorNames);
+        if (frame && this.callbacks.onTelemetry) this.callbacks.onTelemetry(frame);
+        return;
+      }
+
       try {
         const data = JSON.parse(event.data);
+        if (data.telemetry_behaviors) this.behaviorNames = data.telemetry_behaviors;
 
         // Handle different message types
         if (data.new_alert && this.callbacks.onNewAlert) {
           this.callbacks.onNewAlert(data.new_alert);
+        } else if (data.new_alerts && this.callbacks.onNewAlert) {
+          // Alerts batched by the server (ws_alert_batch_interval)
+          data.new_alerts.forEach((alert: Alert) => this.callbacks.onNewAlert!(alert));
         } else if (data.config_updated && this.callbacks.onConfigUpdate) {
           this.callbacks.onConfigUpdate(data.config_updated);
         } else if (data.camera_changed && this.callbacks.onCameraChange) {
@@ -96,6 +115,19 @@ export class WebSocketService {
     this.sendMessage({ config });
   }
 
+  // Receive track telemetry of every camera, or of one camera only
+  public subscribeTelemetry(cameraId?: string): void {
+    const topic = cameraId ? `telemetry:${cameraId}` : "telemetry";
+    if (!this.subscriptions.includes(topic)) this.subscriptions.push(topic);
+    this.sendMessage({ subscribe: [topic] });
+  }
+
+  public unsubscribeTelemetry(cameraId?: string): void {
+    const topic = cameraId ? `telemetry:${cameraId}` : "telemetry";
+    this.subscriptions = this.subscriptions.filter((t) => t !== topic);
+    this.sendMessage({ unsubscribe: [topic] });
+  }
+
   public setCallbacks(callbacks: WebSocketCallbacks): void {
     this.callbacks = callbacks;
   }
@@ -28,9 +28,47 @@ export interface Alert {
   direction_changes?: number;
   zone_id?: number;
   zone_name?: string;
+  camera_id?: string;
+}
+
+export interface AlertFilters {
+  type?: string;
+  track_id?: number;
+  zone_name?: string;
+  camera_id?: string;
+  start_time?: number;
+  end_time?: number;
+  min_score?: number;
+  cursor?: string;
+  order?: "asc" | "desc";
+  include_total?: boolean;
+}
+
+export interface AlertBucket {
+  key: string | number | null;
+  count: number;
+  max_suspicion_score: number | null;
 }
 
 export interface ApiResponse<T> {
   data?: T;
   error?: string;
 }
+
+export interface TrackState {
+  bbox: number[];
+  center: number[];
+  suspicion_score: number;
+  behaviors: string[];
+}
+
+export interface TrackTelemetryFrame {
+  camera_id: string;
+  seq: number;
+  timestamp: number;
+  keyframe: boolean;
+  width: number;
+  height: number;
+  tracks: Record<number, TrackState>;
+  removed: number[];
+}
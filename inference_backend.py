@@ -0,0 +1,236 @@
+import importlib.util
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Ultralytics export format and the artifact it produces, per backend
+BACKENDS = {
+    "onnx": {"format": "onnx", "suffix": ".onnx", "requires": ("onnx", "onnxruntime")},
+    "openvino": {"format": "openvino", "suffix": "_openvino_model", "requires": ("openvino",)},
+}
+
+# Models loaded in this process, keyed by their load_model options
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def default_threads():
+    """Intra-op threads for CPU inference: the number of physical cores"""
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+
+def backend_available(backend):
+    """Whether the packages needed to export and run a backend are installed (every backend loads through ultralytics)"""
+    required = ("torch", "ultralytics")
+    if backend != "torch":
+        required += BACKENDS[backend]["requires"]
+    return all(importlib.util.find_spec(name) is not None for name in required)
+
+
+def resolve_backend(backend="auto"):
+    """Pick the backend for "auto": PyTorch with a GPU, otherwise ONNX Runtime if installed"""
+    if backend != "auto":
+        return backend
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "torch"
+    except ImportError:
+        pass
+    return "onnx" if backend_available("onnx") else "torch"
+
+
+def artifact_path(weights, backend, imgsz, int8=False, cache_dir="models"):
+    """Where the exported model for these settings is cached"""
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}_{imgsz}{'_int8' if int8 else ''}{BACKENDS[backend]['suffix']}"
+    return os.path.join(cache_dir, name)
+
+
+def export_model(weights, backend, imgsz=640, int8=False, cache_dir="models"):
+    """Export PyTorch weights to a backend once and return the cached artifact path"""
+    from ultralytics import YOLO
+
+    target = artifact_path(weights, backend, imgsz, int8, cache_dir)
+    # Reuse the cached export unless the weights are newer
+    if os.path.exists(target) and (not os.path.exists(weights) or
+                                   os.path.getmtime(target) >= os.path.getmtime(weights)):
+        return target
+
+    print(f"Exporting {weights} to {backend} (imgsz={imgsz}{', int8' if int8 else ''})...")
+    options = {"format": BACKENDS[backend]["format"], "imgsz": imgsz, "dynamic": True}
+    if int8:
+        if backend != "openvino":
+            raise ValueError("INT8 quantization is only supported for the openvino backend")
+        options["int8"] = True
+    exported = YOLO(weights).export(**options)
+
+    # Ultralytics writes next to the weights; move the result into the cache
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(target):
+        shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+    shutil.move(str(exported), target)
+    return target
+
+
+def tune_threads(model, backend, threads, path=None):
+    """Apply the intra-op thread count to a loaded model (after its first prediction)"""
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        return True
+
+    if backend == "onnx":
+        # Rebuild the ONNX Runtime session ultralytics created with default options
+        import onnxruntime
+        autobackend = getattr(getattr(model, "predictor", None), "model", None)
+        session = getattr(autobackend, "session", None)
+        if session is None or path is None:
+            return False
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        autobackend.session = onnxruntime.InferenceSession(
+            path, sess_options=options, providers=session.get_providers()
+        )
+        return True
+
+    # OpenVINO picks its own thread count for the latency hint ultralytics compiles with
+    return False
+
+
+def warm_up(model, imgsz=640, runs=2):
+    """Run a few predictions on a blank frame so the first real frames are not slow"""
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    started = time.time()
+    for _ in range(runs):
+        model.predict(source=frame, imgsz=imgsz, classes=[0], verbose=False)
+    return time.time() - started
+
+
+def load_model(weights="yolov8n.pt", backend="auto", imgsz=640, int8=False, threads=0,
+               cache_dir="models", warmup=True):
+    """Load a YOLO model for the given backend, falling back to PyTorch if that fails.
+
+    Non-PyTorch backends are exported once and cached in cache_dir. The
+    returned model has the ultralytics predict/track API whatever the backend;
+    its `backend` attribute says which one is in use.
+    """
+    from ultralytics import YOLO
+
+    backend = resolve_backend(backend)
+    threads = threads or default_threads()
+
+    model = None
+    path = weights
+    if backend != "torch":
+        try:
+            if not backend_available(backend):
+                raise ImportError(f"missing packages: {', '.join(BACKENDS[backend]['requires'])}")
+            path = export_model(weights, backend, imgsz, int8, cache_dir)
+            model = YOLO(path, task="detect")
+        except Exception as e:
+            print(f"Could not load {backend} backend ({e}), falling back to PyTorch")
+            backend = "torch"
+
+    if model is None:
+        model = YOLO(weights)
+    model.backend = backend
+
+    if backend == "torch":
+        tune_threads(model, backend, threads)
+
+    if warmup:
+        # Warm-up also creates the predictor, whose runtime session is then re-tuned
+        elapsed = warm_up(model, imgsz)
+        if backend != "torch":
+            tune_threads(model, backend, threads, path)
+            warm_up(model, imgsz, runs=1)
+        print(f"Model ready: {weights} on {backend} ({threads} threads, warm-up {elapsed:.2f}s)")
+    return model
+
+
+class SharedModel:
+    """A registry model used from several threads: inference calls run one at a time.
+
+    Ultralytics predictors keep per-model state (the predictor, its dataset and
+    batch buffers), so predict calls from the single-camera pipeline and the
+    multi-camera engine must not overlap. Other attributes pass through to the
+    wrapped model.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def predict(self, *args, **kwargs):
+        with self.lock:
+            return self.model.predict(*args, **kwargs)
+
+    def track(self, *args, **kwargs):
+        with self.lock:
+            return self.model.track(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            return self.model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def get_model(**options):
+    """Shared model for these load_model options, loaded on first request.
+
+    Analyzers and engines in one process get the same (SharedModel-wrapped)
+    instance instead of each loading their own copy. Concurrent first requests
+    wait for a single load.
+    """
+    key = tuple(sorted(options.items()))
+    with _registry_lock:
+        entry = _registry.setdefault(key, {"lock": threading.Lock(), "model": None})
+
+    with entry["lock"]:
+        if entry["model"] is None:
+            entry["model"] = SharedModel(load_model(**options))
+        return entry["model"]
+
+
+def model_loaded(**options):
+    """Whether get_model would return an already-loaded model for these options"""
+    entry = _registry.get(tuple(sorted(options.items())))
+    return entry is not None and entry["model"] is not None
+
+
+def loaded_models():
+    """Options and backend of every model in the registry"""
+    with _registry_lock:
+        entries = list(_registry.items())
+    return [
+        dict(key, backend=entry["model"].backend)
+        for key, entry in entries
+        if entry["model"] is not None
+    ]
+
+
+def model_options(config):
+    """load_model keyword arguments from an analyzer config"""
+    return {
+        "weights": config.get("model_weights", "yolov8n.pt"),
+        "backend": config.get("inference_backend") or os.environ.get("INFERENCE_BACKEND", "auto"),
+        "imgsz": config.get("inference_imgsz", 640),
+        "int8": config.get("model_int8", False),
+        "threads": config.get("inference_threads") or int(os.environ.get("INFERENCE_THREADS", 0)),
+        "cache_dir": config.get("model_cache_dir", "models"),
+        "warmup": config.get("model_warmup", True),
+    }
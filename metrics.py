@@ -0,0 +1,334 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Latency buckets (seconds) for the per-stage histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def format_labels(labels):
+    """Prometheus label set, e.g. {stage="detect"}"""
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram family, one series per label set"""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # label tuple -> [bucket counts (last one is +Inf), sum, count]
+        self.series = {}
+
+    def observe(self, value, labels=()):
+        """Record one value; labels is a tuple of (key, value) pairs"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, labels=()):
+        """Count, sum and approximate p50/p95/p99 (bucket upper bounds) of one series"""
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                return {"count": 0, "sum": 0.0}
+            counts, total, count = list(series[0]), series[1], series[2]
+
+        def quantile(q):
+            seen = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                seen += bucket
+                if seen >= q * count:
+                    return bound
+            return float("inf")
+
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+        }
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self.series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                bucket_labels = labels + (("le", format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter family, one series per label set"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = list(self.series.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics exposed in the Prometheus text format.
+
+    Histograms and counters are updated on the hot path. Everything that already
+    exists as state elsewhere (queue depths, drop counters, track and client
+    counts, ...) is read only at scrape time from collector callbacks, each
+    returning (name, kind, help, labels, value) samples with kind "gauge" or
+    "counter".
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Histogram(name, help_text, buckets)
+            return self.metrics[name]
+
+    def counter(self, name, help_text):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Counter(name, help_text)
+            return self.metrics[name]
+
+    def add_collector(self, collector):
+        """Register a callback returning samples at scrape time"""
+        with self.lock:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        with self.lock:
+            if collector in self.collectors:
+                self.collectors.remove(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+            collectors = list(self.collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        # Group collected samples by name so HELP/TYPE appear once per family
+        families = {}
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, labels, value in samples:
+                if value is None:
+                    continue
+                families.setdefault(name, (kind, help_text, []))[2].append((tuple(labels), value))
+
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class TraceWriter:
+    """Per-stage timings in the Chrome trace event format (chrome://tracing, Perfetto, speedscope)"""
+
+    def __init__(self, path, max_events=0):
+        self.path = path
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.events = 0
+        self.pid = os.getpid()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "w")
+        # A JSON array that viewers accept without the closing bracket, so a crash still leaves a usable file
+        self.file.write("[\n")
+
+    def write(self, name, started, duration, thread, args=None):
+        """Add one complete event; returns False once the writer is closed or full"""
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": started * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": thread,
+        }
+        if args:
+            event["args"] = args
+        line = json.dumps(event)
+        with self.lock:
+            if self.file is None:
+                return False
+            self.file.write(line + ",\n")
+            self.events += 1
+            if self.max_events and self.events >= self.max_events:
+                self._close_locked()
+                return False
+        return True
+
+    def close(self):
+        with self.lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        if self.file is not None:
+            # Metadata event closes the array without a trailing comma
+            self.file.write(json.dumps({"name": "trace_end", "ph": "i", "ts": time.time() * 1e6,
+                                        "pid": self.pid, "s": "g"}) + "\n]\n")
+            self.file.close()
+            self.file = None
+
+
+class _StageTimer:
+    __slots__ = ("profiler", "stage", "labels", "started")
+
+    def __init__(self, profiler, stage, labels):
+        self.profiler = profiler
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.stage, self.started, self.labels)
+        return False
+
+
+class Profiler:
+    """Low-overhead stage timers feeding a latency histogram and an optional trace file.
+
+    Usage: `with profiler.stage("detect"): ...` or, in tight loops,
+    `started = time.perf_counter(); ...; profiler.record("detect", started)`.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.stage_seconds = registry.histogram(
+            "pipeline_stage_seconds", "Time spent in each processing stage"
+        )
+        self.alerts = registry.counter("alerts_total", "Alerts raised, by type")
+        self.recent_alerts = deque(maxlen=10000)
+        self.trace = None
+        self.trace_lock = threading.Lock()
+        # Offset from perf_counter to wall-clock time for trace timestamps
+        self.clock_offset = time.time() - time.perf_counter()
+
+    def stage(self, name, **labels):
+        """Context manager timing one run of a stage"""
+        return _StageTimer(self, name, tuple(sorted(labels.items())))
+
+    def record(self, stage, started, labels=(), args=None):
+        """Record a stage that began at perf_counter() value `started`"""
+        elapsed = time.perf_counter() - started
+        self.stage_seconds.observe(elapsed, (("stage", stage),) + labels)
+
+        trace = self.trace
+        if trace is not None:
+            if args is None and labels:
+                args = dict(labels)
+            if not trace.write(stage, started + self.clock_offset, elapsed,
+                               threading.current_thread().name, args):
+                self.stop_trace(trace)
+        return elapsed
+
+    def count_alerts(self, alerts):
+        now = time.time()
+        for alert in alerts:
+            self.alerts.inc(1, (("type", alert.get("type", "unknown")),))
+            self.recent_alerts.append(now)
+
+    def alerts_per_second(self, window=60.0):
+        """Alert rate over the last `window` seconds"""
+        cutoff = time.time() - window
+        return sum(1 for t in list(self.recent_alerts) if t >= cutoff) / window
+
+    def start_trace(self, path, max_events=0):
+        """Start dumping every timed stage to a trace file (replaces a running trace)"""
+        with self.trace_lock:
+            if self.trace is not None:
+                self.trace.close()
+            self.trace = TraceWriter(path, max_events)
+        return path
+
+    def stop_trace(self, trace=None):
+        """Stop the trace dump (only if it is still `trace`, when given); returns the finished file's path"""
+        with self.trace_lock:
+            if trace is not None and self.trace is not trace:
+                return None
+            trace, self.trace = self.trace, None
+        if trace is None:
+            return None
+        trace.close()
+        return trace.path
+
+    def summary(self):
+        """Per-stage latency summary (seconds) for JSON stats endpoints"""
+        with self.stage_seconds.lock:
+            keys = list(self.stage_seconds.series)
+        return {
+            ",".join(f"{key}={value}" for key, value in labels): self.stage_seconds.snapshot(labels)
+            for labels in keys
+        }
+
+
+# Process-wide registry and profiler shared by the pipeline, the engine and the API
+registry = MetricsRegistry()
+profiler = Profiler(registry)
+
+# Trace from startup when PIPELINE_TRACE_FILE is set
+if os.environ.get("PIPELINE_TRACE_FILE"):
+    profiler.start_trace(os.environ["PIPELINE_TRACE_FILE"])
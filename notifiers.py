@@ -0,0 +1,302 @@
+import abc
+import queue
+import threading
+import time
+
+# Telegram refuses messages longer than this
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+class NotifierError(Exception):
+    """Raised by a notifier when a delivery attempt failed and may be retried"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Notifier(abc.ABC):
+    """Base class for alert notification backends"""
+
+    name = "notifier"
+
+    @abc.abstractmethod
+    def send(self, alerts, session, timeout):
+        """Deliver a batch of alert dicts; raise NotifierError to have it retried"""
+
+
+class TelegramNotifier(Notifier):
+    """Send alerts to a Telegram chat through the Bot API"""
+
+    name = "telegram"
+
+    def __init__(self, bot_token, chat_id, system_name="🛡️ Hackathon Security Bot",
+                 api_url="https://api.telegram.org"):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.system_name = system_name
+        self.api_url = api_url.rstrip("/")
+
+    def format_alert(self, alert_data):
+        """Compose the Markdown message for a single alert"""
+        alert_type = alert_data.get("type", "unknown").upper()
+        track_id = alert_data.get("track_id", "N/A")
+        camera_id = alert_data.get("camera_id")
+        suspicion_score = alert_data.get("suspicion_score", 0.0)
+        location = alert_data.get("location", (0, 0))
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert_data.get("timestamp", time.time())))
+        zone_id = alert_data.get("zone_id", None)
+        behaviors = alert_data.get("behaviors", [])
+
+        message = f"{self.system_name}\n\n"
+        message += f"🚨 *{alert_type} Detected!*\n"
+        if camera_id is not None:
+            message += f"📷 Camera: `{camera_id}`\n"
+        message += f"🆔 Track ID: `{track_id}`\n"
+        message += f"📍 Location: `{location}`\n"
+        if zone_id is not None:
+            message += f"🗺️ Zone ID: `{zone_id}`\n"
+        if behaviors:
+            message += f"🧠 Behaviors: {', '.join(behaviors)}\n"
+        message += f"📈 Suspicion Score: `{suspicion_score:.1f}`\n"
+        message += f"🕒 Time: {timestamp}"
+        return message
+
+    def format_batch(self, alerts):
+        """Compose one message summarizing a burst of alerts"""
+        if len(alerts) == 1:
+            return self.format_alert(alerts[0])
+
+        message = f"{self.system_name}\n\n🚨 *{len(alerts)} alerts*\n"
+        for alert_data in alerts:
+            timestamp = time.strftime('%H:%M:%S', time.localtime(alert_data.get("timestamp", time.time())))
+            camera = f"`{alert_data['camera_id']}` " if alert_data.get("camera_id") is not None else ""
+            line = (f"• {timestamp} {camera}*{alert_data.get('type', 'unknown').upper()}* "
+                    f"ID `{alert_data.get('track_id', 'N/A')}` "
+                    f"score `{alert_data.get('suspicion_score', 0.0):.1f}`\n")
+            if len(message) + len(line) > TELEGRAM_MAX_MESSAGE_LENGTH:
+                break
+            message += line
+        return message
+
+    def send(self, alerts, session, timeout):
+        import requests
+
+        url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
+        payload = {
+            "chat_id": self.chat_id,
+            "text": self.format_batch(alerts),
+            "parse_mode": "Markdown"
+        }
+
+        try:
+            response = session.post(url, data=payload, timeout=timeout)
+        except requests.RequestException as e:
+            raise NotifierError(f"Telegram request failed: {e}")
+
+        if response.status_code == 429 or response.status_code >= 500:
+            # Rate limited or server error - worth retrying
+            retry_after = None
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                pass
+            raise NotifierError(f"Telegram returned {response.status_code}", retry_after=retry_after)
+
+        if response.status_code != 200:
+            # Bad token, chat ID or message - retrying will not help
+            print("Telegram alert failed:", response.text)
+
+
+class WebhookNotifier(Notifier):
+    """POST alert batches as JSON to an HTTP endpoint"""
+
+    name = "webhook"
+
+    def __init__(self, url, headers=None):
+        self.url = url
+        self.headers = headers or {}
+
+    def send(self, alerts, session, timeout):
+        import requests
+
+        try:
+            response = session.post(self.url, json={"alerts": alerts}, headers=self.headers, timeout=timeout)
+        except requests.RequestException as e:
+            raise NotifierError(f"Webhook request failed: {e}")
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise NotifierError(f"Webhook returned {response.status_code}")
+        if response.status_code >= 400:
+            print(f"Webhook alert failed: {response.status_code} {response.text}")
+
+
+def build_notifiers(config):
+    """Create the notifiers enabled by an analyzer config"""
+    notifiers = []
+
+    if config.get("telegram_bot_token") and config.get("telegram_chat_id"):
+        notifiers.append(TelegramNotifier(
+            config["telegram_bot_token"],
+            config["telegram_chat_id"],
+            api_url=config.get("telegram_api_url") or "https://api.telegram.org"
+        ))
+
+    if config.get("webhook_url"):
+        notifiers.append(WebhookNotifier(config["webhook_url"]))
+
+    return notifiers
+
+
+class NotificationDispatcher:
+    """Deliver alerts to notifiers off the video pipeline.
+
+    `submit` never blocks: alerts go into a bounded queue (and are dropped and
+    counted when it is full). Worker threads gather everything that arrives
+    within `batch_window` seconds, coalesce repeats of the same (camera, track, type),
+    and hand the batch to every notifier over a pooled HTTP session, retrying
+    transient failures with exponential backoff.
+    """
+
+    def __init__(self, notifiers=None, max_queue_size=1000, workers=2, batch_window=1.0,
+                 max_batch_size=20, timeout=5.0, max_retries=3, backoff=0.5):
+        self.notifiers = list(notifiers or [])
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.num_workers = workers
+        self.threads = []
+        self.running = False
+
+        # Pooled HTTP session shared by all workers (created when the workers start)
+        self.session = None
+
+        # Updated by every submitting camera thread and every worker
+        self.counters = {"submitted": 0, "dropped": 0, "coalesced": 0, "sent": 0, "failed": 0, "retries": 0}
+        self.counters_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self.counters_lock:
+            self.counters[name] += n
+
+    def stats(self):
+        """Queue depth, delivery counters and active backends"""
+        with self.counters_lock:
+            stats = dict(self.counters)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["notifiers"] = [notifier.name for notifier in self.notifiers]
+        return stats
+
+    def set_notifiers(self, notifiers):
+        """Replace the notifier backends"""
+        self.notifiers = list(notifiers)
+
+    def start(self):
+        """Start the worker threads"""
+        if self.running:
+            return
+        if self.session is None:
+            self.session = self._create_session()
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._worker_loop, daemon=True)
+            for _ in range(self.num_workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop the workers after they finish what is queued"""
+        self.running = False
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        self.threads = []
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def _create_session(self):
+        # requests is only imported once there is something to deliver
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.num_workers, pool_maxsize=self.num_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def submit(self, alert_data):
+        """Queue an alert for delivery without blocking; returns False if it was dropped"""
+        if not self.notifiers:
+            return False
+        if not self.running:
+            self.start()
+
+        try:
+            self.queue.put_nowait(dict(alert_data))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def _collect_batch(self):
+        try:
+            first = self.queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _coalesce(self, batch):
+        # Keep only the latest alert for each (camera, track, type) in a burst
+        latest = {}
+        for alert_data in batch:
+            latest[(alert_data.get("camera_id"), alert_data.get("track_id"), alert_data.get("type"))] = alert_data
+        self._count("coalesced", len(batch) - len(latest))
+        return list(latest.values())
+
+    def _deliver(self, notifier, alerts):
+        for attempt in range(self.max_retries + 1):
+            try:
+                notifier.send(alerts, self.session, self.timeout)
+                self._count("sent", len(alerts))
+                return True
+            except NotifierError as e:
+                if attempt == self.max_retries or not self.running:
+                    print(f"{notifier.name} alert error: {e}")
+                    break
+                self._count("retries")
+                time.sleep(e.retry_after or self.backoff * (2 ** attempt))
+            except Exception as e:
+                print(f"{notifier.name} alert error: {e}")
+                break
+
+        self._count("failed", len(alerts))
+        return False
+
+    def _worker_loop(self):
+        while self.running or not self.queue.empty():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            alerts = self._coalesce(batch)
+            for notifier in list(self.notifiers):
+                self._deliver(notifier, alerts)
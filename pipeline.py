@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import profiler
+
+
+class LatestQueue:
+    """Bounded queue with a latest-wins policy.
+
+    When the queue is full, `put` evicts the oldest item instead of blocking, so a
+    slow consumer always sees the newest data and never builds up latency. Every
+    eviction is counted so backpressure is visible in `stats()`.
+    """
+
+    def __init__(self, maxsize=1, name=""):
+        self.maxsize = maxsize
+        self.name = name
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # Counters for monitoring backpressure
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, dropping the oldest one if the queue is full"""
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.put_count += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Wait for the next item; returns None on timeout or when closed"""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            self.get_count += 1
+            return self.items.popleft()
+
+    def close(self):
+        """Wake up all waiting consumers"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+    def stats(self):
+        """Current depth and drop counters"""
+        return {
+            "depth": len(self.items),
+            "maxsize": self.maxsize,
+            "put": self.put_count,
+            "get": self.get_count,
+            "dropped": self.dropped,
+        }
+
+
+class FramePipeline:
+    """Capture -> inference -> annotate pipeline for a single camera.
+
+    Each stage runs on its own thread and stages are joined by LatestQueues, so
+    when inference is slower than the camera, stale frames are dropped between
+    stages instead of piling up in the OpenCV buffer.
+
+    An optional InferenceScheduler decides which frames go through detection;
+    skipped frames are annotated with the carried-forward detections.
+
+    `on_analyzed(frame, results, alerts, scores)` is called by the annotate
+    stage before drawing, with the raw frame, for consumers of the detections
+    themselves (raw video, track telemetry). When `should_annotate()` returns
+    False (nobody is watching the annotated frames) drawing is skipped and the
+    raw frame is published as is.
+    """
+
+    def __init__(self, source, analyzer, on_frame=None, on_alerts=None, queue_size=1, scheduler=None,
+                 on_analyzed=None, should_annotate=None):
+        self.source = source
+        self.analyzer = analyzer
+        self.on_frame = on_frame
+        self.on_alerts = on_alerts
+        self.on_analyzed = on_analyzed
+        self.should_annotate = should_annotate
+        self.scheduler = scheduler
+
+        # Detections and scores of the last inferred frame, reused on skipped frames
+        self.last_results = None
+        self.last_scores = None
+
+        self.capture = None
+        self.running = False
+        self.threads = []
+
+        # Queues between stages
+        self.capture_queue = LatestQueue(queue_size, name="capture")
+        self.annotate_queue = LatestQueue(queue_size, name="annotate")
+
+        # Frames that made it through each stage
+        self.stage_counts = {"capture": 0, "inference": 0, "annotate": 0, "annotate_skipped": 0}
+        self.started_at = None
+
+    def _open_capture(self):
+        capture = cv2.VideoCapture(self.source)
+        # Keep OpenCV's internal buffer as small as the backend allows
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def start(self):
+        """Open the source and start all stage threads"""
+        self.capture = self._open_capture()
+        if not self.capture.isOpened():
+            return False
+        # The analyzer's tracker is sized by the source frame rate
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        if fps > 0:
+            self.analyzer.source_fps = fps
+
+        self.running = True
+        self.started_at = time.time()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._inference_loop, daemon=True),
+            threading.Thread(target=self._annotate_loop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        """Stop all stages and release the source"""
+        self.running = False
+        self.capture_queue.close()
+        self.annotate_queue.close()
+
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join(timeout=1.0)
+        self.threads = []
+
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+    def stats(self):
+        """Per-stage throughput, queue depth and drop counts"""
+        elapsed = max(time.time() - self.started_at, 1e-6) if self.started_at else 0.0
+        stats = {"running": self.running, "stages": {}}
+        for stage, count in self.stage_counts.items():
+            stats["stages"][stage] = {
+                "frames": count,
+                "fps": count / elapsed if elapsed else 0.0,
+            }
+        stats["queues"] = {
+            "capture": self.capture_queue.stats(),
+            "annotate": self.annotate_queue.stats(),
+        }
+        if self.scheduler is not None:
+            stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+    def _capture_loop(self):
+        # Video files are paced to their native frame rate, live sources are read as fast as they deliver
+        is_file = self.capture.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_interval = 1.0 / fps if is_file else 0.0
+        next_frame_at = time.time()
+
+        while self.running:
+            started = time.perf_counter()
+            success, frame = self.capture.read()
+            profiler.record("capture", started)
+            if not success:
+                # Try to restart camera after a brief pause
+                time.sleep(1.0)
+                if not self.running:
+                    break
+                self.capture.release()
+                self.capture = self._open_capture()
+                continue
+
+            self.stage_counts["capture"] += 1
+            self.capture_queue.put(frame)
+
+            if frame_interval:
+                next_frame_at += frame_interval
+                delay = next_frame_at - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame_at = time.time()
+
+    def _inference_loop(self):
+        while self.running:
+            frame = self.capture_queue.get(timeout=0.1)
+            if frame is None:
+                continue
+
+            now = time.time()
+            infer = True
+            if self.scheduler is not None:
+                started = time.perf_counter()
+                infer = self.scheduler.should_infer(frame, now)
+                profiler.record("schedule", started)
+            if not infer:
+                # Skipped frame: reuse the last detections, moved along the tracks' motion
+                results = self.scheduler.carry_forward(
+                    self.last_results, getattr(self.analyzer, "tracks", None), now
+                )
+                self.annotate_queue.put((frame, results, [], self.last_scores))
+                continue
+
+            results, alerts, scores = None, [], None
+            try:
+                results, alerts = self.analyzer.analyze_frame(frame)
+                # Snapshot scores so the annotate stage never iterates a dict being mutated
+                scores = dict(getattr(self.analyzer, "suspicion_scores", {}))
+            except Exception as e:
+                print(f"Error processing frame: {e}")
+
+            if self.scheduler is not None:
+                self.scheduler.observe(len(results[0].boxes) if results else 0, now)
+            self.last_results, self.last_scores = results, scores
+
+            self.stage_counts["inference"] += 1
+            self.annotate_queue.put((frame, results, alerts, scores))
+
+            if alerts and self.on_alerts:
+                self.on_alerts(alerts)
+
+    def _annotate_loop(self):
+        while self.running:
+            item = self.annotate_queue.get(timeout=0.1)
+            if item is None:
+                continue
+
+            frame, results, alerts, scores = item
+            if self.on_analyzed:
+                try:
+                    self.on_analyzed(frame, results, alerts, scores)
+                except Exception as e:
+                    print(f"Error publishing analysis: {e}")
+
+            if self.should_annotate is None or self.should_annotate():
+                try:
+                    frame = self.analyzer.render_frame(frame, results, alerts, scores)
+                except Exception as e:
+                    print(f"Error annotating frame: {e}")
+            else:
+                self.stage_counts["annotate_skipped"] += 1
+
+            self.stage_counts["annotate"] += 1
+            if self.on_frame:
+                with profiler.stage("publish"):
+                    self.on_frame(frame)
@@ -0,0 +1,470 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from avi import HEADER_SIZE, MjpegAviWriter, scan_frames, stream_mjpeg_avi
+
+# Segment files and seek points (timestamp -> byte offset) for time-indexed reads
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    frames INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    closed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_segments_camera ON segments (camera_id, start);
+CREATE INDEX IF NOT EXISTS idx_segments_end ON segments (end);
+CREATE TABLE IF NOT EXISTS seek_points (
+    segment_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (segment_id, timestamp)
+) WITHOUT ROWID;
+"""
+
+
+class Segment:
+    """The segment file a camera is currently writing"""
+
+    def __init__(self, segment_id, camera_id, path, start, width, height):
+        self.id = segment_id
+        self.camera_id = camera_id
+        self.path = path
+        self.start = start
+        self.end = start
+        self.width = width
+        self.height = height
+        self.file = open(path, "wb")
+        self.writer = MjpegAviWriter(self.file, width, height)
+        self.last_seek_point = None
+
+
+class SegmentRecorder:
+    """Continuous recording of processed frames into fixed-length segment files.
+
+    `add_frame` only queues the frame; each camera has its own I/O thread that
+    JPEG-encodes it (unless a JPEG is passed in), appends it to the camera's
+    current MJPEG AVI segment and starts a new segment every segment_seconds.
+    Queued frames are capped at max_queue_bytes across all cameras, so raw
+    high-resolution frames cannot pile up in memory. A SQLite index maps time
+    to segment and byte offset (one seek point per seek_interval), so the
+    footage around any timestamp is read straight from the right offsets.
+    Closed segments older than retention_days, or the oldest ones beyond
+    max_bytes in total, are deleted along with directories left empty. Encoded
+    frames can be passed on to `on_frame(camera_id, frame, timestamp, jpeg)`
+    (e.g. the alert clip recorder) so each frame is encoded only once.
+
+    Size the cap for the retention period: one day takes cameras x fps x
+    average JPEG size x 86400 bytes, e.g. about 69 GB for a single 720p camera
+    at 10 fps and 80 KB per frame. When the write rate of the last hour shows
+    that max_bytes cannot hold retention_days, a warning is printed (once per
+    setting) and `capacity_days` in stats() says how much footage fits.
+    """
+
+    def __init__(self, directory="recordings", index_path=None, segment_seconds=60.0, retention_days=30.0,
+                 max_bytes=20 * 1000 ** 3, quality=80, seek_interval=1.0, max_queue_bytes=256 * 1024 * 1024,
+                 on_frame=None):
+        self.directory = directory
+        self.index_path = index_path or os.path.join(directory, "index.db")
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.seek_interval = seek_interval
+        self.on_frame = on_frame
+        self.enabled = True
+
+        os.makedirs(directory, exist_ok=True)
+        self.write_lock = threading.Lock()
+        self.writer = self._connect()
+        self.writer.executescript(SCHEMA)
+        # Segments left open by a crash are still readable through their seek points
+        self.writer.execute("UPDATE segments SET closed = 1 WHERE closed = 0")
+        self.writer.commit()
+        self.local = threading.local()
+
+        self.segments = {}  # camera_id -> Segment being written (only touched by that camera's thread)
+        self.queues = {}    # camera_id -> queue of (timestamp, frame, jpeg, size) for its I/O thread
+        self.threads = {}
+        self.queue_lock = threading.Lock()
+        self.max_queue_bytes = max_queue_bytes
+        self.queued_bytes = 0
+        self.running = False
+        self.retention_lock = threading.Lock()
+        self.last_retention_check = 0.0
+        self.capacity_days = None   # Days of footage max_bytes holds at the recent write rate
+        self.capacity_warned = None  # (max_bytes, retention_days) the capacity warning was printed for
+
+        self.counters = {"frames": 0, "dropped": 0, "encoded": 0, "reused": 0,
+                         "segments": 0, "deleted": 0, "deleted_early": 0, "errors": 0}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        recorder = cls(**kwargs)
+        recorder.update_config(config)
+        return recorder
+
+    def update_config(self, config):
+        """Apply recording_* settings from a config dict"""
+        self.enabled = config.get("recording_enabled", self.enabled)
+        self.segment_seconds = config.get("recording_segment_seconds", self.segment_seconds)
+        self.retention_days = config.get("recording_retention_days", self.retention_days)
+        self.quality = config.get("recording_quality", self.quality)
+        if "recording_max_gb" in config:
+            self.max_bytes = int(config["recording_max_gb"] * 1e9)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self.local.conn = conn
+        return conn
+
+    def start(self):
+        """Accept frames; each camera's I/O thread starts with its first frame"""
+        self.running = True
+
+    def stop(self, timeout=5.0):
+        """Write what is queued and close every open segment"""
+        self.running = False
+        with self.queue_lock:
+            threads = list(self.threads.values())
+            self.threads = {}
+            self.queues = {}
+        for thread in threads:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        for segment in list(self.segments.values()):
+            self._close_segment(segment)
+        self.segments = {}
+
+    def add_frame(self, camera_id, frame, timestamp=None, jpeg=None):
+        """Queue a processed frame (and its JPEG, if already encoded) without blocking"""
+        if not self.enabled:
+            return False
+        if not self.running:
+            self.start()
+        camera_id = camera_id or "main"
+        size = len(jpeg) if jpeg is not None else frame.nbytes
+        with self.queue_lock:
+            if self.queued_bytes + size > self.max_queue_bytes:
+                self.counters["dropped"] += 1
+                return False
+            self.queued_bytes += size
+            camera_queue = self.queues.get(camera_id)
+            if camera_queue is None:
+                camera_queue = self.queues[camera_id] = queue.Queue()
+                thread = threading.Thread(target=self._io_loop, args=(camera_id, camera_queue), daemon=True)
+                self.threads[camera_id] = thread
+                thread.start()
+        camera_queue.put((timestamp or time.time(), frame, jpeg, size))
+        return True
+
+    def _io_loop(self, camera_id, camera_queue):
+        while self.running or not camera_queue.empty():
+            try:
+                timestamp, frame, jpeg, size = camera_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                jpeg = self._write_frame(camera_id, timestamp, frame, jpeg)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Recording error: {e}")
+                jpeg = None
+            finally:
+                with self.queue_lock:
+                    self.queued_bytes -= size
+
+            if self.on_frame and jpeg is not None:
+                self.on_frame(camera_id, frame, timestamp, jpeg)
+
+            # One camera thread at a time runs the retention pass
+            if timestamp - self.last_retention_check > 60 and self.retention_lock.acquire(blocking=False):
+                try:
+                    self.last_retention_check = timestamp
+                    self.enforce_retention(timestamp)
+                finally:
+                    self.retention_lock.release()
+
+    def _write_frame(self, camera_id, timestamp, frame, jpeg):
+        if jpeg is None:
+            ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ret:
+                return None
+            jpeg = buffer.tobytes()
+            self.counters["encoded"] += 1
+        else:
+            self.counters["reused"] += 1
+
+        height, width = frame.shape[:2]
+        segment = self.segments.get(camera_id)
+        if segment is not None and (timestamp - segment.start >= self.segment_seconds or
+                                    (segment.width, segment.height) != (width, height)):
+            self._close_segment(segment)
+            segment = None
+        if segment is None:
+            segment = self._open_segment(camera_id, timestamp, width, height)
+
+        offset = segment.writer.write(jpeg)
+        segment.end = timestamp
+        self.counters["frames"] += 1
+
+        if segment.last_seek_point is None or timestamp - segment.last_seek_point >= self.seek_interval:
+            # Readers may only use bytes that are on disk
+            segment.last_seek_point = timestamp
+            segment.file.flush()
+            with self.write_lock:
+                self.writer.execute("INSERT OR REPLACE INTO seek_points VALUES (?, ?, ?)",
+                                    (segment.id, timestamp, offset))
+                self.writer.execute("UPDATE segments SET end = ?, frames = ?, bytes = ? WHERE id = ?",
+                                    (timestamp, segment.writer.frames, segment.writer.offset, segment.id))
+                self.writer.commit()
+        return jpeg
+
+    def _open_segment(self, camera_id, timestamp, width, height):
+        day = time.strftime("%Y%m%d", time.localtime(timestamp))
+        directory = os.path.join(self.directory, camera_id, day)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{camera_id}_{time.strftime('%H%M%S', time.localtime(timestamp))}_{int(timestamp * 1000) % 1000:03d}.avi"
+        path = os.path.join(directory, name)
+
+        with self.write_lock:
+            cursor = self.writer.execute(
+                "INSERT INTO segments (camera_id, path, start, end, width, height) VALUES (?, ?, ?, ?, ?, ?)",
+                (camera_id, path, timestamp, timestamp, width, height)
+            )
+            self.writer.commit()
+        segment = Segment(cursor.lastrowid, camera_id, path, timestamp, width, height)
+        self.segments[camera_id] = segment
+        self.counters["segments"] += 1
+        return segment
+
+    def _close_segment(self, segment):
+        duration = segment.end - segment.start
+        fps = (segment.writer.frames - 1) / duration if duration > 0 else 1.0
+        try:
+            segment.writer.close(fps)
+            size = segment.file.tell()
+            segment.file.close()
+        except (OSError, ValueError) as e:
+            print(f"Failed to close segment {segment.path}: {e}")
+            size = segment.writer.offset
+
+        with self.write_lock:
+            self.writer.execute("UPDATE segments SET end = ?, frames = ?, bytes = ?, closed = 1 WHERE id = ?",
+                                (segment.end, segment.writer.frames, size, segment.id))
+            self.writer.commit()
+        if self.segments.get(segment.camera_id) is segment:
+            del self.segments[segment.camera_id]
+
+    def enforce_retention(self, now=None):
+        """Delete closed segments past retention_days, then the oldest ones beyond max_bytes"""
+        if now is None:
+            now = time.time()
+        conn = self._reader()
+        expired = []
+        early = set()
+        if self.retention_days:
+            expired = conn.execute(
+                "SELECT id, path, bytes FROM segments WHERE closed = 1 AND end < ? ORDER BY start",
+                (now - self.retention_days * 86400,)
+            ).fetchall()
+
+        if self.max_bytes:
+            self.check_capacity(now)
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+            total -= sum(size for _, _, size in expired)
+            if total > self.max_bytes:
+                expired_ids = {segment_id for segment_id, _, _ in expired}
+                rows = conn.execute("SELECT id, path, bytes FROM segments WHERE closed = 1 ORDER BY start").fetchall()
+                for segment_id, path, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    if segment_id not in expired_ids:
+                        # Still inside the retention period: the size cap wins
+                        expired.append((segment_id, path, size))
+                        early.add(segment_id)
+                        total -= size
+
+        for segment_id, path, _ in expired:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to delete segment {path}: {e}")
+                continue
+            with self.write_lock:
+                self.writer.execute("DELETE FROM seek_points WHERE segment_id = ?", (segment_id,))
+                self.writer.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+                self.writer.commit()
+            self.counters["deleted"] += 1
+            if segment_id in early:
+                self.counters["deleted_early"] += 1
+            self._remove_empty_dirs(os.path.dirname(path))
+        return len(expired)
+
+    def check_capacity(self, now=None, window=3600.0):
+        """Days of footage max_bytes holds at the write rate of the last `window` seconds (None until
+        a segment's worth has been recorded); warns once per setting when that is less than retention_days"""
+        if now is None:
+            now = time.time()
+        since = now - window
+        recorded, first = self._reader().execute(
+            "SELECT COALESCE(SUM(bytes), 0), MIN(start) FROM segments WHERE end >= ?", (since,)
+        ).fetchone()
+        if first is None or now - max(first, since) < self.segment_seconds or not recorded:
+            return None
+
+        # Bytes per second across all cameras
+        rate = recorded / (now - max(first, since))
+        self.capacity_days = self.max_bytes / rate / 86400
+        setting = (self.max_bytes, self.retention_days)
+        if self.retention_days and self.capacity_days < self.retention_days and self.capacity_warned != setting:
+            self.capacity_warned = setting
+            print(f"Warning: recording_max_gb={self.max_bytes / 1e9:g} holds about {self.capacity_days:.1f} days "
+                  f"at the current {rate * 86400 / 1e9:.1f} GB/day; segments will be deleted before "
+                  f"recording_retention_days={self.retention_days:g}. Raise recording_max_gb to about "
+                  f"{rate * self.retention_days * 86400 / 1e9:.0f} to keep the full period.")
+        return self.capacity_days
+
+    def _remove_empty_dirs(self, directory):
+        """Remove the day and camera directories a deleted segment leaves empty"""
+        root = os.path.abspath(self.directory)
+        directory = os.path.abspath(directory)
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break  # Not empty (or already gone)
+            directory = os.path.dirname(directory)
+
+    def list_segments(self, camera_id=None, start=None, end=None, limit=1000):
+        """Segments overlapping [start, end], oldest first"""
+        query = "SELECT id, camera_id, path, start, end, width, height, frames, bytes, closed FROM segments WHERE 1 = 1"
+        params = []
+        if camera_id is not None:
+            query += " AND camera_id = ?"
+            params.append(camera_id)
+        if start is not None:
+            query += " AND end >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND start <= ?"
+            params.append(end)
+        query += " ORDER BY start LIMIT ?"
+        params.append(limit)
+
+        columns = ("id", "camera_id", "path", "start", "end", "width", "height", "frames", "bytes", "closed")
+        return [dict(zip(columns, row)) for row in self._reader().execute(query, params)]
+
+    def footage(self, camera_id, start, end):
+        """MJPEG AVI bytes of a camera's footage between start and end, or None if none is recorded"""
+        chunks = self.footage_stream(camera_id, start, end)
+        return None if chunks is None else b"".join(chunks)
+
+    def footage_stream(self, camera_id, start, end):
+        """Iterator over the MJPEG AVI chunks of a camera's footage between start and end, or None if none
+        is recorded. Only chunk headers are read up front; frames are read from the segments as it is consumed."""
+        conn = self._reader()
+        parts = []  # (path, [(offset, size)]) of frames copied from a segment, or (None, [jpeg]) of scaled ones
+        sizes = []
+        size = None
+        fps = None
+        for segment in self.list_segments(camera_id, start, end):
+            # Last seek point at or before `start`, first one after `end`
+            row = conn.execute(
+                "SELECT MAX(offset) FROM seek_points WHERE segment_id = ? AND timestamp <= ?", (segment["id"], start)
+            ).fetchone()
+            first = row[0] if row and row[0] is not None else HEADER_SIZE
+            row = conn.execute(
+                "SELECT MIN(offset) FROM seek_points WHERE segment_id = ? AND timestamp > ?", (segment["id"], end)
+            ).fetchone()
+            last = row[0] if row and row[0] is not None else None
+
+            try:
+                with open(segment["path"], "rb") as f:
+                    chunks = scan_frames(f, first, last)
+                    # One AVI has one frame size: frames of segments recorded at another size are scaled to the first
+                    size = size or (segment["width"], segment["height"])
+                    if (segment["width"], segment["height"]) != size:
+                        frames = [jpeg for jpeg in (self._resize(data, size) for data in self._read_chunks(f, chunks))
+                                  if jpeg]
+                        parts.append((None, frames))
+                        sizes.extend(len(jpeg) for jpeg in frames)
+                    else:
+                        parts.append((segment["path"], chunks))
+                        sizes.extend(chunk_size for _, chunk_size in chunks)
+            except OSError:
+                continue
+            if fps is None and segment["end"] > segment["start"] and segment["frames"] > 1:
+                fps = (segment["frames"] - 1) / (segment["end"] - segment["start"])
+
+        if not sizes:
+            return None
+        return stream_mjpeg_avi(sizes, self._footage_frames(parts), fps or 15.0, *size)
+
+    def _read_chunks(self, file, chunks):
+        for offset, size in chunks:
+            file.seek(offset)
+            data = file.read(size)
+            # The container already promised `size` bytes; a segment truncated since the scan gets a blank frame
+            yield data + b"\0" * (size - len(data))
+
+    def _footage_frames(self, parts):
+        for path, frames in parts:
+            if path is None:
+                yield from frames
+                continue
+            try:
+                f = open(path, "rb")
+            except OSError:
+                # Deleted by retention since the scan
+                for _, size in frames:
+                    yield b"\0" * size
+                continue
+            with f:
+                yield from self._read_chunks(f, frames)
+
+    def _resize(self, jpeg, size):
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        ret, buffer = cv2.imencode(".jpg", cv2.resize(frame, size), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ret else None
+
+    def stats(self):
+        conn = self._reader()
+        count, total, oldest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0), MIN(start) FROM segments"
+        ).fetchone()
+        stats = dict(self.counters)
+        stats.update({
+            "enabled": self.enabled,
+            "segments_stored": count,
+            "bytes_stored": total,
+            "oldest": oldest,
+            "capacity_days": self.capacity_days,
+            "open_segments": len(self.segments),
+            "queue_depth": sum(camera_queue.qsize() for camera_queue in list(self.queues.values())),
+            "queued_bytes": self.queued_bytes,
+        })
+        return stats
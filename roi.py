@@ -0,0 +1,225 @@
+import numpy as np
+
+
+def zone_boxes(zones):
+    """Bounding boxes (x1, y1, x2, y2) of the active zones"""
+    boxes = []
+    for zone in zones:
+        if isinstance(zone, dict):
+            if not zone.get('active', True):
+                continue
+            points = zone['points']
+        else:
+            points = zone
+        if len(points) == 0:
+            continue
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x1, y1 = points.min(axis=0)
+        x2, y2 = points.max(axis=0)
+        boxes.append((float(x1), float(y1), float(x2), float(y2)))
+    return boxes
+
+
+def merge_boxes(boxes):
+    """Replace overlapping boxes by their union until none overlap"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+def tile_region(region, tile_size, overlap=0.2):
+    """Split a region into tile_size squares overlapping by `overlap` (fraction); the last tiles align to the edges"""
+    x1, y1, x2, y2 = region
+    if not tile_size or (x2 - x1 <= tile_size and y2 - y1 <= tile_size):
+        return [region]
+
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(low, high):
+        if high - low <= tile_size:
+            return [low]
+        positions = list(range(low, high - tile_size, step))
+        positions.append(high - tile_size)
+        return positions
+
+    return [
+        (tx, ty, min(tx + tile_size, x2), min(ty + tile_size, y2))
+        for ty in starts(y1, y2)
+        for tx in starts(x1, x2)
+    ]
+
+
+class RegionPlanner:
+    """Which parts of a camera frame go to the detector.
+
+    roi_mode "full" sends the whole frame, "zones" the bounding box of every
+    active intrusion zone plus roi_margin pixels (overlapping boxes merged),
+    and "manual" the [x1, y1, x2, y2] box in config["roi"]. Regions larger
+    than roi_tile_size are split into overlapping tiles. Plans are cached per
+    frame size.
+    """
+
+    def __init__(self, config=None):
+        self.update_config(config or {})
+
+    def update_config(self, config):
+        """Take ROI settings from an analyzer config"""
+        self.mode = config.get("roi_mode", "full")
+        self.manual_roi = config.get("roi")
+        self.margin = config.get("roi_margin", 64)
+        self.tile_size = config.get("roi_tile_size", 0)
+        self.tile_overlap = config.get("roi_tile_overlap", 0.2)
+        self.zones = config.get("intrusion_zones", []) if config.get("zones_enabled", True) else []
+        self._cache = {}
+
+    def rois(self, frame_shape):
+        """Integer (x1, y1, x2, y2) ROIs inside a frame of this shape"""
+        height, width = frame_shape[:2]
+        boxes = []
+        if self.mode == "zones":
+            boxes = merge_boxes([
+                (x1 - self.margin, y1 - self.margin, x2 + self.margin, y2 + self.margin)
+                for x1, y1, x2, y2 in zone_boxes(self.zones)
+            ])
+        elif self.mode == "manual" and self.manual_roi:
+            boxes = [self.manual_roi]
+
+        # Fall back to the full frame when there is nothing to crop to
+        if not boxes:
+            return [(0, 0, width, height)]
+
+        rois = []
+        for x1, y1, x2, y2 in boxes:
+            x1, y1 = int(max(0, min(x1, width - 1))), int(max(0, min(y1, height - 1)))
+            x2, y2 = int(max(x1 + 1, min(x2, width))), int(max(y1 + 1, min(y2, height)))
+            rois.append((x1, y1, x2, y2))
+        return rois
+
+    def regions(self, frame_shape):
+        """Regions (ROIs or their tiles) of the frame to run detection on"""
+        key = tuple(frame_shape[:2])
+        if key not in self._cache:
+            self._cache[key] = [
+                tile
+                for roi in self.rois(frame_shape)
+                for tile in tile_region(roi, self.tile_size, self.tile_overlap)
+            ]
+        return self._cache[key]
+
+    def is_full_frame(self, frame_shape):
+        """Whether the whole frame goes to the detector in one piece"""
+        height, width = frame_shape[:2]
+        return self.regions(frame_shape) == [(0, 0, width, height)]
+
+
+def nms(boxes, scores, overlap_threshold=0.6, sources=None, regions=None):
+    """Indices of the boxes kept by greedy non-maximum suppression.
+
+    Overlap is measured as intersection over the smaller box, so the partial
+    box of a person cut by a tile edge is suppressed by the full one. When
+    `sources` (the region index of every box) and `regions` are given, a box
+    only suppresses boxes found in another region, and only when both reach
+    into the area those two regions share: people standing close together in
+    one region were already told apart by the model.
+    """
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if sources is not None:
+        sources = np.asarray(sources)
+        regions = np.asarray(regions, dtype=np.float64)
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        overlap = intersection / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        duplicate = overlap > overlap_threshold
+        if sources is not None:
+            duplicate &= (sources[rest] != sources[i]) & in_shared_area(boxes, i, rest, regions[sources[i]],
+                                                                         regions[sources[rest]])
+        order = rest[~duplicate]
+    return np.array(keep, dtype=np.int64)
+
+
+def in_shared_area(boxes, i, rest, region, rest_regions):
+    """Whether box i and each box of `rest` both reach into the overlap of their two regions"""
+    bx1 = np.maximum(region[0], rest_regions[:, 0])
+    by1 = np.maximum(region[1], rest_regions[:, 1])
+    bx2 = np.minimum(region[2], rest_regions[:, 2])
+    by2 = np.minimum(region[3], rest_regions[:, 3])
+
+    def reaches(b):
+        return (b[..., 0] < bx2) & (b[..., 2] > bx1) & (b[..., 1] < by2) & (b[..., 3] > by1)
+
+    return (bx1 < bx2) & (by1 < by2) & reaches(boxes[i]) & reaches(boxes[rest])
+
+
+def merge_region_results(frame, regions, results, overlap_threshold=0.6):
+    """Combine the detections of a frame's regions into one Results in frame coordinates"""
+    import torch
+    from ultralytics.engine.results import Results
+
+    height, width = frame.shape[:2]
+    if regions == [(0, 0, width, height)]:
+        return results[0]
+
+    parts = []
+    sources = []
+    for index, ((x1, y1, _, _), result) in enumerate(zip(regions, results)):
+        data = result.boxes.data.cpu().numpy().astype(np.float32, copy=True)
+        if len(data):
+            data[:, [0, 2]] += x1
+            data[:, [1, 3]] += y1
+            parts.append(data)
+            sources.append(np.full(len(data), index))
+
+    data = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+    # Tiles overlap, so a person in the overlap band can be found by two of them
+    if len(regions) > 1 and len(parts) > 1:
+        data = data[nms(data[:, :4], data[:, 4], overlap_threshold, np.concatenate(sources), regions)]
+
+    return Results(orig_img=frame, path=results[0].path, names=results[0].names, boxes=torch.as_tensor(data))
+
+
+def predict_regions(model, items, conf, imgsz=640, batch_size=32):
+    """Detect people in the regions of several frames with batched predict calls.
+
+    items is a list of (frame, regions); returns one Results per frame with
+    boxes in full-frame coordinates.
+    """
+    crops = [frame[y1:y2, x1:x2] for frame, regions in items for x1, y1, x2, y2 in regions]
+
+    crop_results = []
+    for start in range(0, len(crops), batch_size):
+        crop_results.extend(model.predict(
+            source=crops[start:start + batch_size],
+            classes=[0],   # Only detect people (class 0)
+            conf=conf,
+            imgsz=imgsz,
+            verbose=False
+        ))
+
+    merged = []
+    position = 0
+    for frame, regions in items:
+        merged.append(merge_region_results(frame, regions, crop_results[position:position + len(regions)]))
+        position += len(regions)
+    return merged
@@ -0,0 +1,200 @@
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap motion detector on a small grayscale copy of the frame.
+
+    Each frame is compared with a slowly updated background (running average),
+    so both sudden and slow movement show up. The motion score is the fraction
+    of pixels that differ from the background by more than pixel_threshold.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed=0.002, learning_rate=0.05):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.learning_rate = learning_rate
+
+        self.background = None
+        self.score = 0.0
+
+    def reset(self):
+        """Forget the background (e.g. after the camera source changed)"""
+        self.background = None
+
+    def update(self, frame):
+        """Feed a frame; returns True if it shows motion"""
+        height, width = frame.shape[:2]
+        scale = self.width / float(width)
+        small = cv2.resize(frame, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.score = 1.0  # Treat the first frame as motion so inference runs right away
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        self.score = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        return self.score >= self.min_changed
+
+
+class InferenceScheduler:
+    """Decide per frame whether to run detection, and fill in the skipped frames.
+
+    While people are present (detections within the last active_hold seconds)
+    every active_stride-th frame is inferred. With nobody around, a frame is
+    only inferred when the motion gate fires, plus a heartbeat every
+    idle_interval seconds so motionless people are still picked up. On skipped
+    frames the last detections are carried forward, moved along each track's
+    recent velocity for at most max_extrapolation seconds.
+    """
+
+    def __init__(self, enabled=True, active_stride=1, active_hold=2.0, idle_interval=1.0,
+                 max_extrapolation=0.5, motion_gate=None):
+        self.enabled = enabled
+        self.active_stride = active_stride
+        self.active_hold = active_hold
+        self.idle_interval = idle_interval
+        self.max_extrapolation = max_extrapolation
+        self.motion_gate = motion_gate if motion_gate is not None else MotionGate()
+
+        self.last_inference_time = 0.0
+        self.last_detection_time = 0.0
+        self.frames_since_inference = 0
+
+        # Counters and recent inference times for the effective inference rate
+        self.frames = 0
+        self.inferences = 0
+        self.motion_triggers = 0
+        self.started_at = None
+        self.recent_inferences = deque(maxlen=1000)
+        self.recent_frames = deque(maxlen=1000)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a scheduler from the API config keys"""
+        scheduler = cls()
+        scheduler.update_config(config)
+        return scheduler
+
+    def update_config(self, config):
+        """Apply inference_scheduler / motion_* settings from a config dict"""
+        self.enabled = config.get("inference_scheduler", self.enabled)
+        self.active_stride = max(1, int(config.get("active_frame_stride", self.active_stride)))
+        self.active_hold = config.get("active_hold", self.active_hold)
+        self.idle_interval = config.get("idle_inference_interval", self.idle_interval)
+        self.max_extrapolation = config.get("max_extrapolation", self.max_extrapolation)
+        self.motion_gate.min_changed = config.get("motion_threshold", self.motion_gate.min_changed)
+
+    @property
+    def active(self):
+        """Whether people were detected recently"""
+        return self.last_detection_time > 0 and time.time() - self.last_detection_time < self.active_hold
+
+    def should_infer(self, frame, now=None):
+        """Whether this frame should go through detection"""
+        if now is None:
+            now = time.time()
+        if self.started_at is None:
+            self.started_at = now
+        self.frames += 1
+        self.recent_frames.append(now)
+        self.frames_since_inference += 1
+
+        if not self.enabled:
+            return True
+
+        # The gate keeps learning the background on every frame, inferred or not
+        motion = self.motion_gate.update(frame)
+
+        if now - self.last_detection_time < self.active_hold:
+            # People present: keep tracking at the active rate
+            return self.frames_since_inference >= self.active_stride
+        if motion:
+            self.motion_triggers += 1
+            return True
+        # Heartbeat so motionless people in an otherwise static scene are not missed
+        return now - self.last_inference_time >= self.idle_interval
+
+    def observe(self, num_detections, now=None):
+        """Record that a frame was inferred and how many people it found"""
+        if now is None:
+            now = time.time()
+        self.inferences += 1
+        self.recent_inferences.append(now)
+        self.last_inference_time = now
+        self.frames_since_inference = 0
+        if num_detections:
+            self.last_detection_time = now
+
+    def carry_forward(self, results, tracks=None, now=None):
+        """Detections of the last inferred frame, moved along each track's velocity"""
+        if not results or not tracks or not self.max_extrapolation:
+            return results
+
+        result = results[0]
+        boxes = getattr(result, "boxes", None)
+        if boxes is None or boxes.id is None or len(boxes) == 0:
+            return results
+
+        if now is None:
+            now = time.time()
+        dt = min(now - self.last_inference_time, self.max_extrapolation)
+        if dt <= 0:
+            return results
+
+        # Velocity of each track from its last two recorded positions
+        offsets = []
+        for track_id in boxes.id.int().tolist():
+            track = tracks.get(track_id)
+            if track is None or len(track) < 2:
+                offsets.append((0.0, 0.0))
+                continue
+            (x0, y0), (x1, y1) = track.recent_positions(2).tolist()
+            t0, t1 = track.recent_timestamps(2).tolist()
+            if t1 <= t0:
+                offsets.append((0.0, 0.0))
+                continue
+            offsets.append(((x1 - x0) / (t1 - t0) * dt, (y1 - y0) / (t1 - t0) * dt))
+
+        try:
+            data = boxes.data.clone()
+            shift = data.new_tensor(offsets)
+            data[:, 0:4:2] += shift[:, 0:1]
+            data[:, 1:4:2] += shift[:, 1:2]
+            moved = result.new()
+            moved.update(boxes=data)
+            return [moved]
+        except Exception:
+            # Fall back to holding the boxes where they were last seen
+            return results
+
+    def stats(self, window=5.0):
+        """Effective inference rate (over the last `window` seconds), skip fraction and current mode"""
+        now = time.time()
+        span = min(window, now - self.started_at) if self.started_at else 0.0
+
+        def rate(times):
+            if span <= 0:
+                return 0.0
+            return sum(1 for t in times if t >= now - window) / span
+
+        skipped = self.frames - self.inferences
+        return {
+            "enabled": self.enabled,
+            "mode": "active" if self.active else "idle",
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "skipped": skipped,
+            "skip_fraction": skipped / self.frames if self.frames else 0.0,
+            "inference_fps": rate(self.recent_inferences),
+            "input_fps": rate(self.recent_frames),
+            "motion_score": self.motion_gate.score,
+            "motion_triggers": self.motion_triggers,
+        }
@@ -0,0 +1,208 @@
+import struct
+import threading
+import time
+
+from behavior_rules import RULES
+
+# Binary telemetry frame (little endian):
+#   header  "TT", version, flags, seq, timestamp, frame width, frame height, #tracks, #removed, camera id length
+#   camera id (utf-8)
+#   tracks  track id, x1, y1, x2, y2 (pixels), suspicion score * 100, active behavior bitmask
+#   removed track ids
+# A keyframe (FLAG_KEYFRAME) carries every track and replaces the client's state; other frames only
+# carry tracks that changed since they were last sent. The center of a track is the middle of its box.
+MAGIC = b"TT"
+VERSION = 1
+FLAG_KEYFRAME = 1
+HEADER = struct.Struct("<2sBBIdHHHHB")
+TRACK = struct.Struct("<I4hHI")
+TRACK_ID = struct.Struct("<I")
+
+
+class CameraTelemetry:
+    """Track state last sent for one camera"""
+
+    def __init__(self):
+        self.sent = {}       # track_id -> (x1, y1, x2, y2, score, behaviors) as last encoded
+        self.behaviors = {}  # track_id -> {behavior: expiry time}
+        self.seq = 0
+        self.last_sent_at = 0.0
+        self.last_keyframe_at = 0.0
+        self.keyframe_requested = True
+
+
+class TrackTelemetry:
+    """Encode per-frame track state of every camera as compact binary deltas.
+
+    `update` turns a frame's tracked detections, alerts and suspicion scores
+    into one binary message holding only the tracks whose box, score or active
+    behaviors changed, plus the IDs of tracks that disappeared, at most `rate`
+    times a second. Keyframes with every track are sent every
+    keyframe_interval seconds and on request (e.g. for a new subscriber), so
+    clients that missed a delta resynchronize. Behaviors are a bitmask over
+    `behaviors`; a behavior stays active for behavior_hold seconds after its
+    alert. When an alert type without a bit yet shows up it is appended and
+    `on_behaviors(behaviors)` is called with the new table before any frame
+    using its bit is returned.
+    """
+
+    def __init__(self, rate=10.0, keyframe_interval=5.0, min_delta=2.0, behavior_hold=10.0, on_behaviors=None):
+        self.rate = rate
+        self.keyframe_interval = keyframe_interval
+        self.min_delta = min_delta
+        self.behavior_hold = behavior_hold
+
+        self.lock = threading.Lock()
+        self.cameras = {}
+        self.behaviors = list(RULES) + ["high_risk"]  # bit i of the behavior mask
+        self.on_behaviors = on_behaviors
+        self.counters = {"frames": 0, "keyframes": 0, "bytes": 0, "tracks": 0}
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        telemetry = cls(**kwargs)
+        telemetry.update_config(config)
+        return telemetry
+
+    def update_config(self, config):
+        """Apply telemetry_* settings from a config dict"""
+        self.rate = config.get("telemetry_rate", self.rate)
+        self.keyframe_interval = config.get("telemetry_keyframe_interval", self.keyframe_interval)
+        self.min_delta = config.get("telemetry_min_delta", self.min_delta)
+        self.behavior_hold = config.get("telemetry_behavior_hold", self.behavior_hold)
+
+    def request_keyframe(self, camera_id=None):
+        """Send every track on the next update of one camera (or all of them)"""
+        with self.lock:
+            cameras = self.cameras.values() if camera_id is None else [self.cameras.get(camera_id)]
+            for camera in cameras:
+                if camera is not None:
+                    camera.keyframe_requested = True
+
+    def forget(self, camera_id):
+        with self.lock:
+            self.cameras.pop(camera_id, None)
+
+    def _behavior_bit(self, name):
+        if name not in self.behaviors:
+            if len(self.behaviors) >= 32:
+                return 0
+            self.behaviors.append(name)
+            # Called under the lock, so the table goes out before any other frame can use the new bit
+            if self.on_behaviors:
+                self.on_behaviors(list(self.behaviors))
+        return 1 << self.behaviors.index(name)
+
+    def update(self, camera_id, results, alerts, scores, frame_shape, timestamp=None):
+        """Binary message for this frame, or None if nothing is due"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self.lock:
+            camera = self.cameras.setdefault(camera_id, CameraTelemetry())
+
+            # Alerts are remembered even on frames that are not sent
+            for alert in alerts or ():
+                camera.behaviors.setdefault(alert["track_id"], {})[alert["type"]] = timestamp + self.behavior_hold
+
+            keyframe = camera.keyframe_requested or timestamp - camera.last_keyframe_at >= self.keyframe_interval
+            if not keyframe and self.rate and timestamp - camera.last_sent_at < 1.0 / self.rate:
+                return None
+
+            current = {}
+            for track_id, box in tracked_boxes(results):
+                mask = 0
+                active = camera.behaviors.get(track_id)
+                if active:
+                    for name, expiry in list(active.items()):
+                        if expiry < timestamp:
+                            del active[name]
+                        else:
+                            mask |= self._behavior_bit(name)
+                score = min(int(round((scores or {}).get(track_id, 0.0) * 100)), 0xFFFF)
+                current[track_id] = tuple(max(-32768, min(32767, int(round(v)))) for v in box) + (score, mask)
+
+            removed = [track_id for track_id in camera.sent if track_id not in current]
+            for track_id in removed:
+                del camera.sent[track_id]
+                camera.behaviors.pop(track_id, None)
+
+            if keyframe:
+                changed = current
+                removed = []
+            else:
+                changed = {track_id: state for track_id, state in current.items()
+                           if self._changed(camera.sent.get(track_id), state)}
+                if not changed and not removed:
+                    return None
+
+            camera.sent.update(changed)
+            camera.seq += 1
+            camera.last_sent_at = timestamp
+            if keyframe:
+                camera.keyframe_requested = False
+                camera.last_keyframe_at = timestamp
+                self.counters["keyframes"] += 1
+
+            payload = encode_frame(camera_id, camera.seq, timestamp, frame_shape, changed, removed, keyframe)
+            self.counters["frames"] += 1
+            self.counters["tracks"] += len(changed)
+            self.counters["bytes"] += len(payload)
+            return payload
+
+    def _changed(self, previous, state):
+        if previous is None:
+            return True
+        # Score or behaviors changed, or the box moved by at least min_delta pixels
+        if previous[4:] != state[4:]:
+            return True
+        return max(abs(a - b) for a, b in zip(previous[:4], state[:4])) >= self.min_delta
+
+    def stats(self):
+        stats = dict(self.counters)
+        with self.lock:
+            stats["cameras"] = len(self.cameras)
+            stats["tracks_sent"] = sum(len(camera.sent) for camera in self.cameras.values())
+        return stats
+
+
+def tracked_boxes(results):
+    """(track_id, [x1, y1, x2, y2]) of every tracked box in detection results"""
+    if not results:
+        return []
+    boxes = getattr(results[0], "boxes", None)
+    if boxes is None or boxes.id is None or len(boxes) == 0:
+        return []
+    return zip(boxes.id.int().tolist(), boxes.xyxy.tolist())
+
+
+def encode_frame(camera_id, seq, timestamp, frame_shape, tracks, removed, keyframe=False):
+    """Pack one telemetry frame"""
+    name = camera_id.encode("utf-8")[:255]
+    height, width = frame_shape[:2]
+    parts = [HEADER.pack(MAGIC, VERSION, FLAG_KEYFRAME if keyframe else 0, seq & 0xFFFFFFFF, timestamp,
+                         min(width, 0xFFFF), min(height, 0xFFFF), len(tracks), len(removed), len(name)), name]
+    parts.extend(TRACK.pack(track_id & 0xFFFFFFFF, *state) for track_id, state in tracks.items())
+    parts.extend(TRACK_ID.pack(track_id & 0xFFFFFFFF) for track_id in removed)
+    return b"".join(parts)
+
+
+def decode_frame(data):
+    """Unpack a telemetry frame into a dict (the inverse of encode_frame)"""
+    magic, version, flags, seq, timestamp, width, height, n_tracks, n_removed, name_length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a track telemetry frame")
+    offset = HEADER.size
+    camera_id = data[offset:offset + name_length].decode("utf-8")
+    offset += name_length
+
+    tracks = {}
+    for _ in range(n_tracks):
+        track_id, x1, y1, x2, y2, score, behaviors = TRACK.unpack_from(data, offset)
+        tracks[track_id] = {"bbox": [x1, y1, x2, y2], "center": [(x1 + x2) / 2, (y1 + y2) / 2],
+                            "suspicion_score": score / 100, "behaviors": behaviors}
+        offset += TRACK.size
+    removed = [TRACK_ID.unpack_from(data, offset + i * TRACK_ID.size)[0] for i in range(n_removed)]
+
+    return {"camera_id": camera_id, "seq": seq, "timestamp": timestamp, "keyframe": bool(flags & FLAG_KEYFRAME),
+            "width": width, "height": height, "tracks": tracks, "removed": removed}
@@ -0,0 +1,49 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from behavior_rules import RuleEngine
+
+
+def test_rule_params_are_coerced():
+    engine = RuleEngine({"loitering": {"enabled": "false"}, "running": {"enabled": "true", "window": "4", "min_speed": 120}})
+
+    assert [rule.name for rule in engine.rules] == ["pacing", "zone_intrusion", "running"]
+    running = engine.describe()["running"]
+    assert running["window"] == 4 and isinstance(running["window"], int)
+    assert running["min_speed"] == 120.0 and isinstance(running["min_speed"], float)
+
+
+@pytest.mark.parametrize("rule_config", [
+    {"loitering": {"enabled": "maybe"}},
+    {"loitering": {"window": 0}},
+    {"loitering": {"window": 2.5}},
+    {"loitering": {"weight": -1}},
+    {"loitering": {"max_variance": "nan"}},
+    {"loitering": {"typo": 1}},
+    {"running": {"min_speed": [300]}},
+    {"high_risk": {"min_behaviors": 0}},
+    {"high_risk": {"enabled": 2}},
+    {"pacing": 5},
+])
+def test_bad_rule_params_are_rejected(rule_config):
+    with pytest.raises(ValueError):
+        RuleEngine(rule_config)
+
+
+def test_post_config_rejects_bad_rule_params(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ALERT_DB_PATH", str(tmp_path / "alerts.db"))
+    api = importlib.import_module("api")
+    from fastapi.testclient import TestClient
+
+    before = dict(api.app_state.config)
+    response = TestClient(api.app).post("/config", json={"behavior_rules": {"loitering": {"window": "abc"}}})
+
+    assert response.status_code == 400
+    assert "loitering.window" in response.json()["detail"]
+    assert api.app_state.config == before
@@ -0,0 +1,153 @@
+import importlib
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ArrayBoxes:
+    """Tracked boxes shaped like ultralytics Boxes (x1, y1, x2, y2, track_id, conf, cls rows)"""
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 7)
+        self.xyxy = self.data[:, :4]
+        self.id = self.data[:, 4]
+        self.conf = self.data[:, 5]
+        self.cls = self.data[:, 6]
+
+    def __len__(self):
+        return len(self.data)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+
+class ArrayResult:
+    names = {0: "person"}
+
+    def __init__(self, data):
+        self.boxes = ArrayBoxes(data)
+
+
+def test_engine_alerts_reach_handle_new_alerts(tmp_path, monkeypatch):
+    # api creates its stores and clip/recording directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ALERT_DB_PATH", str(tmp_path / "alerts.db"))
+    api = importlib.import_module("api")
+    from camera_engine import CameraStream, MultiCameraEngine
+    from detect_and_track import SecurityAnalyzer
+
+    config = {"audio_alerts": False, "clip_recording": False, "recording_enabled": False}
+    api.app_state.config.update(config)
+    api.apply_config()
+
+    engine = MultiCameraEngine(config, model=object(), on_alerts=api.handle_new_alerts)
+    engine._track = lambda stream, result: result  # detections below already carry track IDs
+
+    analyzer = SecurityAnalyzer(dict(engine.config), model=engine.model)
+    stream = CameraStream("cam1", "0", analyzer, tracker=None, worker=None)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # A person standing in the analyzer's default zone raises a zone_intrusion alert
+    result = ArrayResult([[200, 200, 260, 360, 7, 0.9, 0]])
+    engine._handle_results([(stream, frame, 1)], [result], min_conf=0.5)
+
+    api.app_state.alerts.flush()
+    alerts, _ = api.app_state.alerts.query(limit=10, offset=0, cursor=None, order="desc", camera_id="cam1")
+    assert [alert["type"] for alert in alerts] == ["zone_intrusion"]
+    assert alerts[0]["track_id"] == 7
+    assert alerts[0]["camera_id"] == "cam1"
+
+
+def test_skipped_frames_reach_on_frame():
+    from camera_engine import CameraStream, MultiCameraEngine
+    from detect_and_track import SecurityAnalyzer
+
+    published = []
+    config = {"audio_alerts": False}
+    engine = MultiCameraEngine(config, model=object(),
+                               on_frame=lambda camera_id, frame, jpeg: published.append((camera_id, frame)))
+    engine._track = lambda stream, result: result
+
+    analyzer = SecurityAnalyzer(dict(engine.config), model=engine.model)
+    stream = CameraStream("cam1", "0", analyzer, tracker=None, worker=None)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    engine._handle_results([(stream, frame, 1)], [ArrayResult([[500, 50, 560, 210, 3, 0.9, 0]])], min_conf=0.5)
+    # Frame 2 is skipped by the scheduler and published with the carried-forward detections
+    engine._carry_forward(stream, frame, 2)
+
+    assert [camera_id for camera_id, _ in published] == ["cam1", "cam1"]
+    assert published[1][1] is stream.current_frame
+
+
+def test_notifications_keep_cameras_apart():
+    from camera_engine import CameraStream, MultiCameraEngine
+    from detect_and_track import SecurityAnalyzer
+    from notifiers import NotificationDispatcher
+
+    dispatcher = NotificationDispatcher()
+    submitted = []
+    dispatcher.submit = submitted.append
+    config = {"audio_alerts": False, "behavior_rules": {"zone_intrusion": {"notify": True}}}
+    engine = MultiCameraEngine(config, model=object(), dispatcher=dispatcher)
+    engine._track = lambda stream, result: result
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    for camera_id in ("cam1", "cam2"):
+        analyzer = SecurityAnalyzer(dict(engine.config), model=engine.model, dispatcher=dispatcher,
+                                    camera_id=camera_id)
+        stream = CameraStream(camera_id, "0", analyzer, tracker=None, worker=None)
+        # Both cameras number their first track 1
+        engine._handle_results([(stream, frame, 1)], [ArrayResult([[200, 200, 260, 360, 1, 0.9, 0]])],
+                               min_conf=0.5)
+
+    assert [alert["camera_id"] for alert in submitted] == ["cam1", "cam2"]
+    assert len(dispatcher._coalesce(submitted)) == 2
+
+
+def test_recordings_do_not_depend_on_viewers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ALERT_DB_PATH", str(tmp_path / "alerts.db"))
+    api = importlib.import_module("api")
+    from camera_engine import CameraStream, MultiCameraEngine
+    from detect_and_track import SecurityAnalyzer
+
+    recorded = []
+    monkeypatch.setattr(api, "record_camera_frame", lambda camera_id, frame, jpeg: recorded.append(frame))
+    monkeypatch.setattr(api.app_state.clip_recorder, "enabled", True)
+    monkeypatch.setitem(api.app_state.frame_requests, "cam1", 0.0)
+
+    config = {"audio_alerts": False}
+    engine = MultiCameraEngine(config, model=object(), on_frame=api.record_annotated_frame,
+                               on_analyzed=api.publish_analysis, should_annotate=api.needs_annotation)
+    engine._track = lambda stream, result: result
+    analyzer = SecurityAnalyzer(dict(engine.config), model=engine.model)
+    stream = CameraStream("cam1", "0", analyzer, tracker=None, worker=None)
+
+    def record(seq):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        engine._handle_results([(stream, frame, seq)], [ArrayResult([[500, 50, 560, 210, 3, 0.9, 0]])],
+                               min_conf=0.5)
+        return frame, recorded[-1]
+
+    # Raw recordings whether or not someone polls the annotated frames
+    monkeypatch.setitem(api.app_state.config, "record_overlays", False)
+    frame, kept = record(1)
+    assert kept is frame and stream.annotations_skipped == 1
+    api.app_state.frame_requests["cam1"] = time.time()
+    frame, kept = record(2)
+    assert kept is frame and kept is not stream.current_frame
+
+    # Annotated recordings even while nobody watches
+    monkeypatch.setitem(api.app_state.config, "record_overlays", True)
+    api.app_state.frame_requests["cam1"] = 0.0
+    frame, kept = record(3)
+    assert kept is stream.current_frame and kept is not frame and kept.any()
+    assert len(recorded) == 3
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recording import SegmentRecorder
+
+
+def test_warns_when_size_cap_cannot_hold_retention(tmp_path, capsys):
+    recorder = SegmentRecorder(str(tmp_path / "rec"), segment_seconds=1.0, retention_days=30, max_bytes=200_000)
+    frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    start = 1_700_000_000.0
+    for i in range(60):
+        recorder.add_frame("cam1", frame, timestamp=start + i * 0.1)
+    recorder.stop()
+
+    assert recorder.enforce_retention(now=start + 6.0) > 0
+    recorder.enforce_retention(now=start + 6.5)
+    stats = recorder.stats()
+    assert stats["deleted_early"] == stats["deleted"] > 0
+    assert stats["capacity_days"] < 30
+    assert capsys.readouterr().out.count("recording_retention_days=30") == 1
@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from replay_parity import make_analyzer, replay, synthetic_recording
+
+# Alerts the original per-track analyzer raised on the synthetic recordings (frame index, alerts)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "baseline_alerts.json")) as f:
+    BASELINE = json.load(f)["cases"]
+
+
+def summarize(frame_alerts):
+    return [[i, [[alert["type"], alert["track_id"], round(alert["suspicion_score"], 6), alert.get("zone_id")]
+                 for alert in alerts]]
+            for i, alerts in enumerate(frame_alerts) if alerts]
+
+
+@pytest.mark.parametrize("batched", [False, True], ids=["per-track", "batched"])
+@pytest.mark.parametrize("case", BASELINE, ids=lambda case: json.dumps(case["config"]))
+def test_replay_matches_baseline_alerts(case, batched):
+    frames = synthetic_recording(case["frames"], case["people"], seed=case["seed"])
+    frame_alerts, _ = replay(make_analyzer(batched, case["config"]), frames)
+    assert summarize(frame_alerts) == case["alerts"]
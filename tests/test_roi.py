@@ -0,0 +1,51 @@
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roi import nms, tile_region
+
+# Two 640 tiles of a 1152-wide frame, sharing x 512..640
+REGIONS = tile_region((0, 0, 1152, 640), 640, overlap=0.2)
+
+
+def test_nms_keeps_overlapping_people_of_one_tile():
+    boxes = np.array([[100, 100, 160, 260], [120, 110, 175, 265]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+
+    assert sorted(nms(boxes, scores, sources=[0, 0], regions=REGIONS).tolist()) == [0, 1]
+
+
+def test_nms_drops_tile_edge_duplicates():
+    # The left tile only sees the part of the person left of its edge at x=640
+    boxes = np.array([[600, 100, 660, 260], [600, 100, 640, 260]], dtype=np.float32)
+    scores = np.array([0.9, 0.7], dtype=np.float32)
+
+    assert REGIONS[:2] == [(0, 0, 640, 640), (512, 0, 1152, 640)]
+    assert nms(boxes, scores, sources=[1, 0], regions=REGIONS).tolist() == [0]
+
+
+def test_nms_keeps_cross_tile_pairs_outside_the_shared_band():
+    # Both boxes end left of the band the tiles share
+    regions = [(0, 0, 640, 640), (600, 0, 1240, 640)]
+    boxes = np.array([[480, 100, 560, 260], [470, 100, 590, 260]], dtype=np.float32)
+    scores = np.array([0.9, 0.7], dtype=np.float32)
+
+    assert sorted(nms(boxes, scores, sources=[0, 1], regions=regions).tolist()) == [0, 1]
+
+
+@pytest.mark.parametrize("roi", [[0, 0, 100], [0, 0, 100, 100, 5], [-1, 0, 100, 100], [0, 0, 100, 50.5],
+                                 [100, 0, 50, 100]])
+def test_config_rejects_bad_roi(tmp_path, monkeypatch, roi):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ALERT_DB_PATH", str(tmp_path / "alerts.db"))
+    api = importlib.import_module("api")
+    from pydantic import ValidationError
+
+    with pytest.raises(ValidationError):
+        api.Config(roi=roi)
+    assert api.Config(roi=[0, 0, 100, 50]).roi == [0, 0, 100, 50]
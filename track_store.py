@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class TrackHistory:
+    """Fixed-capacity position/timestamp history for one tracked person.
+
+    Samples live in NumPy ring buffers that are written twice (at slot i and
+    i + capacity), so the most recent N samples are always one contiguous slice:
+    `append` is O(1) and `positions`, `timestamps` and `recent_positions(n)` are
+    zero-copy views. Views are only valid until the next `append`.
+
+    Memory is bounded at 2 * capacity * 3 float64 values (48 bytes per sample of
+    capacity, ~4.7 KB for the default 100) plus a few scalars.
+    """
+
+    __slots__ = (
+        'capacity', '_positions', '_timestamps', '_next', 'count',
+        'last_direction', 'direction_changes', 'confidence',
+    )
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._positions = np.empty((2 * capacity, 2), dtype=np.float64)
+        self._timestamps = np.empty(2 * capacity, dtype=np.float64)
+        self._next = 0   # Ring slot the next sample is written to
+        self.count = 0   # Number of valid samples (<= capacity)
+
+        # Pacing state
+        self.last_direction = None
+        self.direction_changes = 0
+
+        # Latest detection confidence
+        self.confidence = None
+
+    def append(self, x, y, timestamp):
+        """Record a new position, overwriting the oldest one when full"""
+        i = self._next
+        j = i + self.capacity
+        self._positions[i, 0] = self._positions[j, 0] = x
+        self._positions[i, 1] = self._positions[j, 1] = y
+        self._timestamps[i] = self._timestamps[j] = timestamp
+
+        self._next = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def _window(self, n):
+        # Contiguous slice of the doubled buffer holding the last n samples
+        n = min(n, self.count)
+        end = self._next + self.capacity
+        return slice(end - n, end)
+
+    @property
+    def positions(self):
+        """All stored positions, oldest first, as an (n, 2) view"""
+        return self._positions[self._window(self.count)]
+
+    @property
+    def timestamps(self):
+        """All stored timestamps, oldest first, as an (n,) view"""
+        return self._timestamps[self._window(self.count)]
+
+    def recent_positions(self, n):
+        """The last n positions as an (n, 2) view"""
+        return self._positions[self._window(n)]
+
+    def recent_timestamps(self, n):
+        """The last n timestamps as an (n,) view"""
+        return self._timestamps[self._window(n)]
+
+    @property
+    def last_position(self):
+        """Most recent (x, y) as plain floats"""
+        i = self._next + self.capacity - 1
+        return (float(self._positions[i, 0]), float(self._positions[i, 1]))
+
+    @property
+    def first_timestamp(self):
+        """Oldest stored timestamp"""
+        return float(self._timestamps[self._next + self.capacity - self.count])
+
+    @property
+    def last_timestamp(self):
+        """Most recent timestamp"""
+        return float(self._timestamps[self._next + self.capacity - 1])
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+# Policies for a client whose send queue is full
+SLOW_CLIENT_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+
+def serialize(message):
+    """Encode a message once for every client (same format as WebSocket.send_json)"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class HubClient:
+    """One WebSocket connection with its own bounded send queue and writer task"""
+
+    def __init__(self, websocket, max_queue_size):
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.pending = deque()  # (coalesce key, text or bytes)
+        self.subscriptions = set()  # Topics such as "telemetry" (every camera) or "telemetry:<camera_id>"
+        self.wake = asyncio.Event()
+        self.task = None
+        self.closed = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def wants(self, topic):
+        if topic in self.subscriptions or topic.split(":", 1)[0] in self.subscriptions:
+            return True
+        # A bare topic ("telemetry") also reaches subscribers of its sub-topics ("telemetry:<camera_id>")
+        return ":" not in topic and any(subscription.startswith(topic + ":") for subscription in self.subscriptions)
+
+    def offer(self, text, key, policy):
+        """Queue a serialized message; returns False if the client should be disconnected"""
+        if key is not None:
+            # Only the newest message of a kind (e.g. config) is worth sending
+            for i, (pending_key, _) in enumerate(self.pending):
+                if pending_key == key:
+                    self.pending[i] = (key, text)
+                    self.coalesced += 1
+                    return True
+
+        if len(self.pending) >= self.max_queue_size:
+            if policy == "disconnect":
+                return False
+            self.dropped += 1
+            if policy == "drop_newest":
+                return True
+            self.pending.popleft()
+
+        self.pending.append((key, text))
+        self.wake.set()
+        return True
+
+
+class BroadcastHub:
+    """Fan out messages to WebSocket clients from the server's event loop.
+
+    Every message is serialized once and put on each client's bounded queue;
+    a writer task per client drains it, so a slow client only ever delays
+    itself. When a queue is full the client's oldest or newest message is
+    dropped, or the client is disconnected (slow_client_policy). Processing
+    threads hand messages over with `publish`/`publish_alert`, which are
+    thread-safe; alerts can be batched into one `new_alerts` message per
+    alert_batch_interval seconds. Messages with a topic (bytes are sent as
+    binary frames) only go to clients subscribed to it, or to one of its
+    sub-topics for a bare topic such as "telemetry".
+    """
+
+    def __init__(self, max_queue_size=100, slow_client_policy="drop_oldest", alert_batch_interval=0.0,
+                 send_timeout=5.0):
+        self.max_queue_size = max_queue_size
+        self.slow_client_policy = slow_client_policy
+        self.alert_batch_interval = alert_batch_interval
+        self.send_timeout = send_timeout
+
+        self.loop = None
+        self.clients = set()
+        # Subscribers per topic, so processing threads can check for them without touching the client set
+        self.topic_counts = {}
+        self.topic_lock = threading.Lock()
+        self.alert_batch = []
+        self.flush_handle = None
+
+        self.counters = {"messages": 0, "alerts": 0, "batches": 0, "disconnected_slow": 0, "send_errors": 0,
+                         "dropped": 0, "coalesced": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        hub = cls()
+        hub.update_config(config)
+        return hub
+
+    def update_config(self, config):
+        """Apply ws_* settings from a config dict"""
+        self.max_queue_size = config.get("ws_queue_size", self.max_queue_size)
+        policy = config.get("ws_slow_client_policy", self.slow_client_policy)
+        if policy in SLOW_CLIENT_POLICIES:
+            self.slow_client_policy = policy
+        self.alert_batch_interval = config.get("ws_alert_batch_interval", self.alert_batch_interval)
+        self.send_timeout = config.get("ws_send_timeout", self.send_timeout)
+        for client in self.clients:
+            client.max_queue_size = self.max_queue_size
+
+    def attach(self, loop=None):
+        """Bind the hub to the server's event loop"""
+        self.loop = loop or asyncio.get_running_loop()
+
+    async def connect(self, websocket):
+        """Register an accepted WebSocket and start its writer"""
+        if self.loop is None:
+            self.attach()
+        client = HubClient(websocket, self.max_queue_size)
+        client.task = asyncio.create_task(self._writer(client))
+        self.clients.add(client)
+        return client
+
+    async def disconnect(self, client, code=None):
+        """Forget a client, stop its writer and close the socket if asked to"""
+        self._remove(client)
+        if client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+        if code is not None:
+            try:
+                await client.websocket.close(code=code)
+            except Exception:
+                pass
+
+    def _remove(self, client):
+        if not client.closed:
+            # Keep the totals counting after the client is gone
+            self.counters["dropped"] += client.dropped
+            self.counters["coalesced"] += client.coalesced
+            self._count_topics(client.subscriptions, -1)
+        client.closed = True
+        self.clients.discard(client)
+        client.wake.set()
+
+    def subscribe(self, client, topics):
+        added = set(topics) - client.subscriptions
+        client.subscriptions.update(added)
+        if not client.closed:
+            self._count_topics(added, 1)
+
+    def unsubscribe(self, client, topics):
+        removed = client.subscriptions & set(topics)
+        client.subscriptions.difference_update(removed)
+        if not client.closed:
+            self._count_topics(removed, -1)
+
+    def _count_topics(self, topics, delta):
+        with self.topic_lock:
+            for topic in topics:
+                count = self.topic_counts.get(topic, 0) + delta
+                if count > 0:
+                    self.topic_counts[topic] = count
+                else:
+                    self.topic_counts.pop(topic, None)
+
+    def has_subscribers(self, topic):
+        """Whether any client would receive a message on this topic (safe to call from any thread)"""
+        with self.topic_lock:
+            if topic in self.topic_counts or topic.split(":", 1)[0] in self.topic_counts:
+                return True
+            return ":" not in topic and any(subscribed.startswith(topic + ":") for subscribed in self.topic_counts)
+
+    def broadcast(self, message, key=None, topic=None):
+        """Send a message to every client (or the topic's subscribers); must run on the event loop"""
+        clients = [client for client in self.clients if topic is None or client.wants(topic)]
+        if not clients:
+            return
+        text = message if isinstance(message, bytes) else serialize(message)
+        self.counters["messages"] += 1
+        for client in clients:
+            if not client.offer(text, key, self.slow_client_policy):
+                self.counters["disconnected_slow"] += 1
+                self._remove(client)
+                # Close code 1013: try again later
+                asyncio.ensure_future(self.disconnect(client, code=1013))
+
+    def send(self, client, message):
+        """Send a message to one client through its queue (never concurrently with its writer)"""
+        if not client.closed:
+            client.offer(serialize(message), None, self.slow_client_policy)
+
+    def publish(self, message, key=None, topic=None):
+        """Thread-safe broadcast from a processing thread"""
+        if self.loop is None or not self.clients:
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self.broadcast, message, key, topic)
+        except RuntimeError:
+            # Event loop closed
+            return False
+        return True
+
+    def publish_alert(self, alert):
+        """Thread-safe alert broadcast, batched per alert_batch_interval when that is set"""
+        self.counters["alerts"] += 1
+        if self.loop is None or not self.clients:
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self._add_alert, alert)
+        except RuntimeError:
+            return False
+        return True
+
+    def _add_alert(self, alert):
+        if not self.alert_batch_interval:
+            self.broadcast({"new_alert": alert})
+            return
+        self.alert_batch.append(alert)
+        if self.flush_handle is None:
+            self.flush_handle = self.loop.call_later(self.alert_batch_interval, self._flush_alerts)
+
+    def _flush_alerts(self):
+        self.flush_handle = None
+        batch, self.alert_batch = self.alert_batch, []
+        if len(batch) == 1:
+            self.broadcast({"new_alert": batch[0]})
+        elif batch:
+            self.counters["batches"] += 1
+            self.broadcast({"new_alerts": batch})
+
+    async def _writer(self, client):
+        try:
+            while not client.closed:
+                if not client.pending:
+                    client.wake.clear()
+                    await client.wake.wait()
+                    continue
+                _, payload = client.pending.popleft()
+                if isinstance(payload, bytes):
+                    send = client.websocket.send_bytes(payload)
+                else:
+                    send = client.websocket.send_text(payload)
+                await asyncio.wait_for(send, self.send_timeout)
+                client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            # Stuck client: give up on it rather than holding its queue forever
+            self.counters["disconnected_slow"] += 1
+            await self.disconnect(client, code=1013)
+        except Exception:
+            self.counters["send_errors"] += 1
+            self._remove(client)
+
+    def stats(self):
+        clients = list(self.clients)
+        stats = dict(self.counters)
+        stats.update({
+            "clients": len(clients),
+            "queued": sum(len(client.pending) for client in clients),
+            "max_queued": max((len(client.pending) for client in clients), default=0),
+            "dropped": stats["dropped"] + sum(client.dropped for client in clients),
+            "coalesced": stats["coalesced"] + sum(client.coalesced for client in clients),
+            "policy": self.slow_client_policy,
+        })
+        return stats
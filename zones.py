@@ -0,0 +1,126 @@
+import numpy as np
+
+
+def point_in_polygon(point, polygon):
+    """Check if a point is inside a polygon"""
+    x, y = point
+    n = len(polygon)
+    inside = False
+
+    p1x, p1y = polygon[0]
+    for i in range(1, n + 1):
+        p2x, p2y = polygon[i % n]
+        if y > min(p1y, p2y):
+            if y <= max(p1y, p2y):
+                if x <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    if p1x == p2x or x <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+
+    return inside
+
+
+class ZoneIndex:
+    """Intrusion zones compiled into flat NumPy edge arrays.
+
+    Built once per config change, it answers "which zones contain which points"
+    for every track center of a frame in a single batched ray-casting pass. The
+    crossing rule is the same as `point_in_polygon`, so results are identical.
+    Points outside every zone's bounding box are rejected before the edge test.
+    """
+
+    def __init__(self, zones=None):
+        self.compile(zones or [])
+
+    def compile(self, zones):
+        """(Re)build the index from config["intrusion_zones"] (dict or bare point-list zones)"""
+        zone_ids, names, polygons = [], [], []
+        for idx, zone in enumerate(zones):
+            if isinstance(zone, dict):
+                # Skip inactive zones
+                if not zone.get('active', True):
+                    continue
+                points = zone['points']
+                name = zone.get('name', f"Zone {idx+1}")
+            else:
+                points = zone
+                name = f"Zone {idx+1}"
+
+            if len(points) == 0:
+                continue
+            zone_ids.append(idx)
+            names.append(name)
+            polygons.append(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+
+        # Original positions in config["intrusion_zones"] and display names of the active zones
+        self.zone_ids = np.array(zone_ids, dtype=np.int64)
+        self.names = names
+        self.names_by_id = dict(zip(zone_ids, names))
+        self.polygons = polygons
+
+        if not polygons:
+            self.zone_starts = np.zeros(0, dtype=np.int64)
+            return
+
+        # Edges (p1 -> p2) of all zones back to back; zone_starts marks where each zone begins
+        p1 = np.concatenate(polygons)
+        p2 = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in polygons])
+        self.zone_starts = np.cumsum([0] + [len(polygon) for polygon in polygons[:-1]])
+
+        self.p1x, self.p1y = p1[:, 0], p1[:, 1]
+        self.dx = p2[:, 0] - p1[:, 0]
+        self.dy = p2[:, 1] - p1[:, 1]
+        self.min_y = np.minimum(p1[:, 1], p2[:, 1])
+        self.max_y = np.maximum(p1[:, 1], p2[:, 1])
+        self.max_x = np.maximum(p1[:, 0], p2[:, 0])
+        self.vertical = p1[:, 0] == p2[:, 0]
+
+        # Per-zone bounding boxes (x1, y1, x2, y2)
+        self.bboxes = np.array([
+            (polygon[:, 0].min(), polygon[:, 1].min(), polygon[:, 0].max(), polygon[:, 1].max())
+            for polygon in polygons
+        ])
+
+    def __len__(self):
+        return len(self.zone_ids)
+
+    def contains(self, points):
+        """Boolean (n_points, n_zones) matrix of which active zones contain which points"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        inside = np.zeros((len(points), len(self)), dtype=bool)
+        if len(points) == 0 or len(self) == 0:
+            return inside
+
+        # Cheap rejection: only points inside at least one bounding box go through the edge test
+        x_all, y_all = points[:, 0:1], points[:, 1:2]
+        in_bbox = ((x_all >= self.bboxes[:, 0]) & (y_all > self.bboxes[:, 1]) &
+                   (x_all <= self.bboxes[:, 2]) & (y_all <= self.bboxes[:, 3]))
+        candidates = np.flatnonzero(in_bbox.any(axis=1))
+        if len(candidates) == 0:
+            return inside
+
+        x, y = points[candidates, 0:1], points[candidates, 1:2]
+
+        # Ray casting against every edge at once: (n_candidates, n_edges)
+        spans = (y > self.min_y) & (y <= self.max_y) & (x <= self.max_x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xinters = (y - self.p1y) * self.dx / self.dy + self.p1x
+        crossings = spans & (self.vertical | (x <= xinters))
+
+        # Odd number of crossings per zone means inside
+        counts = np.add.reduceat(crossings.astype(np.int32), self.zone_starts, axis=1)
+        inside[candidates] = (counts & 1).astype(bool) & in_bbox[candidates]
+        return inside
+
+    def first_zone(self, points):
+        """For each point, the config index of the first active zone containing it (or -1)"""
+        inside = self.contains(points)
+        if inside.shape[1] == 0:
+            return np.full(len(inside), -1, dtype=np.int64)
+        return np.where(inside.any(axis=1), self.zone_ids[inside.argmax(axis=1)], -1)
+
+    def zone_name(self, zone_id):
+        """Display name of the zone at config index zone_id"""
+        return self.names_by_id[int(zone_id)]